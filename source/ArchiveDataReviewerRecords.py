@@ -0,0 +1,190 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Moves reviewer records that are finished with out of the active Reviewer
+# workspace into an archive Reviewer workspace session.  Records are chosen
+# by LIFECYCLESTATUS, LIFECYCLEPHASE and the age of a date field such as
+# VERIFICATIONDATE.  They are moved with the Copy Data Reviewer Records logic
+# in batches of records, each batch in its own edit session, together with
+# their geometries and run table rows.  Each batch is verified before it is
+# deleted from the active workspace and the archive stops at the first batch
+# that fails.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import arcpy
+import datetime
+
+from CopyDataReviewerRecords import CopyRecords, getFullPath, GetSchema, GetWorkspaceType, RunTool
+from ReviewerRecordStream import GetSessionIDs, MakeSessionClause
+
+# Default number of records moved in each batch
+ARCHIVE_BATCH_SIZE = 5000
+
+# Date fields the age of a record can be taken from
+ARCHIVE_DATE_FIELDS = ("REVIEWDATE", "CORRECTIONDATE", "VERIFICATIONDATE")
+
+# ---------------------------------------------------------------
+# Returns a date as a literal for a where clause on a workspace
+# ---------------------------------------------------------------
+def DateLiteral(workspace, value):
+    text = value.strftime("%Y-%m-%d %H:%M:%S")
+
+    if GetWorkspaceType(workspace) != 'RemoteDatabase':
+        return "date '{}'".format(text)
+
+    dbclient = getattr(arcpy.Describe(workspace).connectionProperties, 'dbclient', '').lower()
+    if 'oracle' in dbclient:
+        return "TO_DATE('{}', 'YYYY-MM-DD HH24:MI:SS')".format(text)
+    if 'postgres' in dbclient:
+        return "TIMESTAMP '{}'".format(text)
+    return "'{}'".format(text)
+
+# ------------------------------------------------------------------------------
+# Makes the where clause selecting the records to archive.  Returns '' if no
+# status, phase or age was given
+# ------------------------------------------------------------------------------
+def MakeArchiveClause(Reviewer_Workspace, REVTABLEMAIN, Statuses, Phases, OlderThanDays, DateField):
+    clauses = []
+
+    if Statuses:
+        clauses.append("{} IN ({})".format(arcpy.AddFieldDelimiters(REVTABLEMAIN, "LIFECYCLESTATUS"),
+                                           ",".join(str(int(value)) for value in Statuses)))
+    if Phases:
+        clauses.append("{} IN ({})".format(arcpy.AddFieldDelimiters(REVTABLEMAIN, "LIFECYCLEPHASE"),
+                                           ",".join(str(int(value)) for value in Phases)))
+    if OlderThanDays is not None:
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=float(OlderThanDays))
+        clauses.append("{} < {}".format(arcpy.AddFieldDelimiters(REVTABLEMAIN, DateField),
+                                        DateLiteral(Reviewer_Workspace, cutoff)))
+
+    return " AND ".join(clauses)
+
+# ------------------------------------------------------------------------------
+# Moves the records of the selected sessions that meet the status, phase and
+# age to a session of the archive workspace.  Can be called from other scripts
+# without the toolbox.
+#   Reviewer_Workspace (str): path to the active Reviewer workspace
+#   SessionsList (list of str): names of the sessions to archive records from
+#   Archive_Workspace (str): path to the archive Reviewer workspace
+#   Archive_Session (str): name of the session in the archive workspace
+#   Statuses (list of int): LIFECYCLESTATUS values of the records to archive
+#   Phases (list of int): LIFECYCLEPHASE values of the records to archive
+#   OlderThanDays (float): archive records whose DateField is older than this
+#   DateField (str): REVIEWDATE, CORRECTIONDATE or VERIFICATIONDATE
+#   BatchSize (int): number of records moved in each batch
+#   CreateLog (bool): write a logfile for each batch
+#   PlanOnly (bool): count the records without moving them
+# Returns a dictionary with the number of records and batches archived, the
+# plan when PlanOnly is True, or None if the archive failed
+# ------------------------------------------------------------------------------
+def ArchiveRecords(Reviewer_Workspace, SessionsList, Archive_Workspace, Archive_Session, Statuses=None,
+                   Phases=None, OlderThanDays=None, DateField="VERIFICATIONDATE", BatchSize=ARCHIVE_BATCH_SIZE,
+                   CreateLog=False, PlanOnly=False):
+
+    REVTABLEMAIN = getFullPath(Reviewer_Workspace, "REVTABLEMAIN", True)
+    SessionsTable = getFullPath(Reviewer_Workspace, "REVSESSIONTABLE", True)
+    schema = GetSchema(REVTABLEMAIN)
+
+    if DateField not in ARCHIVE_DATE_FIELDS or not schema.has(DateField):
+        arcpy.AddError("{} is not a date field of {}.  Use one of {}".format(
+            DateField, REVTABLEMAIN, ", ".join(ARCHIVE_DATE_FIELDS)))
+        return None
+
+    ArchiveClause = MakeArchiveClause(Reviewer_Workspace, REVTABLEMAIN, Statuses, Phases, OlderThanDays, DateField)
+    if ArchiveClause == '':
+        arcpy.AddError("Choose the lifecycle status, lifecycle phase or age of the records to archive.")
+        return None
+
+    arcpy.AddMessage("Archiving records where {}".format(ArchiveClause))
+
+    if PlanOnly:
+        return CopyRecords(Reviewer_Workspace, SessionsList, Archive_Workspace, Archive_Session, ArchiveClause,
+                           PlanOnly=True)
+
+    # Find the objectids of the records to archive.  Each batch is a range of
+    # objectids holding BatchSize of the records
+    sessions, rowcount = GetSessionIDs(SessionsTable, SessionsList)
+    WhereClause = MakeSessionClause(SessionsTable, sessions.keys(), rowcount)
+    if WhereClause != '':
+        WhereClause = WhereClause + " AND " + ArchiveClause
+    else:
+        WhereClause = ArchiveClause
+
+    with arcpy.da.SearchCursor(REVTABLEMAIN, ["OID@"], WhereClause) as cursor:
+        oids = sorted(row[0] for row in cursor)
+
+    arcpy.AddMessage("{} records will be archived".format(len(oids)))
+
+    oid_field = arcpy.AddFieldDelimiters(REVTABLEMAIN, schema.oid_field)
+    BatchSize = max(1, int(BatchSize))
+    result = {"records": 0, "batches": 0, "whereClause": ArchiveClause}
+
+    for i in range(0, len(oids), BatchSize):
+        batch = oids[i:i + BatchSize]
+        BatchClause = "{} AND {} >= {} AND {} <= {}".format(ArchiveClause, oid_field, batch[0], oid_field, batch[-1])
+
+        arcpy.AddMessage("\nArchiving batch {} of {} records".format(result["batches"] + 1, len(batch)))
+        summary = CopyRecords(Reviewer_Workspace, SessionsList, Archive_Workspace, Archive_Session, BatchClause,
+                              Delete=True, CreateLog=CreateLog)
+
+        if summary is None or not summary.get("Verification", {}).get("passed", False):
+            arcpy.AddError("Batch {} was not archived.  {} records were archived before it.".format(
+                result["batches"] + 1, result["records"]))
+            return None
+
+        result["batches"] += 1
+        result["records"] += int(summary.get("REVTABLEMAIN", 0))
+
+    arcpy.AddMessage("\nTotal Records Archived: {} in {} batches".format(result["records"], result["batches"]))
+    return result
+
+# ------------------------------------------------------------------
+# Splits a semicolon delimited list of integers from the toolbox
+# ------------------------------------------------------------------
+def SplitIntegers(value):
+    return [int(item) for item in value.split(";") if item.strip()]
+
+def main():
+
+    # Script arguments
+    Reviewer_Workspace = arcpy.GetParameterAsText(0)
+    Sessions = arcpy.GetParameterAsText(1)
+    Archive_Workspace = arcpy.GetParameterAsText(2)
+    Archive_Session = arcpy.GetParameterAsText(3)
+    Statuses = arcpy.GetParameterAsText(4)
+    Phases = arcpy.GetParameterAsText(5)
+    OlderThanDays = arcpy.GetParameterAsText(6)
+    DateField = arcpy.GetParameterAsText(7)
+    BatchSize = arcpy.GetParameterAsText(8)
+    createLog = arcpy.GetParameterAsText(9)
+
+    SessionsList = [value.strip("'") for value in Sessions.split(";")]
+
+    ArchiveRecords(Reviewer_Workspace, SessionsList, Archive_Workspace, Archive_Session,
+                   SplitIntegers(Statuses), SplitIntegers(Phases),
+                   float(OlderThanDays) if OlderThanDays else None, DateField or "VERIFICATIONDATE",
+                   int(BatchSize) if BatchSize else ARCHIVE_BATCH_SIZE, createLog == "true")
+
+if __name__ == '__main__':
+    RunTool(main)
@@ -0,0 +1,337 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Compares the reviewer records of two Reviewer workspaces, such as before and
+# after a migration, and writes the records missing from the second
+# workspace, the extra records in it and the records that differ to a .csv
+# report.  Records are matched by session name, origin table, origin objectid
+# and origin check, since the record ids change when records are copied.
+#
+# Each workspace is read once.  The REVTABLEMAIN records and the geometries
+# are sorted together by record id to attach the geometries to their records,
+# then sorted again by the matching key, and the two sorted streams are merged.
+# The sorts keep COMPARE_BUFFER_ROWS rows in memory and write the rest to
+# temporary run files, so memory use does not grow with the number of records.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import arcpy
+import csv
+import hashlib
+import heapq
+import itertools
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+
+from CopyDataReviewerRecords import getFullPath, GetSchema, NormalizeValue, FINGERPRINT_MASK, RunTool
+from ReviewerRecordStream import GEOMETRY_TABLES, MakeSessionClause
+from ReviewerRecordSinks import ReadRun, CsvValue
+
+# REVTABLEMAIN fields the records of the two workspaces are matched by, after
+# the session name
+COMPARE_KEY_FIELDS = ("ORIGINTABLE", "OBJECTID", "ORIGINCHECK")
+
+# REVTABLEMAIN fields that are changed by a copy and are not compared
+COMPARE_SKIP_FIELDS = ("SESSIONID", "CHECKRUNID", "RECORDID", "ID")
+
+# Number of rows each sort keeps in memory
+COMPARE_BUFFER_ROWS = 50000
+
+# Report columns, and the status of each record in the report
+REPORT_FIELDS = ("STATUS", "SESSIONNAME") + COMPARE_KEY_FIELDS + ("DIFFERENCES",)
+MISSING = "MISSING"
+EXTRA = "EXTRA"
+CHANGED = "CHANGED"
+
+# -----------------------------------------------------------------------
+# Returns a dictionary of session id: session name of the sessions to
+# compare, every session when SessionsList is empty, and the total number
+# of sessions in the workspace
+# -----------------------------------------------------------------------
+def ReadSessions(SessionsTable, SessionsList):
+    sessions = {}
+    rowcount = 0
+    with arcpy.da.SearchCursor(SessionsTable, ["SESSIONID", "SESSIONNAME"]) as rows:
+        for row in rows:
+            rowcount += 1
+            if not SessionsList or row[1] in SessionsList:
+                sessions[row[0]] = row[1]
+
+    return sessions, rowcount
+
+# ------------------------------------------------------------------------------
+# Sorts rows in bounded memory.  Full buffers are sorted and written to
+# temporary run files, which are merged as the sorted rows are read back
+# ------------------------------------------------------------------------------
+def IterSorted(rows, size=COMPARE_BUFFER_ROWS):
+    folder = None
+    runs = []
+    buffer = []
+    try:
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= size:
+                buffer.sort()
+                if folder is None:
+                    folder = tempfile.mkdtemp(prefix="reviewer_compare_")
+                path = os.path.join(folder, "run{}.bin".format(len(runs)))
+                with open(path, "wb") as f:
+                    for value in buffer:
+                        pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+                runs.append(path)
+                buffer = []
+
+        buffer.sort()
+        if not runs:
+            for value in buffer:
+                yield value
+        else:
+            for value in heapq.merge(buffer, *[ReadRun(path) for path in runs]):
+                yield value
+    finally:
+        if folder is not None:
+            shutil.rmtree(folder, ignore_errors=True)
+
+# --------------------------------------------------------------
+# Returns a value that sorts with None first and compares exactly
+# --------------------------------------------------------------
+def SortValue(value):
+    return (value is not None, value)
+
+# --------------------------------------------------------------
+# Returns a link id as it is compared across the Reviewer tables
+# --------------------------------------------------------------
+def LinkValue(value):
+    if hasattr(value, "upper"):
+        value = value.upper()
+    return SortValue(value)
+
+# ------------------------------------------------------------------------------
+# Reads the records and geometries of a workspace.  Returns rows of
+# (link id, 0, key, values) for the records and (link id, 1, geometry hash)
+# for the geometries, so sorting them puts each record before its geometries
+# ------------------------------------------------------------------------------
+def IterLinkedRows(ReviewerWorkspace, sessions, SessionClause, fields, fieldTypes, MatchSessions, CompareShapes):
+    REVTABLEMAIN = getFullPath(ReviewerWorkspace, "REVTABLEMAIN", True)
+    schema = GetSchema(REVTABLEMAIN)
+    keySize = len(COMPARE_KEY_FIELDS)
+
+    readFields = [schema.id_field, "SESSIONID"] + list(COMPARE_KEY_FIELDS) + list(fields)
+    with arcpy.da.SearchCursor(REVTABLEMAIN, readFields, SessionClause) as cursor:
+        for row in cursor:
+            key = tuple(SortValue(value) for value in row[2:2 + keySize])
+            if MatchSessions:
+                key = (SortValue(sessions.get(row[1])),) + key
+            values = tuple(NormalizeValue(value, fieldType) for value, fieldType in zip(row[2 + keySize:], fieldTypes))
+            yield (LinkValue(row[0]), 0, key, values)
+
+    for table_name, geom_type in GEOMETRY_TABLES:
+        table = getFullPath(ReviewerWorkspace, table_name)
+        if table == '':
+            continue
+
+        table_schema = GetSchema(table)
+        if not CompareShapes:
+            shape_field = None
+        elif table_schema.has('BITMAP'):
+            shape_field = 'BITMAP'
+        else:
+            shape_field = 'SHAPE@WKB'
+
+        with arcpy.da.SearchCursor(table, [table_schema.link_field] + ([shape_field] if shape_field else []),
+                                   SessionClause) as cursor:
+            for row in cursor:
+                digest = hashlib.md5(table_name.encode('utf-8'))
+                if shape_field and row[1] is not None:
+                    digest.update(bytes(row[1]))
+                yield (LinkValue(row[0]), 1, int(digest.hexdigest(), 16))
+
+# ------------------------------------------------------------------------------
+# Returns the records of a workspace sorted by their key, as rows of
+# (key, sequence, values, geometry fingerprint).  The fingerprints of the
+# geometries of a record are added together, so their order does not matter
+# ------------------------------------------------------------------------------
+def IterKeyedRecords(ReviewerWorkspace, SessionsList, fields, fieldTypes, MatchSessions, CompareShapes):
+    SessionsTable = getFullPath(ReviewerWorkspace, "REVSESSIONTABLE", True)
+    sessions, rowcount = ReadSessions(SessionsTable, SessionsList)
+    SessionClause = MakeSessionClause(SessionsTable, sessions.keys(), rowcount)
+
+    def records():
+        rows = IterSorted(IterLinkedRows(ReviewerWorkspace, sessions, SessionClause, fields, fieldTypes,
+                                         MatchSessions, CompareShapes))
+        for sequence, (link, group) in enumerate(itertools.groupby(rows, key=lambda row: row[0])):
+            record = None
+            shape = 0
+            for row in group:
+                if row[1] == 0:
+                    record = row
+                else:
+                    shape = (shape + row[2]) & FINGERPRINT_MASK
+
+            # Geometries without a record are not compared
+            if record is not None:
+                yield (record[2], sequence, record[3], shape)
+
+    return IterSorted(records())
+
+# ------------------------------------------------------------------------------
+# Merges the sorted records of the two workspaces.  Returns (key, records of
+# the first workspace, records of the second workspace) for each key, each
+# record as (values, geometry fingerprint)
+# ------------------------------------------------------------------------------
+def IterMatchedRecords(first, second):
+    tagged = heapq.merge(((key, 0, sequence, values, shape) for key, sequence, values, shape in first),
+                         ((key, 1, sequence, values, shape) for key, sequence, values, shape in second))
+
+    for key, group in itertools.groupby(tagged, key=lambda row: row[0]):
+        records = ([], [])
+        for row in group:
+            records[row[1]].append((row[3], row[4]))
+        yield key, records[0], records[1]
+
+# ------------------------------------------------------------------------------
+# Returns the names of the fields that differ between two records, with SHAPE
+# when the geometries differ
+# ------------------------------------------------------------------------------
+def Differences(fields, record, other):
+    names = [name for name, value, otherValue in zip(fields, record[0], other[0]) if value != otherValue]
+    if record[1] != other[1]:
+        names.append("SHAPE")
+    return names
+
+# ------------------------------------------------------------------------------
+# Compares the records of two Reviewer workspaces and writes the differences
+# to a .csv report.  Can be called from other scripts without the toolbox.
+#   ReviewerWorkspace (str): path to the first Reviewer workspace
+#   OtherWorkspace (str): path to the Reviewer workspace compared with it
+#   OutReport (str): output .csv file
+#   SessionsList (list of str): names of the sessions compared in both
+#       workspaces.  Every session when empty
+#   MatchSessions (bool): match records by session name as well.  When False
+#       records are matched across sessions, such as when several sessions
+#       were copied into one
+# Records of the first workspace not in the other are reported as MISSING,
+# records only in the other as EXTRA and matched records that differ as
+# CHANGED, with the names of the fields that differ.  Returns a dictionary
+# with the number of records of each status, or None if the compare failed
+# ------------------------------------------------------------------------------
+def CompareRecords(ReviewerWorkspace, OtherWorkspace, OutReport, SessionsList=None, MatchSessions=True):
+
+    if not OutReport.lower().endswith(".csv"):
+        arcpy.AddError("The report {} must be a .csv file.".format(OutReport))
+        return None
+    if os.path.exists(OutReport):
+        arcpy.AddError("Output {} already exists.".format(OutReport))
+        return None
+
+    SessionsList = [value.strip("'") for value in (SessionsList or [])]
+
+    REVTABLEMAIN = getFullPath(ReviewerWorkspace, "REVTABLEMAIN", True)
+    Other_REVTABLEMAIN = getFullPath(OtherWorkspace, "REVTABLEMAIN", True)
+    schema = GetSchema(REVTABLEMAIN)
+    other_schema = GetSchema(Other_REVTABLEMAIN)
+
+    # The fields of both workspaces, without the ids changed by a copy
+    fields = [name for name in schema.fields
+              if other_schema.has(name) and name not in COMPARE_KEY_FIELDS and name not in COMPARE_SKIP_FIELDS
+              and schema.types[name] not in ('OID', 'GlobalID', 'Geometry', 'Blob', 'Raster')]
+    fieldTypes = [schema.types[name] for name in fields]
+
+    # Geometries in different spatial references are only compared by table
+    CompareShapes = True
+    for table_name, geom_type in GEOMETRY_TABLES:
+        table = getFullPath(ReviewerWorkspace, table_name)
+        other_table = getFullPath(OtherWorkspace, table_name)
+        if table != '' and other_table != '' and (
+                GetSchema(table).spatial_reference.name != GetSchema(other_table).spatial_reference.name):
+            arcpy.AddWarning("The spatial references of {} differ, geometries are not compared.".format(table_name))
+            CompareShapes = False
+
+    arcpy.AddMessage("Comparing {} fields of {} and {}".format(len(fields), ReviewerWorkspace, OtherWorkspace))
+
+    first = IterKeyedRecords(ReviewerWorkspace, SessionsList, fields, fieldTypes, MatchSessions, CompareShapes)
+    second = IterKeyedRecords(OtherWorkspace, SessionsList, fields, fieldTypes, MatchSessions, CompareShapes)
+
+    counts = {MISSING: 0, EXTRA: 0, CHANGED: 0, "matched": 0}
+
+    if sys.version_info[0] < 3:
+        f = open(OutReport, "wb")
+    else:
+        f = open(OutReport, "w", newline='', encoding="utf-8")
+
+    with f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_FIELDS)
+
+        for key, records, others in IterMatchedRecords(first, second):
+            keyValues = [value[1] for value in key]
+            if not MatchSessions:
+                keyValues.insert(0, None)
+
+            # Identical records are matched first, the rest are paired in
+            # the order they were read
+            unmatched = []
+            for record in records:
+                if record in others:
+                    others.remove(record)
+                    counts["matched"] += 1
+                else:
+                    unmatched.append(record)
+
+            rows = []
+            for record, other in zip(unmatched, others):
+                rows.append((CHANGED, ";".join(Differences(fields, record, other))))
+            rows += [(MISSING, None)] * (len(unmatched) - len(others))
+            rows += [(EXTRA, None)] * (len(others) - len(unmatched))
+
+            for status, differences in rows:
+                counts[status] += 1
+                writer.writerow([CsvValue(value) for value in [status] + keyValues + [differences]])
+
+    arcpy.AddMessage("{} records matched, {} missing, {} extra and {} changed.  Report written to {}".format(
+        counts["matched"], counts[MISSING], counts[EXTRA], counts[CHANGED], OutReport))
+
+    result = dict((status.lower(), count) for status, count in counts.items())
+    result["report"] = OutReport
+    return result
+
+def main():
+
+    # Script arguments
+    ReviewerWorkspace = arcpy.GetParameterAsText(0)
+    OtherWorkspace = arcpy.GetParameterAsText(1)
+    OutReport = arcpy.GetParameterAsText(2)
+    Sessions = arcpy.GetParameterAsText(3)
+    MatchSessions = arcpy.GetParameterAsText(4)
+
+    SessionsList = []
+    if Sessions:
+        SessionsList = Sessions.split(";")
+
+    CompareRecords(ReviewerWorkspace, OtherWorkspace, OutReport, SessionsList, MatchSessions != "false")
+
+if __name__ == '__main__':
+    RunTool(main)
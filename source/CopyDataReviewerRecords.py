@@ -23,6 +23,9 @@
 # can be the same as the input workspace. You have the option to create a
 # logfile that records information about the imported records. You also have
 # the option to delete the copied records from the input Reviewer Workspace.
+# When the input and output are the same non-versioned PostgreSQL enterprise
+# geodatabase, the records are copied with INSERT ... SELECT statements run in
+# the database.
 
 # Disclaimer:
 # Due to the complex relationship of tables within the Reviewer Workspace,
@@ -37,24 +40,221 @@
 # Import necessary modules
 import arcpy
 import os
+import binascii
+import collections
 import datetime
+import hashlib
+import itertools
+import multiprocessing
+import random
 import time
 import sys
 import uuid
 
 from arcpy import env
 
+from ReviewerStorage import IsSqliteWorkspace
+from SqliteReviewerRecords import CopyRecordsSql
+from ReviewerRunMap import RunMap, CHECK_RUNS, BATCH_RUNS
+from ReviewerRecordFilter import CompileRecordFilter
+from ReviewerNumPy import numpy, NUMPY_NULL_VALUES, NumPyColumnToList, MapCheckRuns
+
+# Field types arcpy.da.TableToNumPyArray cannot read into a structured array
+NUMPY_UNSUPPORTED_TYPES = ('Blob', 'Raster', 'Geometry')
+
+# Approximate number of rows per second written by the copy and export. Used
+# by the plan only mode to estimate run times
+COPY_ROWS_PER_SECOND = 2000.0
+COPY_BLOB_ROWS_PER_SECOND = 200.0
+EXPORT_ROWS_PER_SECOND = 1000.0
+
+# Storage size of fixed length field types, in bytes
+FIELD_TYPE_BYTES = {'OID': 4, 'Integer': 4, 'SmallInteger': 2, 'Double': 8,
+                    'Single': 4, 'Date': 8, 'Guid': 38, 'GlobalID': 38}
+
+# Number of objectid ranges given to each parallel reader process.  More ranges
+# than readers keeps every reader busy when the objectids are uneven
+PARALLEL_RANGES_PER_READER = 4
+
+# Largest number of rows in one objectid range, and the number of ranges per
+# reader read ahead of the writer.  Together they bound the rows held in
+# memory while the writer catches up
+PARALLEL_RANGE_ROWS = 50000
+PARALLEL_PENDING_PER_READER = 2
+
+# Largest number of values used in one SQL IN clause.  Some dbms limit IN
+# predicates to 1000 candidates
+MAX_IN_VALUES = 1000
+
+# Keys of the dictionaries of copied rows that are not row ids
+MATCH_INFO_KEYS = ('tableName', 'InIDField', 'OutIDField')
+
+# Largest where clause some dbms accept
+MAX_WHERE_CLAUSE_LENGTH = 1000
+
+# Written to BLOB fields that are NULL or not copied, BLOB fields cannot be
+# set to None
+EMPTY_BLOB = bytearray()
+
+# Number of rows read to estimate the average size of geometries and BLOBs
+PLAN_SAMPLE_SIZE = 100
+
+# SQL of the dbms that same-database copies run in with INSERT ... SELECT
+# statements: a new objectid and GUID, the temporary mapping table of old to
+# new ids, counting the rows an INSERT statement wrote and an empty BLOB
+IN_DATABASE_SQL = {"PostgreSQL": {"rowid": "sde.next_rowid('{owner}', '{table}')",
+                                  "guid": "sde.next_globalid()",
+                                  "mapping": "CREATE TEMPORARY TABLE {} (old varchar(38) PRIMARY KEY, "
+                                             "new varchar(38)) ON COMMIT DROP",
+                                  "count": "WITH inserted AS ({} RETURNING 1) SELECT COUNT(*) FROM inserted",
+                                  "empty_blob": "''::bytea"}}
+
+# Reviewer tables linked to REVTABLEMAIN by record id
+IN_DATABASE_LINKED_TABLES = ("REVTABLEPOINT", "REVTABLELINE", "REVTABLEPOLY", "REVTABLELOCATION")
+
+# Reviewer tables written by a same-database copy
+IN_DATABASE_TABLES = ("REVTABLEMAIN",) + IN_DATABASE_LINKED_TABLES + ("REVCHECKRUNTABLE", "REVBATCHRUNTABLE")
+
+# Temporary tables mapping the input ids to the new ids, and the runs copied
+# by earlier copies found in the run map
+IN_DATABASE_MAPPING_TABLES = ("copy_records", "copy_checkruns", "copy_batchruns", "reused_checkruns",
+                              "reused_batchruns")
+
+# Fingerprints of the rows sharing a key are added modulo 2**128
+FINGERPRINT_MASK = (1 << 128) - 1
+
+# Number of missing or different records listed by the verification
+VERIFY_REPORT_LIMIT = 10
+
+# Number of processes fingerprinting the input and output tables at the same
+# time during the verification
+VERIFY_PROCESSES = 4
+
+# Table paths, table schemas and workspace versions found by getFullPath,
+# GetSchema and DetermineVersion.  Kept for the life of the process, so a run
+# or a worker serving many jobs only looks them up once per workspace.  Tables
+# that were not found are not kept.  RefreshMetadataCache drops the metadata
+# of a workspace changed since it was cached
+METADATA_CACHE = {}
+
+# Modification time of each workspace file or folder when RefreshMetadataCache
+# last checked it
+WORKSPACE_STAMPS = {}
+
+# -------------------------------------------------------------
+# Removes the cached table paths, schemas and workspace versions
+# -------------------------------------------------------------
+def ClearMetadataCache():
+    METADATA_CACHE.clear()
+    WORKSPACE_STAMPS.clear()
+
+# ------------------------------------------------------------------------------
+# Drops the cached metadata of the workspaces whose file or folder was modified
+# since the last refresh, such as a file geodatabase with a new table.  Called
+# at the start of each run, so the metadata stays the same during a run.
+# Database connection files only change when the connection does
+# ------------------------------------------------------------------------------
+def RefreshMetadataCache(*workspaces):
+    for in_workspace in workspaces:
+        if not in_workspace:
+            continue
+        try:
+            stamp = os.path.getmtime(in_workspace)
+        except (OSError, TypeError):
+            stamp = None
+
+        if in_workspace in WORKSPACE_STAMPS and WORKSPACE_STAMPS[in_workspace] != stamp:
+            prefix = os.path.join(str(in_workspace), '')
+            for key in list(METADATA_CACHE):
+                if str(key[1]) == str(in_workspace) or str(key[1]).startswith(prefix):
+                    del METADATA_CACHE[key]
+        WORKSPACE_STAMPS[in_workspace] = stamp
+
+# ------------------------------------------------------------------------------
+# Field names, types and versioning of a table, read with one Describe call.
+# Use GetSchema to get the cached schema of a table
+# ------------------------------------------------------------------------------
+class TableSchema(object):
+
+    def __init__(self, table):
+        desc = arcpy.Describe(table)
+
+        self.path = table
+        self.fields = [x.name for x in desc.fields]
+        self.types = dict((x.name, x.type) for x in desc.fields)
+        self.lengths = dict((x.name, x.length) for x in desc.fields)
+        self.names = dict((name.upper(), name) for name in self.fields)
+
+        self.oid_field = getattr(desc, 'OIDFieldName', None)
+        self.can_version = getattr(desc, 'canVersion', False)
+        self.is_versioned = getattr(desc, 'isVersioned', False)
+        self.spatial_reference = getattr(desc, 'spatialReference', None)
+
+        # REVTABLEMAIN record id, ID at 10.6 and RECORDID before
+        self.id_field = 'ID' if self.has('ID') else 'RECORDID'
+        # run table GUID, GLOBALID before 10.6 and ID at 10.6
+        self.guid_field = 'GLOBALID' if self.has('GLOBALID') else 'ID'
+        # geometry table link to REVTABLEMAIN
+        self.link_field = 'LINKID' if self.has('LINKID') else 'LINKGUID'
+
+    def has(self, name):
+        return name.upper() in self.names
+
+    def field_type(self, name):
+        return self.types.get(self.names.get(name.upper()))
+
+    def versioned(self):
+        return self.can_version == 1 and self.is_versioned == 1
+
+# -----------------------------------------------------
+# Returns the cached schema of a table
+# -----------------------------------------------------
+def GetSchema(table):
+    key = ("schema", table)
+    if key not in METADATA_CACHE:
+        METADATA_CACHE[key] = TableSchema(table)
+    return METADATA_CACHE[key]
+
+# -----------------------------------------------------
+# Returns the cached workspace type of a workspace
+# -----------------------------------------------------
+def GetWorkspaceType(in_workspace):
+    key = ("workspaceType", in_workspace)
+    if key not in METADATA_CACHE:
+        METADATA_CACHE[key] = arcpy.Describe(in_workspace).workspaceType
+    return METADATA_CACHE[key]
+
 #-------------------------------------
 # get full path to tables - including qualified table name
 # -----------------------------------
 def getFullPath(in_workspace, table_name, no_exist_error=False):
 
+    key = ("path", in_workspace, table_name.upper())
+    full_path = METADATA_CACHE.get(key)
+    if full_path is None:
+        full_path = FindFullPath(in_workspace, table_name)
+        # A missing table is looked for again, it may be created later
+        if full_path != '':
+            METADATA_CACHE[key] = full_path
+
+    # if the table cannot be found in the workspace
+    if no_exist_error and (full_path == '' or not arcpy.Exists(full_path)):
+            raise ValueError("Cannot find table {} in workspace {}.  Please ensure workspace is a valid Reviewer workspace.".format(table_name, in_workspace))
+
+##    arcpy.AddMessage(full_path)
+    return full_path
+
+#-------------------------------------
+# search the workspace for a table - including qualified table name
+# -----------------------------------
+def FindFullPath(in_workspace, table_name):
+
     full_path = ''
 
     """In 10.6, the walk function does not return any tables if
     connecting to a SQL Express database as a database server.  However,
     it works when using a .sde connection.  This is a workaround"""
-    if arcpy.Describe(in_workspace).workspaceType == 'RemoteDatabase' and not str(in_workspace).upper().endswith('.SDE'):
+    if GetWorkspaceType(in_workspace) == 'RemoteDatabase' and not str(in_workspace).upper().endswith('.SDE'):
 ##        arcpy.AddMessage("list")
         arcpy.env.workspace = in_workspace
 
@@ -90,18 +290,16 @@ def getFullPath(in_workspace, table_name, no_exist_error=False):
                     full_path = (os.path.join(dirpath, name))
                     break
 
-    # if the table cannot be found in the workspace
-    if no_exist_error and (full_path == '' or not arcpy.Exists(full_path)):
-            arcpy.AddError("Cannot find table {} in workspace {}.  Please ensure workspace is a valid Reviewer workspace.".format(table_name, in_workspace))
-            sys.exit(0)
-
-##    arcpy.AddMessage(full_path)
     return full_path
 
 # ---------------------------------------------------------------------------
 # This function determines if the version of the Reviewer Workspace
 # ---------------------------------------------------------------------------
 def DetermineVersion(RevWorkspace):
+    key = ("version", RevWorkspace)
+    if key in METADATA_CACHE:
+        return METADATA_CACHE[key]
+
     version = 'Pre10.6'
 
     VERSIONTABLE = getFullPath(RevWorkspace, "REVWORKSPACEVERSION")
@@ -121,11 +319,11 @@ def DetermineVersion(RevWorkspace):
 
     else:
         main_table = getFullPath(RevWorkspace, "REVTABLEMAIN", True)
-        fields =[x.name.upper() for x in arcpy.ListFields(main_table)]
-        if "LIFECYCLEPHASE" not in fields:
+        if not GetSchema(main_table).has("LIFECYCLEPHASE"):
             version = 'Pre10.3'
 
 ##    arcpy.AddMessage('database {} is version {}'.format(RevWorkspace, version))
+    METADATA_CACHE[key] = version
     return version
 
 
@@ -135,12 +333,10 @@ def DetermineVersion(RevWorkspace):
 def CompareSR(InFeatures, OutFeatures):
 
     # Get the spatial reference name from the first feature class
-    InDesc = arcpy.Describe(InFeatures)
-    InSR = InDesc.spatialReference.name
+    InSR = GetSchema(InFeatures).spatial_reference.name
 
     # Get the spatial reference name from the second feature class
-    OutDesc = arcpy.Describe(OutFeatures)
-    OutSR = OutDesc.spatialReference.name
+    OutSR = GetSchema(OutFeatures).spatial_reference.name
 
     # Do the feature class names match?
     if InSR == OutSR:
@@ -180,33 +376,42 @@ def SummarizeDictionaries(logfile, matches, summarydict):
 
     return summarydict
 
+# ------------------------------------------------------------------------------
+# Reads a BLOB field for a list of objectids, a chunk of rows at a time.  Yields
+# (objectid, blob) so each BLOB can be written before the next one is read
+# ------------------------------------------------------------------------------
+def IterBlobs(inTable, blobField, oids):
+    oid_field = GetSchema(inTable).oid_field
+    oids = sorted(oids)
+
+    for i in range(0, len(oids), MAX_IN_VALUES):
+        whereClause = MakeInClause(inTable, oid_field, oids[i:i + MAX_IN_VALUES])
+        with arcpy.da.SearchCursor(inTable, ["OID@", blobField], whereClause) as cursor:
+            for row in cursor:
+                yield row
+
 # ------------------------------------------------------------------------------
 # Copies reviewer geometry features to the output reviewer workspace and session
 # ------------------------------------------------------------------------------
 def CopyGeometryFeatures(inFeatures, outFeatures, sessionWhereClause, idMap, outSessionID, matchDict):
     # determine fields from input feature class
-    in_names =[x.name for x in arcpy.ListFields(inFeatures)]
+    in_schema = GetSchema(inFeatures)
+    in_link_name = in_schema.link_field
 
-    if "LINKID" in in_names:
-        in_link_name = "LINKID"
-    else:
-        in_link_name = "LINKGUID"
-
-    if 'BITMAP' in in_names:
-        in_fields = ("OID@", in_link_name, 'BITMAP')
+    # BITMAP is read in a second pass, only for the rows that are copied
+    has_bitmap = in_schema.has('BITMAP')
+    if has_bitmap:
+        in_fields = ("OID@", in_link_name)
     else:
         in_fields = ("OID@", in_link_name, "SHAPE@")
 
 ##        arcpy.AddMessage(in_fields)
 
     # determine fields from output feature class
-    out_names =[x.name for x in arcpy.ListFields(outFeatures)]
-    if "LINKID" in out_names:
-        out_link_name = "LINKID"
-    else:
-        out_link_name = "LINKGUID"
+    out_schema = GetSchema(outFeatures)
+    out_link_name = out_schema.link_field
 
-    if 'BITMAP' in out_names:
+    if out_schema.has('BITMAP'):
         out_fields = (out_link_name, "SESSIONID", 'BITMAP')
     else:
         out_fields = (out_link_name, "SESSIONID", "SHAPE@")
@@ -216,6 +421,9 @@ def CopyGeometryFeatures(inFeatures, outFeatures, sessionWhereClause, idMap, out
     matchDict["InIDField"] = in_link_name
     matchDict["OutIDField"] = out_link_name
 
+    # objectid: output link id of the BITMAP rows to copy
+    bitmap_rows = {}
+
     # open insert cursor
     insert = arcpy.da.InsertCursor(outFeatures, out_fields)
 
@@ -232,16 +440,39 @@ def CopyGeometryFeatures(inFeatures, outFeatures, sessionWhereClause, idMap, out
                     outLinkID = idMap[linkID]
 ##                        arcpy.AddMessage(outLinkID)
 
-                    # add new row to output feature class
-                    new_row = [outLinkID, outSessionID, row[2]]
-                    outID = insert.insertRow(new_row)
+                    if has_bitmap:
+                        bitmap_rows[row[0]] = outLinkID
+                    else:
+                        # add new row to output feature class
+                        insert.insertRow((outLinkID, outSessionID, row[2]))
 
                     matchDict[linkID] = outLinkID
 ##                        inIDs.append(row[0])
 ##                        outIDs.append(outID)
+
+        # The BLOB from the search cursor is passed straight to the insert
+        # cursor, one row at a time
+        for oid, bitmap in IterBlobs(inFeatures, 'BITMAP', bitmap_rows.keys()):
+            insert.insertRow((bitmap_rows[oid], outSessionID, bitmap))
     finally:
         del insert
 
+# ------------------------------------------------------------------------------
+# Copies the geometry features of the copied records.  When only a sample of
+# the records is copied, the features are read by the link ids of the sample
+# instead of by session
+# ------------------------------------------------------------------------------
+def CopyLinkedFeatures(inFeatures, outFeatures, sessionWhereClause, linkIDs, idMap, outSessionID, matchDict,
+                       oids=None):
+    whereClauses = [sessionWhereClause]
+    if oids is not None:
+        whereClauses = ChunkClauses(inFeatures, GetSchema(inFeatures).oid_field, oids)
+    elif linkIDs is not None:
+        whereClauses = ChunkClauses(inFeatures, GetSchema(inFeatures).link_field, linkIDs)
+
+    for whereClause in whereClauses:
+        CopyGeometryFeatures(inFeatures, outFeatures, whereClause, idMap, outSessionID, matchDict)
+
 # ---------------------------------------------------
 # Makes a SQL IN clause from a list of values
 # ---------------------------------------------------
@@ -251,12 +482,7 @@ def MakeInClause(inFC, intFieldName, inList):
 
         if len(inList) >= 1:
             # determine field type
-            fields = arcpy.ListFields(inFC)
-            field_type = None
-            for field in fields:
-
-                if field.name.upper() == intFieldName.upper():
-                    field_type = field.type
+            field_type = GetSchema(inFC).field_type(intFieldName)
 
             if field_type:
                 csv = ""
@@ -287,19 +513,333 @@ def MakeInClause(inFC, intFieldName, inList):
         return whereClause
 
 # ------------------------------------------------------------------
-# Deletes rows from an input table/feature class given a list of IDs
+# Makes the where clauses selecting a list of values from a table,
+# MAX_IN_VALUES values at a time
+# ------------------------------------------------------------------
+def ChunkClauses(table, field, values):
+    values = sorted(values)
+    return [MakeInClause(table, field, values[i:i + MAX_IN_VALUES]) for i in range(0, len(values), MAX_IN_VALUES)]
+
+# ------------------------------------------------------------
+# Returns the input id: output id pairs of a dictionary of
+# copied rows, without the table and field names
+# ------------------------------------------------------------
+def RowIDMatches(matches):
+    return dict((key, value) for key, value in matches.items() if key not in MATCH_INFO_KEYS)
+
+# ------------------------------------------------------------------------------
+# Picks a random sample of the REVTABLEMAIN records that meet the where clause
+# with one pass of a cursor.  Each value of StratifyField is sampled on its
+# own, so SampleSize records are kept for each value, such as 500 of each
+# ORIGINCHECK.  Only the objectid and record id of the kept records are held
+# in memory.  Only the records matching Filter, a compiled RecordFilter, are
+# sampled.  Returns a dictionary of objectid: record id
+# ------------------------------------------------------------------------------
+def SampleRecords(REVTABLEMAIN, whereClause, SampleSize, StratifyField=None, Seed=None, Filter=None):
+    fields = ["OID@", GetSchema(REVTABLEMAIN).id_field]
+    if StratifyField:
+        fields.append(StratifyField)
+
+    matches = None
+    if Filter is not None:
+        fields.extend(Filter.names)
+        matches = Filter.predicate(fields)
+
+    rng = random.Random(Seed)
+    SampleSize = int(SampleSize)
+
+    # stratum: [records seen, [(objectid, record id), ...]]
+    reservoirs = {}
+
+    with arcpy.da.SearchCursor(REVTABLEMAIN, fields, whereClause) as cursor:
+        for row in cursor:
+            if matches is not None and not matches(row):
+                continue
+
+            stratum = row[2] if StratifyField else None
+            reservoir = reservoirs.get(stratum)
+            if reservoir is None:
+                reservoir = [0, []]
+                reservoirs[stratum] = reservoir
+
+            reservoir[0] += 1
+            if len(reservoir[1]) < SampleSize:
+                reservoir[1].append((row[0], row[1]))
+            else:
+                # Keep the record with a probability of SampleSize / records seen
+                i = rng.randrange(reservoir[0])
+                if i < SampleSize:
+                    reservoir[1][i] = (row[0], row[1])
+
+    sample = {}
+    seen = 0
+    for count, rows in reservoirs.values():
+        seen += count
+        sample.update(rows)
+
+    arcpy.AddMessage("Sampled {} of {} records from {} groups".format(len(sample), seen, len(reservoirs)))
+    return sample
+
+# ---------------------------------------------------
+# Creates a batch of new GUIDs in the Reviewer format
+# ---------------------------------------------------
+def NewGUIDs(count):
+    # One call for the random bytes of every GUID in the batch
+    raw = bytearray(os.urandom(16 * count))
+
+    # Set the version 4 and variant bits, same as uuid.uuid4()
+    raw[6::16] = bytearray((b & 0x0F) | 0x40 for b in raw[6::16])
+    raw[8::16] = bytearray((b & 0x3F) | 0x80 for b in raw[8::16])
+
+    hexed = binascii.hexlify(raw).decode('ascii').upper()
+
+    guids = []
+    for i in range(0, len(hexed), 32):
+        h = hexed[i:i + 32]
+        guids.append('{' + h[0:8] + '-' + h[8:12] + '-' + h[12:16] + '-' + h[16:20] + '-' + h[20:32] + '}')
+
+    return guids
+
+# ------------------------------------------------------------------------------
+# Splits the objectids of the records that meet the where clause into about
+# count ranges of [low, high), more when the ranges would hold more than
+# PARALLEL_RANGE_ROWS records.  Only the objectid column is read
+# ------------------------------------------------------------------------------
+def ObjectIDRanges(table, whereClause, count):
+    low = None
+    high = None
+    rows = 0
+    with arcpy.da.SearchCursor(table, ["OID@"], whereClause) as cursor:
+        for row in cursor:
+            rows += 1
+            if low is None or row[0] < low:
+                low = row[0]
+            if high is None or row[0] > high:
+                high = row[0]
+
+    if low is None:
+        return []
+
+    count = max(count, rows // PARALLEL_RANGE_ROWS + 1)
+    step = max(1, (high - low + count) // count)
+    return [(start, min(start + step, high + 1)) for start in range(low, high + 1, step)]
+
+# ------------------------------------------------------------------------------
+# Runs the parallel readers with the python executable.  Inside ArcGIS the
+# executable is the application, which cannot start worker processes
+# ------------------------------------------------------------------------------
+def SetMultiprocessingExecutable():
+    if not os.path.basename(sys.executable).lower().startswith("python"):
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, "python.exe" if os.name == 'nt' else "python"))
+
+# ------------------------------------------------------------------------------
+# Reads one objectid range of REVTABLEMAIN in a reader process and returns the
+# rows ready to insert, with the output session, new check run ids and, for
+# 10.6 workspaces, new record ids.  Returns the rows, the input record ids and
+# the check run id map of the range
+# ------------------------------------------------------------------------------
+def ReadMainPartition(task):
+    inTable, readFields, whereClause, idIndex, sessionIndex, checkRunIndex, outSessionID, newRecordIDs, recordFilter = task
+
+    # The filter expression is compiled again in each reader
+    matches = None
+    if recordFilter:
+        matches = CompileRecordFilter(recordFilter, readFields).predicate(readFields)
+
+    rows = []
+    inRecordIDs = []
+    checkRunIDs = set()
+    with arcpy.da.SearchCursor(inTable, readFields, whereClause) as cursor:
+        for row in cursor:
+            if matches is not None and not matches(row):
+                continue
+
+            # BLOB values are read as memoryview, which cannot be sent back
+            # to the writer
+            values = [bytearray(value) if isinstance(value, memoryview) else value for value in row]
+            values[sessionIndex] = outSessionID
+            if values[checkRunIndex]:
+                checkRunIDs.add(values[checkRunIndex])
+            inRecordIDs.append(values[idIndex])
+            rows.append(values)
+
+    checkRunIDs = sorted(checkRunIDs)
+    checkRunMap = dict(zip(checkRunIDs, NewGUIDs(len(checkRunIDs))))
+    for values in rows:
+        if values[checkRunIndex]:
+            values[checkRunIndex] = checkRunMap[values[checkRunIndex]]
+
+    if newRecordIDs:
+        for values, guid in zip(rows, NewGUIDs(len(rows))):
+            values[idIndex] = guid
+
+    return rows, inRecordIDs, checkRunMap
+
+# ------------------------------------------------------------------------------
+# Copies REVTABLEMAIN records by reading objectid ranges in parallel reader
+# processes.  The readers make the new ids, and this process, which holds the
+# edit session, writes the rows.  The ranges are merged in objectid order and
+# the first range to see a check run keeps its new id, so the id maps do not
+# depend on which reader finishes first.  Only PARALLEL_PENDING_PER_READER
+# ranges per reader are handed out ahead of the writer.  recordFilter is a filter expression
+# the readers test each row with.  Returns the number of records copied
+# ------------------------------------------------------------------------------
+def CopyMainTableParallel(inTable, outTable, readFields, writeFields, whereClause, idField, outSessionID,
+                          newRecordIDs, checkRunMap, rowMatches, readers, recordFilter=None):
+
+    idIndex = readFields.index(idField)
+    sessionIndex = readFields.index("SESSIONID")
+    checkRunIndex = readFields.index("CHECKRUNID")
+
+    ranges = ObjectIDRanges(inTable, whereClause, readers * PARALLEL_RANGES_PER_READER)
+    if not ranges:
+        return 0
+
+    oidField = arcpy.AddFieldDelimiters(inTable, GetSchema(inTable).oid_field)
+    tasks = []
+    for low, high in ranges:
+        rangeClause = "{0} >= {1} AND {0} < {2}".format(oidField, low, high)
+        if whereClause:
+            rangeClause = "({}) AND {}".format(whereClause, rangeClause)
+        tasks.append((inTable, readFields, rangeClause, idIndex, sessionIndex, checkRunIndex, outSessionID,
+                      newRecordIDs, recordFilter))
+
+    arcpy.AddMessage("  .. reading {} objectid ranges with {} readers".format(len(tasks), readers))
+
+    count = 0
+    SetMultiprocessingExecutable()
+    pool = multiprocessing.Pool(readers)
+    insert = arcpy.da.InsertCursor(outTable, writeFields)
+    try:
+        tasks = iter(tasks)
+        pending = collections.deque(pool.apply_async(ReadMainPartition, (task,))
+                                    for task in itertools.islice(tasks, readers * PARALLEL_PENDING_PER_READER))
+        while pending:
+            rows, inRecordIDs, rangeCheckRuns = pending.popleft().get()
+            for task in itertools.islice(tasks, 1):
+                pending.append(pool.apply_async(ReadMainPartition, (task,)))
+
+            # Check runs already seen in an earlier range keep that id
+            rename = {}
+            for old, new in rangeCheckRuns.items():
+                if old in checkRunMap:
+                    rename[new] = checkRunMap[old]
+                else:
+                    checkRunMap[old] = new
+
+            for inRecordID, values in zip(inRecordIDs, rows):
+                if rename and values[checkRunIndex] in rename:
+                    values[checkRunIndex] = rename[values[checkRunIndex]]
+                outRecordID = insert.insertRow(values)
+                rowMatches[inRecordID] = values[idIndex] if newRecordIDs else outRecordID
+
+            count += len(rows)
+    finally:
+        del insert
+        pool.terminate()
+        pool.join()
+
+    return count
+
+# ------------------------------------------------------------------------
+# Determines if REVTABLEMAIN records can be copied with the numpy bulk copy.
+# Records holding one of the NUMPY_NULL_VALUES integers would be copied
+# with NULL in its place, so they are copied one at a time.  Reviewer does
+# not store text holding only the SOH control character or dates in the
+# year 1
+# ------------------------------------------------------------------------
+def CanCopyBulk(fieldTypes, readFields, table, whereClause):
+    if numpy is None:
+        return False
+
+    for name in readFields:
+        if fieldTypes.get(name) in NUMPY_UNSUPPORTED_TYPES:
+            arcpy.AddMessage("Field {} is a {} field, copying records one at a time".format(name, fieldTypes[name]))
+            return False
+
+    nullClauses = ["{} = {}".format(arcpy.AddFieldDelimiters(table, name), NUMPY_NULL_VALUES[fieldTypes[name]])
+                   for name in readFields if fieldTypes.get(name) in ('Integer', 'SmallInteger')]
+    if nullClauses:
+        nullClause = " OR ".join(nullClauses)
+        if whereClause:
+            nullClause = "({}) AND ({})".format(whereClause, nullClause)
+        with arcpy.da.SearchCursor(table, ["OID@"], nullClause) as cursor:
+            for row in cursor:
+                arcpy.AddMessage("Records hold the value the bulk copy uses for NULL, copying records one at a time")
+                return False
+
+    return True
+
+# ------------------------------------------------------------------------------
+# Copies REVTABLEMAIN records by reading them into a numpy structured array,
+# updating the SESSIONID, CHECKRUNID and ID columns as whole columns and
+# writing the rows in one batch.  When matches is given only the rows it
+# returns True for are copied.  Returns the number of records copied
+# ------------------------------------------------------------------------------
+def CopyMainTableBulk(inTable, outTable, readFields, writeFields, fieldTypes, whereClause,
+                      idField, outSessionID, newRecordIDs, checkRunMap, rowMatches, matches=None):
+
+    nullValues = {}
+    for name in readFields:
+        if fieldTypes[name] in NUMPY_NULL_VALUES:
+            nullValues[name] = NUMPY_NULL_VALUES[fieldTypes[name]]
+
+    records = arcpy.da.TableToNumPyArray(inTable, readFields, whereClause, null_value=nullValues)
+    count = len(records)
+
+    if count == 0:
+        return count
+
+    columns = [NumPyColumnToList(records[name], fieldTypes[name]) for name in readFields]
+
+    if matches is not None:
+        keep = [i for i, row in enumerate(zip(*columns)) if matches(row)]
+        records = records[keep]
+        columns = [[column[i] for i in keep] for column in columns]
+        count = len(keep)
+
+        if count == 0:
+            return count
+
+    sessionIndex = readFields.index("SESSIONID")
+    checkRunIndex = readFields.index("CHECKRUNID")
+    idIndex = readFields.index(idField)
+
+    # All records move to the output session
+    columns[sessionIndex] = itertools.repeat(outSessionID, count)
+
+    # Create new check run IDs for each distinct CHECKRUNID
+    columns[checkRunIndex] = MapCheckRuns(records["CHECKRUNID"], checkRunMap, NewGUIDs)
+
+    inRecordIDs = columns[idIndex]
+    if newRecordIDs:
+        record_guids = NewGUIDs(count)
+        columns[idIndex] = record_guids
+
+    insert = arcpy.da.InsertCursor(outTable, writeFields)
+    try:
+        if newRecordIDs:
+            for values in zip(*columns):
+                insert.insertRow(values)
+            rowMatches.update(zip(inRecordIDs, record_guids))
+        else:
+            for inRecordID, values in zip(inRecordIDs, zip(*columns)):
+                rowMatches[inRecordID] = insert.insertRow(values)
+    finally:
+        del insert
+
+    return count
+
+# ------------------------------------------------------------------
+# Deletes rows from an input table/feature class given a list of IDs.
+# Only the rows with the IDs are read, MAX_IN_VALUES IDs at a time
 # ------------------------------------------------------------------
 def DeleteRows(inWorkspace, dictionary):
     del_count = 0
-    dict_count = 0
+    dict_cnt = 0
     table = None    
     edit = arcpy.da.Editor(inWorkspace)
-    #In Python 3, dict.keys() returns a dict_keys object (a view of the dictionary) which does not have remove method; 
-    # unlike Python 2, where dict.keys() returns a list object.
-    if arcpy.GetInstallInfo()['ProductName'] == 'Desktop':
-        idList = dictionary.keys()
-    else:
-        idList = list(dictionary) 
+    idList = set(dictionary) - set(MATCH_INFO_KEYS)
 
     try:
 
@@ -311,14 +851,6 @@ def DeleteRows(inWorkspace, dictionary):
             else:
                 field = 'OID@'
 
-            if 'tableName' in idList:
-                idList.remove('tableName')
-
-            if "InIDField" in idList:
-                idList.remove("InIDField")
-            if "OutIDField" in idList:
-                idList.remove("OutIDField")
-
             dict_cnt = len(idList)
 
             if table and len(idList) >= 1:
@@ -326,8 +858,7 @@ def DeleteRows(inWorkspace, dictionary):
                 if table_path != '':
 
                     # Start an edit session
-                    desc = arcpy.Describe(table_path)
-                    if desc.canVersion == 1 and desc.isVersioned == 1:
+                    if GetSchema(table_path).versioned():
                         edit.startEditing(False, True)
                         edit.startOperation()
                     else:           
@@ -337,21 +868,25 @@ def DeleteRows(inWorkspace, dictionary):
 
                     arcpy.AddMessage("Deleting records from {}".format(table_path))
 
-
-                    with arcpy.da.UpdateCursor(table_path, field) as cursor:
-                        for row in cursor:
-                            if row[0] in idList:
-                                idList.remove(row[0])
-                                del_count += 1
-                                cursor.deleteRow()
-
-    except Exception as e:
+                    if field == 'OID@':
+                        query_field = GetSchema(table_path).oid_field
+                    else:
+                        query_field = field
+
+                    for whereClause in ChunkClauses(table_path, query_field, idList):
+                        with arcpy.da.UpdateCursor(table_path, field, whereClause) as cursor:
+                            for row in cursor:
+                                if row[0] in idList:
+                                    idList.discard(row[0])
+                                    del_count += 1
+                                    cursor.deleteRow()
+
+    # The deletes are rolled back and the error raised, the copy must not be
+    # reported as moved
+    except Exception:
         if edit.isEditing:
             edit.stopEditing(False)
-
-        arcpy.AddError('{}'.format(e))
-        tb = sys.exc_info()[2]
-        arcpy.AddError("Failed at Line %i" % tb.tb_lineno)
+        raise
 
     finally:
         if del_count != dict_cnt:
@@ -360,10 +895,107 @@ def DeleteRows(inWorkspace, dictionary):
             edit.stopEditing(True)
 
 
+# ------------------------------------------------------------------------------
+# Removes the check runs still used by REVTABLEMAIN records, and the batch runs
+# still used by check runs, from the dictionaries of run table rows to delete.
+# Called after the copied REVTABLEMAIN records are deleted, so records that
+# were not copied keep their check run and batch run
+# ------------------------------------------------------------------------------
+def KeepReferencedRunRows(Reviewer_Workspace, CheckRunMatches, BatchRunMatches):
+    REVTABLEMAIN = getFullPath(Reviewer_Workspace, "REVTABLEMAIN", True)
+    REVCHECKRUN = getFullPath(Reviewer_Workspace, "REVCHECKRUNTABLE")
+    REVBATCHRUN = getFullPath(Reviewer_Workspace, "REVBATCHRUNTABLE")
+
+    if REVCHECKRUN == '' or REVBATCHRUN == '':
+        return
+
+    with arcpy.da.SearchCursor(REVTABLEMAIN, ["CHECKRUNID"]) as cursor:
+        checkRunIDs = set(row[0] for row in cursor if row[0])
+
+    batchRunIDs = set()
+    with arcpy.da.SearchCursor(REVCHECKRUN, ["RECORDID", "CHECKRUNID", "BATCHRUNID"]) as cursor:
+        for recordID, checkRunID, batchRunID in cursor:
+            if checkRunID in checkRunIDs:
+                CheckRunMatches.pop(recordID, None)
+            if recordID not in CheckRunMatches:
+                batchRunIDs.add(batchRunID)
+
+    with arcpy.da.SearchCursor(REVBATCHRUN, ["RECORDID", GetSchema(REVBATCHRUN).guid_field]) as cursor:
+        for recordID, batchRunID in cursor:
+            if batchRunID in batchRunIDs:
+                BatchRunMatches.pop(recordID, None)
+
+# ------------------------------------------------------------
+# Returns the values of a field found in a table, from a list
+# ------------------------------------------------------------
+def ExistingValues(table, field, values):
+    found = set()
+    for whereClause in ChunkClauses(table, field, values):
+        with arcpy.da.SearchCursor(table, [field], whereClause) as cursor:
+            found.update(row[0] for row in cursor)
+    return found
+
+# ------------------------------------------------------------------------------
+# Returns the check runs copied into the output session and the batch runs
+# copied into the output workspace by earlier copies from the input workspace,
+# as dictionaries of input id: output id.  Runs whose output rows were deleted
+# since are removed from the run map and copied again
+# ------------------------------------------------------------------------------
+def LoadRunMaps(Reviewer_Workspace, Out_Reviewer_Workspace, OutSessionID):
+    Out_REVCHECKRUN = getFullPath(Out_Reviewer_Workspace, "REVCHECKRUNTABLE")
+    Out_REVBATCHRUN = getFullPath(Out_Reviewer_Workspace, "REVBATCHRUNTABLE")
+
+    if Out_REVCHECKRUN == '' or Out_REVBATCHRUN == '':
+        return {}, {}
+
+    runMap = RunMap(Reviewer_Workspace, Out_Reviewer_Workspace)
+    try:
+        checkRuns = runMap.load(CHECK_RUNS, OutSessionID)
+        batchRuns = runMap.load(BATCH_RUNS)
+
+        sessionClause = "{} = {}".format(arcpy.AddFieldDelimiters(Out_REVCHECKRUN, "SESSIONID"), OutSessionID)
+        existing = set()
+        with arcpy.da.SearchCursor(Out_REVCHECKRUN, ["CHECKRUNID"], sessionClause) as cursor:
+            for row in cursor:
+                existing.add(row[0])
+        removed = [old for old, new in checkRuns.items() if new not in existing]
+        runMap.remove(CHECK_RUNS, removed, OutSessionID)
+        for old in removed:
+            del checkRuns[old]
+
+        existing = ExistingValues(Out_REVBATCHRUN, GetSchema(Out_REVBATCHRUN).guid_field, list(batchRuns.values()))
+        removed = [old for old, new in batchRuns.items() if new not in existing]
+        runMap.remove(BATCH_RUNS, removed)
+        for old in removed:
+            del batchRuns[old]
+    finally:
+        runMap.close()
+
+    if checkRuns or batchRuns:
+        arcpy.AddMessage("Reusing {} check runs and {} batch runs copied earlier".format(len(checkRuns), len(batchRuns)))
+    return checkRuns, batchRuns
+
+# ------------------------------------------------------------------------
+# Saves the check runs and batch runs copied into the output workspace
+# ------------------------------------------------------------------------
+def SaveRunMaps(Reviewer_Workspace, Out_Reviewer_Workspace, OutSessionID, CheckRunMap, BatchRunMap):
+    if getFullPath(Out_Reviewer_Workspace, "REVCHECKRUNTABLE") == '':
+        return
+
+    runMap = RunMap(Reviewer_Workspace, Out_Reviewer_Workspace)
+    try:
+        runMap.save(CHECK_RUNS, CheckRunMap, OutSessionID)
+        runMap.save(BATCH_RUNS, BatchRunMap)
+    finally:
+        runMap.close()
+
 # -----------------------------
-# Update REVCHECKRUNTABLE and REVBATCHRUNTABLE records
+# Update REVCHECKRUNTABLE and REVBATCHRUNTABLE records.  Check runs in
+# ReusedCheckRuns and batch runs already in BatchRunMap were copied by an
+# earlier run and are not copied again
 # -----------------------------
-def CopyRunTables(Reviewer_Workspace, Out_Reviewer_Workspace, SessionClause, OutSessionID, CheckRunMap, BatchRunMatches, CheckRunMatches):
+def CopyRunTables(Reviewer_Workspace, Out_Reviewer_Workspace, SessionClause, OutSessionID, CheckRunMap, BatchRunMatches, CheckRunMatches, SkipAttachments=False,
+                  ReusedCheckRuns=(), BatchRunMap=None):
     try:
 
         REVCHECKRUN = getFullPath(Reviewer_Workspace, "REVCHECKRUNTABLE")
@@ -397,14 +1029,32 @@ def CopyRunTables(Reviewer_Workspace, Out_Reviewer_Workspace, SessionClause, Out
 
             BatchRunIDs = list(set(BatchRunIDs))
 
+            # Maps the original batch run GUIDs to the new GUIDs
+            if BatchRunMap is None:
+                BatchRunMap = {}
+            newGlobalIDsByOrigGlobalID = BatchRunMap
+
+            ReusedBatchRunIDs = [batchRunID for batchRunID in BatchRunIDs if batchRunID in BatchRunMap]
+            BatchRunIDs = [batchRunID for batchRunID in BatchRunIDs if batchRunID not in BatchRunMap]
+
+            # Reused rows are kept in the matches so they are deleted from
+            # the input workspace when the records are moved
+            if len(ReusedBatchRunIDs) > 0:
+                BatchRunMatches["InIDField"] = "RECORDID"
+                BatchRunMatches["OutIDField"] = "RECORDID"
+                whereClause = MakeInClause(REVBATCHRUN, GetSchema(REVBATCHRUN).guid_field, ReusedBatchRunIDs)
+                with arcpy.da.SearchCursor(REVBATCHRUN, ["RECORDID"], whereClause) as cursor:
+                    for row in cursor:
+                        BatchRunMatches[row[0]] = None
+
             # ------------------------
             # Copy REVBATCHRUN records
             # ------------------------
 
             if len(BatchRunIDs) > 0:
                 # Get the fields from the input and output databases
-                batchrun_fieldnames = [x.name for x in arcpy.ListFields(REVBATCHRUN)]
-                out_batchrun_fieldnames = [x.name for x in arcpy.ListFields(Out_REVBATCHRUN)]
+                batchrun_fieldnames = GetSchema(REVBATCHRUN).fields
+                out_batchrun_fieldnames = GetSchema(Out_REVBATCHRUN).fields
 
                 REVBATCHRUN_FIELDS = sorted(batchrun_fieldnames)
                 OUT_REVBATCHRUN_FIELDS = sorted(batchrun_fieldnames)
@@ -438,7 +1088,6 @@ def CopyRunTables(Reviewer_Workspace, Out_Reviewer_Workspace, SessionClause, Out
 
 
                 insert = arcpy.da.InsertCursor(Out_REVBATCHRUN, OUT_REVBATCHRUN_FIELDS)
-                newGlobalIDsByOrigGlobalID = {}
                 try:
 
                     with arcpy.da.SearchCursor(REVBATCHRUN, REVBATCHRUN_FIELDS, whereClause) as cursor:
@@ -498,32 +1147,41 @@ def CopyRunTables(Reviewer_Workspace, Out_Reviewer_Workspace, SessionClause, Out
             # Copy REVCHECKRUN records and update BatchRunID
             # ------------------------
             if len(CheckRunMap) >= 1:
-                REVCHECKRUN_FIELDS = [x.name for x in arcpy.ListFields(REVCHECKRUN)]
+                # CHECKRUNPROPERTIES is moved to the end of the field list and
+                # is read in a second pass, only for the rows that are copied
+                REVCHECKRUN_FIELDS = list(GetSchema(REVCHECKRUN).fields)
+                REVCHECKRUN_FIELDS.remove("CHECKRUNPROPERTIES")
+                REVCHECKRUN_READ_FIELDS = ["OID@"] + REVCHECKRUN_FIELDS
+                REVCHECKRUN_FIELDS.append("CHECKRUNPROPERTIES")
+
                 REVCHECKRUN_RECORDID_INDEX = REVCHECKRUN_FIELDS.index("RECORDID")
                 REVCHECKRUN_CHECKRUNID_INDEX = REVCHECKRUN_FIELDS.index("CHECKRUNID")
                 REVCHECKRUN_SESSIONID_INDEX = REVCHECKRUN_FIELDS.index("SESSIONID")
                 REVCHECKRUN_BATCHRUNID_INDEX = REVCHECKRUN_FIELDS.index("BATCHRUNID")
-                REVCHECKRUN_CHECKRUNPROPS_INDEX = REVCHECKRUN_FIELDS.index("CHECKRUNPROPERTIES")
 
                 insert = arcpy.da.InsertCursor(Out_REVCHECKRUN, REVCHECKRUN_FIELDS)
 
                 CheckRunMatches["InIDField"] = "RECORDID"
                 CheckRunMatches["OutIDField"] = "RECORDID"
 
+                # objectid: values of the check run rows to copy
+                checkRunRows = {}
+
                 try:
-                    with arcpy.da.SearchCursor(REVCHECKRUN, REVCHECKRUN_FIELDS, SessionClause) as cursor:
+                    with arcpy.da.SearchCursor(REVCHECKRUN, REVCHECKRUN_READ_FIELDS, SessionClause) as cursor:
                         for row in cursor:
-                            rowValues = list(row)
-
                             # get check run ids for records
-                            checkRunID = rowValues[REVCHECKRUN_CHECKRUNID_INDEX]
+                            checkRunID = row[REVCHECKRUN_CHECKRUNID_INDEX + 1]
+
+                            if checkRunID in ReusedCheckRuns:
+                                CheckRunMatches[row[REVCHECKRUN_RECORDID_INDEX + 1]] = None
+
+                            elif checkRunID in CheckRunMap:
+                                rowValues = list(row[1:])
 
-                            if checkRunID in CheckRunMap:
                                 newCheckRunID = CheckRunMap[checkRunID]
                                 rowValues[REVCHECKRUN_CHECKRUNID_INDEX] = newCheckRunID
 
-                                batchRunRecordID = rowValues[REVCHECKRUN_RECORDID_INDEX]
-
                                 # get batch run ids for records and add to list
                                 batchRunID = rowValues[REVCHECKRUN_BATCHRUNID_INDEX]
                                 if batchRunID in newGlobalIDsByOrigGlobalID:
@@ -532,14 +1190,25 @@ def CopyRunTables(Reviewer_Workspace, Out_Reviewer_Workspace, SessionClause, Out
                                 # update the session Id
                                 rowValues[REVCHECKRUN_SESSIONID_INDEX] = OutSessionID
 
-                                # Check BLOB field, BLOB fields cannot be set to None
-                                if rowValues[REVCHECKRUN_CHECKRUNPROPS_INDEX] is None:
-                                    rowValues[REVCHECKRUN_CHECKRUNPROPS_INDEX] = bytearray()
+                                checkRunRows[row[0]] = rowValues
 
-                                # add row
-                                newRecordID = insert.insertRow(rowValues)
+                    if SkipAttachments:
+                        properties = ((oid, EMPTY_BLOB) for oid in list(checkRunRows.keys()))
+                    else:
+                        properties = IterBlobs(REVCHECKRUN, "CHECKRUNPROPERTIES", checkRunRows.keys())
 
-                                CheckRunMatches[batchRunRecordID] = newRecordID
+                    for oid, checkRunProperties in properties:
+                        rowValues = checkRunRows.pop(oid)
+
+                        # Check BLOB field, BLOB fields cannot be set to None
+                        if checkRunProperties is None:
+                            checkRunProperties = EMPTY_BLOB
+                        rowValues.append(checkRunProperties)
+
+                        # add row
+                        newRecordID = insert.insertRow(rowValues)
+
+                        CheckRunMatches[rowValues[REVCHECKRUN_RECORDID_INDEX]] = newRecordID
                 finally:
                     del insert
 
@@ -555,26 +1224,694 @@ def CopyRunTables(Reviewer_Workspace, Out_Reviewer_Workspace, SessionClause, Out
     finally:
         return CheckRunMatches, BatchRunMatches
 
+# ------------------------------------------------------------------------------
+# Returns a value as it is compared by the verification.  Databases differ in
+# how they store empty strings, fractions of a second and the case of GUIDs
+# ------------------------------------------------------------------------------
+def NormalizeValue(value, fieldType):
+    if value is None or value == '':
+        return None
+    if fieldType in ('Guid', 'GlobalID'):
+        return value.upper()
+    if fieldType in ('Double', 'Single'):
+        return round(value, 6)
+    if fieldType == 'Date':
+        return value.replace(microsecond=0)
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    return value
+
+# ------------------------------------------------------------------------------
+# Reads a table in one pass and returns a dictionary of key: fingerprint of the
+# rows with that key.  Only rows whose key is in keyMap are read.  If keyMap is
+# a dictionary the key read from the table is replaced with its value.
+# valueMaps is a dictionary of field index: dictionary used to replace the
+# values of that field.  The fingerprints of rows sharing a key are added
+# together, so the order the rows are read in does not matter
+# ------------------------------------------------------------------------------
+def FingerprintRows(table, keyField, fields, fieldTypes, whereClause, keyMap, valueMaps=None, spatialReference=None):
+    fingerprints = {}
+    mapKeys = isinstance(keyMap, dict)
+    valueMaps = valueMaps or {}
+    grid = SpatialGrid(spatialReference) if spatialReference is not None else None
+
+    with arcpy.da.SearchCursor(table, [keyField] + list(fields), whereClause,
+                               spatial_reference=spatialReference) as cursor:
+        for row in cursor:
+            key = row[0]
+            if key not in keyMap:
+                continue
+            if mapKeys:
+                key = keyMap[key]
+
+            values = []
+            for i, value in enumerate(row[1:]):
+                if i in valueMaps:
+                    value = valueMaps[i].get(value, value)
+                if fieldTypes[i] == 'Geometry':
+                    values.append(SnapGeometry(value, grid))
+                else:
+                    values.append(NormalizeValue(value, fieldTypes[i]))
+
+            digest = int(hashlib.md5(repr(values).encode('utf-8')).hexdigest(), 16)
+            fingerprints[key] = (fingerprints.get(key, 0) + digest) & FINGERPRINT_MASK
+
+    return fingerprints
+
+# ------------------------------------------------------------------------------
+# Fingerprints the rows of a table whose keyField is one of ids.  Only those
+# rows are read, MAX_IN_VALUES ids at a time
+# ------------------------------------------------------------------------------
+def FingerprintIDs(table, keyField, fields, fieldTypes, ids, keyMap, valueMaps=None, spatialReference=None):
+    if keyField == "OID@":
+        queryField = GetSchema(table).oid_field
+    else:
+        queryField = keyField
+
+    fingerprints = {}
+    for whereClause in ChunkClauses(table, queryField, ids):
+        fingerprints.update(FingerprintRows(table, keyField, fields, fieldTypes, whereClause, keyMap, valueMaps,
+                                            spatialReference))
+    return fingerprints
+
+# ------------------------------------------------------------------------------
+# Returns the false origin and resolution of the coordinate grid of a spatial
+# reference, as (x origin, y origin, resolution)
+# ------------------------------------------------------------------------------
+def SpatialGrid(spatialReference):
+    domain = [float(value) for value in spatialReference.domain.split()]
+    return domain[0], domain[1], spatialReference.XYResolution
+
+# ------------------------------------------------------------------------------
+# Returns the vertices of a geometry as whole numbers of grid cells.  A
+# geometry projected when it was copied is stored snapped to the grid of the
+# output, so the input geometry projected on read and snapped the same way
+# gives the same vertices
+# ------------------------------------------------------------------------------
+def SnapGeometry(shape, grid):
+    if shape is None:
+        return None
+
+    x0, y0, resolution = grid
+
+    def snap(point):
+        if point is None:
+            return None
+        return int(round((point.X - x0) / resolution)), int(round((point.Y - y0) / resolution))
+
+    parts = []
+    for i in range(shape.partCount):
+        part = shape.getPart(i)
+        if isinstance(part, arcpy.Point):
+            parts.append(snap(part))
+        else:
+            parts.append(tuple(snap(point) for point in part))
+    return tuple(parts)
+
+# ------------------------------------------------------------------------------
+# Fingerprints the rows of one table in a verification process.  The spatial
+# reference is sent as its string, task is the arguments of FingerprintIDs
+# ------------------------------------------------------------------------------
+def FingerprintTask(task):
+    table, keyField, fields, fieldTypes, ids, keyMap, valueMaps, spatialReference = task
+    if spatialReference is not None:
+        text = spatialReference
+        spatialReference = arcpy.SpatialReference()
+        spatialReference.loadFromString(text)
+    return FingerprintIDs(table, keyField, fields, fieldTypes, ids, keyMap, valueMaps, spatialReference)
+
+# ------------------------------------------------------------------------------
+# Runs the fingerprint tasks in up to VERIFY_PROCESSES processes, so the input
+# and output tables are read at the same time.  Daemonic processes, such as the
+# workers of the scheduler, cannot start processes and run them one after
+# another.  Returns the fingerprints of each task in order
+# ------------------------------------------------------------------------------
+def RunFingerprintTasks(tasks):
+    if len(tasks) < 2 or multiprocessing.current_process().daemon:
+        return [FingerprintTask(task) for task in tasks]
+
+    SetMultiprocessingExecutable()
+    pool = multiprocessing.Pool(min(VERIFY_PROCESSES, len(tasks)))
+    try:
+        return pool.map(FingerprintTask, tasks, 1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+# ------------------------------------------------------------------------------
+# Compares the fingerprints of the input rows with the fingerprints of the
+# copied rows.  Returns a dictionary with the number of rows checked, missing
+# and different
+# ------------------------------------------------------------------------------
+def CompareFingerprints(name, expected, actual):
+    missing = [key for key in expected if key not in actual]
+    mismatched = [key for key, fingerprint in expected.items() if key in actual and actual[key] != fingerprint]
+
+    if missing:
+        arcpy.AddWarning("{} {} records were not found in the output workspace: {}".format(
+            len(missing), name, ", ".join(str(key) for key in missing[:VERIFY_REPORT_LIMIT])))
+    if mismatched:
+        arcpy.AddWarning("{} {} records do not match the input records: {}".format(
+            len(mismatched), name, ", ".join(str(key) for key in mismatched[:VERIFY_REPORT_LIMIT])))
+
+    return {"rows": len(expected), "missing": len(missing), "mismatched": len(mismatched)}
+
+# ------------------------------------------------------------------------------
+# Verifies the copied records by comparing a fingerprint of each input row with
+# a fingerprint of the row it was copied to.  Only the copied rows are read on
+# each side, and the input and output tables are read in parallel processes.
+# Geometries are compared by their BITMAP when both sides store it, by their
+# WKB when the spatial references match, and otherwise by their vertices
+# projected to the output spatial reference and snapped to its grid.
+# rowMatches maps the input record ids to the output record ids, and tables is
+# a list of (name, input table, output table) of the geometry tables that
+# were copied.  Returns a dictionary with passed and the results of each table
+# ------------------------------------------------------------------------------
+def VerifyCopy(inTable, outTable, readFields, writeFields, inIDField, outIDField, rowMatches, checkRunMap,
+               tables, srMatch):
+
+    start = time.time()
+    result = {"passed": True, "tables": {}}
+
+    # --- REVTABLEMAIN.  The ids, objectids and session ids are changed by the copy ---
+    in_types = GetSchema(inTable).types
+    out_types = GetSchema(outTable).types
+    compare = [i for i, name in enumerate(readFields)
+               if i != readFields.index(inIDField) and name != "SESSIONID"
+               and in_types.get(name) not in ('OID', 'GlobalID')
+               and out_types.get(writeFields[i]) not in ('OID', 'GlobalID')]
+
+    in_fields = [readFields[i] for i in compare]
+    out_fields = [writeFields[i] for i in compare]
+    field_types = [in_types[name] for name in in_fields]
+
+    # CHECKRUNID is compared with the new check run id of the output record
+    valueMaps = {}
+    if "CHECKRUNID" in in_fields:
+        valueMaps[in_fields.index("CHECKRUNID")] = checkRunMap
+
+    # Only the copied rows are read, not the whole sessions.  The output
+    # session can hold the records of earlier copies
+    rowMatches = RowIDMatches(rowMatches)
+    outIDs = set(rowMatches.values())
+
+    names = ["REVTABLEMAIN"]
+    tasks = [(inTable, inIDField, in_fields, field_types, rowMatches, rowMatches, valueMaps, None),
+             (outTable, outIDField, out_fields, field_types, outIDs, outIDs, None, None)]
+
+    # --- Geometry and location tables, compared by the link to REVTABLEMAIN ---
+    for name, inFeatures, outFeatures in tables:
+        in_schema = GetSchema(inFeatures)
+        out_schema = GetSchema(outFeatures)
+
+        spatialReference = None
+        if in_schema.has('BITMAP') and out_schema.has('BITMAP'):
+            fields, types = ['BITMAP'], ['Blob']
+        elif out_schema.spatial_reference is None:
+            fields, types = [], []
+        elif srMatch:
+            fields, types = ['SHAPE@WKB'], ['Blob']
+        else:
+            fields, types = ['SHAPE@'], ['Geometry']
+            spatialReference = out_schema.spatial_reference.exportToString()
+
+        names.append(name)
+        tasks.append((inFeatures, in_schema.link_field, fields, types, rowMatches, rowMatches, None,
+                      spatialReference))
+        tasks.append((outFeatures, out_schema.link_field, fields, types, outIDs, outIDs, None, spatialReference))
+
+    fingerprints = RunFingerprintTasks(tasks)
+    for i, name in enumerate(names):
+        result["tables"][name] = CompareFingerprints(name, fingerprints[2 * i], fingerprints[2 * i + 1])
+
+    for table_result in result["tables"].values():
+        if table_result["missing"] or table_result["mismatched"]:
+            result["passed"] = False
+
+    arcpy.AddMessage("Verified {} records in {:.1f} seconds".format(
+        sum(r["rows"] for r in result["tables"].values()), time.time() - start))
+
+    return result
+
+# ---------------------------------------------
+# Counts the rows in a table that meet a query
+# ---------------------------------------------
+def CountRows(table, whereClause):
+    count = 0
+    with arcpy.da.SearchCursor(table, ["OID@"], whereClause) as cursor:
+        for row in cursor:
+            count += 1
+    return count
+
+# ----------------------------------------------------------------------------
+# Estimates the size of a row in bytes from the field definitions.  Geometry
+# and BLOB fields are sized from a sample of the rows that meet the query
+# ----------------------------------------------------------------------------
+def EstimateRowBytes(table, whereClause, fields=None):
+    size = 0
+    sampled = []
+    schema = GetSchema(table)
+    for name in schema.fields:
+        if fields and name not in fields:
+            continue
+        field_type = schema.types[name]
+        if field_type == 'String':
+            size += schema.lengths[name]
+        elif field_type in FIELD_TYPE_BYTES:
+            size += FIELD_TYPE_BYTES[field_type]
+        elif field_type == 'Geometry':
+            sampled.append("SHAPE@WKB")
+        elif field_type == 'Blob':
+            sampled.append(name)
+
+    if sampled:
+        total = 0
+        rows = 0
+        with arcpy.da.SearchCursor(table, sampled, whereClause) as cursor:
+            for row in cursor:
+                total += sum(len(value) for value in row if value is not None)
+                rows += 1
+                if rows >= PLAN_SAMPLE_SIZE:
+                    break
+        if rows:
+            size += total // rows
+
+    return size
+
+# ----------------------------------------------------------------------
+# Adds a table to a plan with its row count and estimated bytes and time.
+# whereClause can be a list of where clauses, the rows of each are added
+# ----------------------------------------------------------------------
+def AddPlanTable(plan, name, table, whereClause, rowsPerSecond, fields=None):
+    if table == '':
+        return
+
+    whereClauses = whereClause if isinstance(whereClause, list) else [whereClause]
+    count = sum(CountRows(table, clause) for clause in whereClauses)
+    size = count * EstimateRowBytes(table, whereClauses[0], fields) if count else 0
+
+    plan["tables"][name] = {"rows": count, "bytes": size}
+    plan["estimatedBytes"] += size
+    plan["estimatedSeconds"] += count / rowsPerSecond
+
+# --------------------------------------------------
+# Writes the contents of a plan to the tool messages
+# --------------------------------------------------
+def ReportPlan(plan):
+    arcpy.AddMessage("Plan only, no records were written")
+    arcpy.AddMessage("Where clause: {}".format(plan["whereClause"] or "(all records)"))
+    for name in sorted(plan["tables"]):
+        table = plan["tables"][name]
+        arcpy.AddMessage("  {}: {} rows, {} bytes".format(name, table["rows"], table["bytes"]))
+    arcpy.AddMessage("Estimated size: {} bytes".format(plan["estimatedBytes"]))
+    arcpy.AddMessage("Estimated time: {} seconds".format(int(round(plan["estimatedSeconds"]))))
+
+# ------------------------------------------------------------------------------
+# Counts the check runs of the sessions and the batch runs they belong to.
+# Returns the check run and batch run counts, None for a missing table
+# ------------------------------------------------------------------------------
+def CountRunRows(Reviewer_Workspace, SessionClause):
+    REVCHECKRUN = getFullPath(Reviewer_Workspace, "REVCHECKRUNTABLE")
+    REVBATCHRUN = getFullPath(Reviewer_Workspace, "REVBATCHRUNTABLE")
+    if REVCHECKRUN == '':
+        return None, None
+
+    checkRows = 0
+    batchRunIDs = set()
+    with arcpy.da.SearchCursor(REVCHECKRUN, ["BATCHRUNID"], SessionClause) as cursor:
+        for row in cursor:
+            checkRows += 1
+            batchRunIDs.add(row[0])
+
+    if REVBATCHRUN == '':
+        return checkRows, None
+    return checkRows, len(batchRunIDs)
+
+# ------------------------------------------------------------------------------
+# Counts the records a copy would read and write and estimates the bytes and
+# time it will take.  Nothing is written and no edit session is started.
+# Returns None if the where clause is too long for the copy to run
+# ------------------------------------------------------------------------------
+def PlanCopy(Reviewer_Workspace, SessionsList, RecordClause):
+    REVTABLEMAIN = getFullPath(Reviewer_Workspace, "REVTABLEMAIN", True)
+    SessionsTable = getFullPath(Reviewer_Workspace, "REVSESSIONTABLE", True)
+
+    plan = {"sessions": {}, "whereClause": "", "tables": {},
+            "estimatedBytes": 0, "estimatedSeconds": 0.0}
+
+    rowcount = 0
+    with arcpy.da.SearchCursor(SessionsTable, ["SESSIONID", "SESSIONNAME"]) as rows:
+        for row in rows:
+            rowcount += 1
+            if row[1] in SessionsList:
+                plan["sessions"][row[0]] = row[1]
+
+    SessionClause = ''
+    if len(plan["sessions"]) != rowcount:
+        SessionClause = MakeInClause(SessionsTable, "SESSIONID", list(plan["sessions"])) or ''
+
+    WhereClause = SessionClause
+    if RecordClause:
+        if WhereClause != '':
+            WhereClause = WhereClause + " AND " + RecordClause
+        else:
+            WhereClause = RecordClause
+    plan["whereClause"] = WhereClause
+
+    if len(WhereClause) > MAX_WHERE_CLAUSE_LENGTH:
+        arcpy.AddError("The where clause is too long. There are either too many sessions selected or the Expression parameter (RecordClause) is too long.")
+        return None
+
+    AddPlanTable(plan, "REVTABLEMAIN", REVTABLEMAIN, WhereClause, COPY_ROWS_PER_SECOND)
+
+    # Records without geometry
+    noGeometryClause = arcpy.AddFieldDelimiters(REVTABLEMAIN, "GEOMETRYTYPE") + " IS NULL"
+    if WhereClause != '':
+        noGeometryClause = "(" + WhereClause + ") AND " + noGeometryClause
+    plan["tables"]["NOGEOMETRY"] = {"rows": CountRows(REVTABLEMAIN, noGeometryClause), "bytes": 0}
+
+    # Geometry tables are read by session.  With a record clause only the
+    # geometries of the selected records are read, by link id
+    if RecordClause:
+        with arcpy.da.SearchCursor(REVTABLEMAIN, [GetSchema(REVTABLEMAIN).id_field], WhereClause) as cursor:
+            recordIDs = [row[0] for row in cursor]
+
+    for name, rowsPerSecond in (("REVTABLEPOINT", COPY_ROWS_PER_SECOND), ("REVTABLELINE", COPY_ROWS_PER_SECOND),
+                                ("REVTABLEPOLY", COPY_ROWS_PER_SECOND), ("REVTABLELOCATION", COPY_BLOB_ROWS_PER_SECOND)):
+        table = getFullPath(Reviewer_Workspace, name)
+        if table == '':
+            continue
+        geometryClause = SessionClause
+        if RecordClause:
+            geometryClause = ChunkClauses(table, GetSchema(table).link_field, recordIDs)
+        AddPlanTable(plan, name, table, geometryClause, rowsPerSecond)
+
+    REVCHECKRUN = getFullPath(Reviewer_Workspace, "REVCHECKRUNTABLE")
+    REVBATCHRUN = getFullPath(Reviewer_Workspace, "REVBATCHRUNTABLE")
+    if REVCHECKRUN != '':
+        AddPlanTable(plan, "REVCHECKRUNTABLE", REVCHECKRUN, SessionClause, COPY_BLOB_ROWS_PER_SECOND)
+
+        if REVBATCHRUN != '':
+            with arcpy.da.SearchCursor(REVCHECKRUN, ["BATCHRUNID"], SessionClause) as cursor:
+                batchRunIDs = set(row[0] for row in cursor)
+            batchRows = len(batchRunIDs)
+            batchSize = batchRows * EstimateRowBytes(REVBATCHRUN, None) if batchRows else 0
+            plan["tables"]["REVBATCHRUNTABLE"] = {"rows": batchRows, "bytes": batchSize}
+            plan["estimatedBytes"] += batchSize
+            plan["estimatedSeconds"] += batchRows / COPY_BLOB_ROWS_PER_SECOND
+
+    ReportPlan(plan)
+    return plan
+
+# ------------------------------------------------------------------------------
+# Returns the name of the dbms of an enterprise geodatabase that same-database
+# copies can run in, a key of IN_DATABASE_SQL, or None
+# ------------------------------------------------------------------------------
+def InDatabaseType(in_workspace):
+    key = ("dbms", in_workspace)
+    if key not in METADATA_CACHE:
+        dbms = None
+        try:
+            version = arcpy.ArcSDESQLExecute(in_workspace).execute("SELECT version()")
+            if "POSTGRESQL" in str(version).upper():
+                dbms = "PostgreSQL"
+        except Exception:
+            pass
+        METADATA_CACHE[key] = dbms
+    return METADATA_CACHE[key]
+
+# ------------------------------------------------------------------------------
+# Returns True when the records can be copied with INSERT ... SELECT statements
+# inside the database: the input and output are the same enterprise
+# geodatabase, its dbms is in IN_DATABASE_SQL and none of the Reviewer tables
+# are versioned, so the rows can be written to the base tables
+# ------------------------------------------------------------------------------
+def CanCopyInDatabase(Reviewer_Workspace, Out_Reviewer_Workspace):
+    if os.path.normcase(os.path.abspath(Reviewer_Workspace)) != os.path.normcase(os.path.abspath(Out_Reviewer_Workspace)):
+        return False
+    if GetWorkspaceType(Reviewer_Workspace) != 'RemoteDatabase':
+        return False
+
+    for table_name in IN_DATABASE_TABLES:
+        table = getFullPath(Reviewer_Workspace, table_name)
+        if table != '' and GetSchema(table).versioned():
+            return False
+
+    return InDatabaseType(Reviewer_Workspace) is not None
+
+# ----------------------------------------------------------------
+# Returns the owner qualified name of a table, as used in SQL
+# ----------------------------------------------------------------
+def DatabaseTableName(table):
+    return ".".join(os.path.basename(table).split(".")[-2:]).lower()
+
+# ------------------------------------------------------------------------------
+# Runs an INSERT ... SELECT statement copying the rows of a table into the same
+# table and returns the number of rows copied.  Each field, other than
+# geometry measures, is selected from itself unless it is in expressions, a
+# dictionary of field: SQL expression.  The objectid and GlobalID fields get
+# new values.  The input rows are aliased as src_row
+# ------------------------------------------------------------------------------
+def InsertSelectInDatabase(sql, dbmsSQL, table, expressions, fromClause):
+    schema = GetSchema(table)
+    name = DatabaseTableName(table)
+    owner, table_name = name.split(".")
+
+    fields = []
+    values = []
+    for field in schema.fields:
+        if '(' in field or '.' in field:
+            continue
+        fields.append(field)
+        if field.upper() in expressions:
+            values.append(expressions[field.upper()])
+        elif schema.types[field] == 'OID':
+            values.append(dbmsSQL["rowid"].format(owner=owner, table=table_name))
+        elif schema.types[field] == 'GlobalID':
+            values.append(dbmsSQL["guid"])
+        else:
+            values.append("src_row.{}".format(field))
+
+    statement = "INSERT INTO {} ({}) SELECT {} FROM {} src_row {}".format(
+        name, ", ".join(fields), ", ".join(values), name, fromClause)
+    return int(sql.execute(dbmsSQL["count"].format(statement)))
+
 # ------------------------------------------------------------------
-# Deletes rows from an input table/feature class given a list of IDs
+# Returns the rows of a query run with ArcSDESQLExecute, which returns
+# True for no rows and a list of lists for rows of several columns
 # ------------------------------------------------------------------
-def main():
+def SqlRows(result):
+    if isinstance(result, list):
+        return result
+    return []
 
-    # Script arguments
-    Reviewer_Workspace = arcpy.GetParameterAsText(0)
-    Sessions = arcpy.GetParameterAsText(1)
-    RecordClause = arcpy.GetParameterAsText(3)
-    Out_Reviewer_Workspace = arcpy.GetParameterAsText(4)
-    Out_Exist_Session = arcpy.GetParameterAsText(5)
-    Delete = arcpy.GetParameterAsText(6)
-    createLog = arcpy.GetParameterAsText(7)
+# ------------------------------------------------------------------
+# Inserts the (old, new) pairs of a run map into a mapping table
+# ------------------------------------------------------------------
+def InsertRunMap(sql, table, mapping):
+    for old, new in mapping.items():
+        sql.execute("INSERT INTO {} VALUES ('{}', '{}')".format(table, old.replace("'", "''"),
+                                                                new.replace("'", "''")))
 
-    # Input sessions to Python list
-    SessionsList = Sessions.split(";")
+# ------------------------------------------------------------------------------
+# Copies the records between two sessions of the same enterprise geodatabase
+# with set-based SQL run in the database, see CanCopyInDatabase.  New GUIDs are
+# made for the records, check runs and batch runs in temporary mapping tables,
+# and the rows are copied through those tables without being read into
+# Python.  Check runs and batch runs in the run map of the workspace are
+# reused instead of copied again, and the runs copied are added to it.
+# Returns a dictionary of table name: number of records copied, or None if
+# the copy failed
+# ------------------------------------------------------------------------------
+def CopyRecordsInDatabase(Reviewer_Workspace, SessionsList, Out_Exist_Session, RecordClause='',
+                          SkipAttachments=False):
+    dbmsSQL = IN_DATABASE_SQL[InDatabaseType(Reviewer_Workspace)]
+
+    REVTABLEMAIN = getFullPath(Reviewer_Workspace, "REVTABLEMAIN", True)
+    SessionsTable = getFullPath(Reviewer_Workspace, "REVSESSIONTABLE", True)
+    REVCHECKRUN = getFullPath(Reviewer_Workspace, "REVCHECKRUNTABLE")
+    REVBATCHRUN = getFullPath(Reviewer_Workspace, "REVBATCHRUNTABLE")
+    runTables = REVCHECKRUN != '' and REVBATCHRUN != ''
+
+    # ---  Input and output session ids ---
+    sessionIDs = []
+    OutSessionID = None
+    with arcpy.da.SearchCursor(SessionsTable, ["SESSIONID", "SESSIONNAME"]) as rows:
+        for row in rows:
+            if row[1] in SessionsList:
+                sessionIDs.append(row[0])
+            if row[1] == Out_Exist_Session:
+                OutSessionID = row[0]
+
+    if not sessionIDs or OutSessionID is None:
+        arcpy.AddError("Unable to find the input sessions or the output session {}.".format(Out_Exist_Session))
+        return None
+    arcpy.AddMessage("Output Reviewer Session id is {0}".format(OutSessionID))
+
+    SessionClause = "SESSIONID IN ({})".format(", ".join(str(int(value)) for value in sessionIDs))
+    WhereClause = SessionClause
+    if RecordClause:
+        WhereClause = "{} AND ({})".format(SessionClause, RecordClause)
+
+    # Certain dbms limit the length of where clause predicates
+    if len(WhereClause) > MAX_WHERE_CLAUSE_LENGTH:
+        arcpy.AddError("The where clause is too long. There are either too many sessions selected or the Expression parameter (RecordClause) is too long.")
+        return None
+
+    CheckRunMap, BatchRunMap = LoadRunMaps(Reviewer_Workspace, Reviewer_Workspace, OutSessionID)
+
+    main = DatabaseTableName(REVTABLEMAIN)
+    summarydict = {}
+
+    sql = arcpy.ArcSDESQLExecute(Reviewer_Workspace)
+    sql.startTransaction()
+    try:
+        for name in IN_DATABASE_MAPPING_TABLES:
+            sql.execute(dbmsSQL["mapping"].format(name))
+        InsertRunMap(sql, "reused_checkruns", CheckRunMap)
+        InsertRunMap(sql, "reused_batchruns", BatchRunMap)
+
+        # --- New ids of the records and check runs ---
+        sql.execute("INSERT INTO copy_records SELECT ID, {} FROM {} WHERE {}".format(
+            dbmsSQL["guid"], main, WhereClause))
+
+        checkRuns = "SELECT CHECKRUNID FROM {} WHERE {} AND CHECKRUNID IS NOT NULL".format(main, WhereClause)
+        if runTables:
+            checkRuns += " UNION SELECT CHECKRUNID FROM {} WHERE {}".format(DatabaseTableName(REVCHECKRUN),
+                                                                           SessionClause)
+        sql.execute("INSERT INTO copy_checkruns SELECT CHECKRUNID, {} FROM ({}) runs "
+                    "WHERE CHECKRUNID NOT IN (SELECT old FROM reused_checkruns)".format(dbmsSQL["guid"], checkRuns))
+        sql.execute("INSERT INTO copy_checkruns SELECT old, new FROM reused_checkruns WHERE old IN ({})".format(
+            checkRuns))
+
+        # --- REVTABLEMAIN ---
+        arcpy.AddMessage("Copying RevTableMain Records")
+        summarydict["REVTABLEMAIN"] = InsertSelectInDatabase(
+            sql, dbmsSQL, REVTABLEMAIN,
+            {"ID": "map.new", "SESSIONID": str(int(OutSessionID)), "CHECKRUNID": "checkrun.new"},
+            "JOIN copy_records map ON src_row.ID = map.old "
+            "LEFT JOIN copy_checkruns checkrun ON src_row.CHECKRUNID = checkrun.old")
+
+        # --- Geometry and location tables ---
+        for table_name in IN_DATABASE_LINKED_TABLES:
+            table = getFullPath(Reviewer_Workspace, table_name)
+            if table == '':
+                continue
+            if table_name == "REVTABLELOCATION" and SkipAttachments:
+                arcpy.AddMessage("Skipping Location Records")
+                continue
+
+            arcpy.AddMessage("Copying {} Records".format(table_name))
+            link_field = GetSchema(table).link_field
+            summarydict[table_name] = InsertSelectInDatabase(
+                sql, dbmsSQL, table, {link_field: "map.new", "SESSIONID": str(int(OutSessionID))},
+                "JOIN copy_records map ON src_row.{} = map.old".format(link_field))
+
+        # --- Batch runs of the copied check runs, then the check runs ---
+        if runTables:
+            guid_field = GetSchema(REVBATCHRUN).guid_field
+            batchRuns = ("SELECT DISTINCT BATCHRUNID FROM {} WHERE CHECKRUNID IN (SELECT old FROM copy_checkruns) "
+                         "AND BATCHRUNID IS NOT NULL".format(DatabaseTableName(REVCHECKRUN)))
+            sql.execute("INSERT INTO copy_batchruns SELECT BATCHRUNID, {} FROM ({}) runs "
+                        "WHERE BATCHRUNID NOT IN (SELECT old FROM reused_batchruns)".format(dbmsSQL["guid"],
+                                                                                          batchRuns))
+            sql.execute("INSERT INTO copy_batchruns SELECT old, new FROM reused_batchruns WHERE old IN ({})".format(
+                batchRuns))
+
+            arcpy.AddMessage("Copying Batch Job Records")
+            summarydict["REVBATCHRUNTABLE"] = InsertSelectInDatabase(
+                sql, dbmsSQL, REVBATCHRUN, {guid_field: "map.new"},
+                "JOIN copy_batchruns map ON src_row.{0} = map.old "
+                "WHERE src_row.{0} NOT IN (SELECT old FROM reused_batchruns)".format(guid_field))
+
+            expressions = {"CHECKRUNID": "map.new", "SESSIONID": str(int(OutSessionID)),
+                           "BATCHRUNID": "COALESCE(batchrun.new, src_row.BATCHRUNID)"}
+            if SkipAttachments:
+                expressions["CHECKRUNPROPERTIES"] = dbmsSQL["empty_blob"]
+            summarydict["REVCHECKRUNTABLE"] = InsertSelectInDatabase(
+                sql, dbmsSQL, REVCHECKRUN, expressions,
+                "JOIN copy_checkruns map ON src_row.CHECKRUNID = map.old "
+                "LEFT JOIN copy_batchruns batchrun ON src_row.BATCHRUNID = batchrun.old "
+                "WHERE src_row.{} AND src_row.CHECKRUNID NOT IN (SELECT old FROM reused_checkruns)".format(
+                    SessionClause))
+        else:
+            arcpy.AddWarning("Unable to identify REVCHECKRUNTABLE or REVBATCHRUNTABLE in Reviewer Workspace "
+                             " No records from these tables will be copied.")
 
-    # Strip any trailing/leading ' that might exist
-    for i,value in enumerate(SessionsList):
-        SessionsList[i] = value.strip("'")
+        # The mapping tables are dropped on commit
+        CheckRunMap = dict(SqlRows(sql.execute("SELECT old, new FROM copy_checkruns")))
+        BatchRunMap = dict(SqlRows(sql.execute("SELECT old, new FROM copy_batchruns")))
+
+        sql.commitTransaction()
+    except Exception:
+        arcpy.AddMessage("Rolling back the copy inside the database")
+        sql.rollbackTransaction()
+        raise
+
+    SaveRunMaps(Reviewer_Workspace, Reviewer_Workspace, OutSessionID, CheckRunMap, BatchRunMap)
+
+    for table_name, count in sorted(summarydict.items()):
+        arcpy.AddMessage("Total Records from {}: {}".format(table_name, count))
+
+    return summarydict
+
+# ------------------------------------------------------------------------------
+# Copies the records from the selected sessions into a session of the output
+# Reviewer workspace.  Can be called from other scripts without the toolbox.
+#   Reviewer_Workspace (str): path to the input Reviewer workspace
+#   SessionsList (list of str): names of the input sessions
+#   Out_Reviewer_Workspace (str): path to the output Reviewer workspace
+#   Out_Exist_Session (str): name of the output session
+#   RecordClause (str): optional SQL expression selecting the records to copy
+#   Delete (bool): delete the copied records from the input workspace
+#   CreateLog (bool): write a logfile next to the output workspace
+#   PlanOnly (bool): count the records without copying them
+#   SkipAttachments (bool): do not copy REVTABLELOCATION records or the
+#       CHECKRUNPROPERTIES of check runs.  Cannot be used with Delete
+#   Verify (bool): compare the copied records with the input records.  The
+#       records are always verified before they are deleted
+#   SampleSize (int): copy a random sample of this many records instead of
+#       all of them
+#   SampleField (str): REVTABLEMAIN field the sample is stratified by, so
+#       SampleSize records are copied for each of its values
+#   Readers (int): number of processes reading REVTABLEMAIN in parallel
+#       objectid ranges.  0 or 1 reads it in this process
+#   RecordFilter (str): optional Python expression over the REVTABLEMAIN
+#       fields selecting the records to copy, tested on each record read.  See
+#       ReviewerRecordFilter.py
+# Returns a dictionary of table name: number of records copied, the plan when
+# PlanOnly is True, or None if the copy failed.  Raises ValueError if a
+# workspace is not a Reviewer workspace.  Errors raised while copying are
+# raised again once the edits are rolled back
+# ------------------------------------------------------------------------------
+def CopyRecords(Reviewer_Workspace, SessionsList, Out_Reviewer_Workspace, Out_Exist_Session,
+                RecordClause='', Delete=False, CreateLog=False, PlanOnly=False, SkipAttachments=False,
+                Verify=False, SampleSize=0, SampleField=None, Readers=0, RecordFilter=None):
+
+    createLog = CreateLog
+    summarydict = None
+    verification = None
+
+    # The location records of moved records would be left in the input
+    # workspace pointing at records that no longer exist
+    if Delete and SkipAttachments:
+        arcpy.AddError("Records cannot be moved without their location records. Do not skip the attachments "
+                       "when deleting the copied records.")
+        return None
+
+    # Reviewer workspaces hosted in GeoPackage or SQLite databases are copied
+    # with set-based SQL in one transaction.  Logged, verified and moved
+    # records are copied with arcpy, which verifies moves before deleting
+    if (IsSqliteWorkspace(Reviewer_Workspace) and IsSqliteWorkspace(Out_Reviewer_Workspace) and
+            not (CreateLog or Verify or Delete)):
+        if PlanOnly or SampleSize or RecordFilter:
+            arcpy.AddError("Plans, samples and filter expressions are not supported for GeoPackage or SQLite "
+                           "Reviewer workspaces.")
+            return None
+        return CopyRecordsSql(Reviewer_Workspace, SessionsList, Out_Reviewer_Workspace, Out_Exist_Session,
+                              RecordClause, SkipAttachments)
+
+    RefreshMetadataCache(Reviewer_Workspace, Out_Reviewer_Workspace)
 
     # ----------------------------------------
     # Check for version compatablity
@@ -621,10 +1958,28 @@ def main():
     else:
         db_compatability = 'New'
 
+    # --------------------------------------
+    # Count the records without copying them
+    # --------------------------------------
+    if PlanOnly:
+        if db_compatability != 'Incompatable':
+            if RecordFilter:
+                arcpy.AddWarning("The plan counts the records before the filter expression is tested.")
+            return PlanCopy(Reviewer_Workspace, SessionsList, RecordClause)
+
     # ----------------------------------------
     # If versions are compatable, copy records
     # ----------------------------------------
-    if db_compatability != 'Incompatable':
+    elif db_compatability != 'Incompatable':
+
+        # Records copied between sessions of the same enterprise geodatabase
+        # are copied inside the database without reading them into Python.
+        # Moves are verified before the input records are deleted, so they
+        # take the path below
+        if (db_compatability == 'New' and not (createLog or Verify or Delete or SampleSize or RecordFilter) and
+                CanCopyInDatabase(Reviewer_Workspace, Out_Reviewer_Workspace)):
+            return CopyRecordsInDatabase(Reviewer_Workspace, SessionsList, Out_Exist_Session, RecordClause,
+                                         SkipAttachments)
 
         # ---  Paths to tables in Input Reviewer workspace tables ---
         REVTABLEMAIN = getFullPath(Reviewer_Workspace, "REVTABLEMAIN", True)
@@ -642,6 +1997,19 @@ def main():
         Out_REVTABLELINE = getFullPath(Out_Reviewer_Workspace, "REVTABLELINE")
         Out_REVTABLEPOLY = getFullPath(Out_Reviewer_Workspace, "REVTABLEPOLY")
 
+        if SampleField and not GetSchema(REVTABLEMAIN).has(SampleField):
+            arcpy.AddError("{} is not a field of {}.  The sample cannot be stratified by it.".format(
+                SampleField, REVTABLEMAIN))
+            return None
+
+        Filter = None
+        if RecordFilter:
+            try:
+                Filter = CompileRecordFilter(RecordFilter, GetSchema(REVTABLEMAIN).fields)
+            except ValueError as e:
+                arcpy.AddError('{}'.format(e))
+                return None
+
         # List of selected session IDs
         sessionIDs = []
 
@@ -676,8 +2044,7 @@ def main():
 
         try:
             # Start an edit session
-            desc = arcpy.Describe(Out_REVTABLEMAIN)
-            if desc.canVersion == 1 and desc.isVersioned == 1:
+            if GetSchema(Out_REVTABLEMAIN).versioned():
                 edit.startEditing(False, True)
                 edit.startOperation()
             else:
@@ -716,14 +2083,25 @@ def main():
                 else:
                     WhereClause = RecordClause
 
+            # The equality and IN comparisons of the filter expression that
+            # fit are added to the where clause, so fewer records are read
+            if Filter is not None:
+                prefilter = Filter.sqlClause(GetSchema(REVTABLEMAIN).types,
+                                             lambda name: arcpy.AddFieldDelimiters(REVTABLEMAIN, name),
+                                             MAX_WHERE_CLAUSE_LENGTH - len(WhereClause) - len(" AND ()"))
+                if prefilter and WhereClause != '':
+                    WhereClause = "({}) AND ({})".format(WhereClause, prefilter)
+                elif prefilter:
+                    WhereClause = prefilter
+
             wherecount = len(WhereClause)
 
             # Limit the length of the where clause to 1000 characters.
             # Certain dbms types limit the length of where clause predicates.
             # Predicates that use IN or OR operators may be limited to 1000 candidates.
-            if wherecount > 1000:
+            if wherecount > MAX_WHERE_CLAUSE_LENGTH:
                 arcpy.AddError("The where clause is too long. There are either too many sessions selected or the Expression parameter (RecordClause) is too long.")
-                sys.exit(0)
+                return None
             else:
                 # Get output session id
                 outSession_dict = {}
@@ -738,13 +2116,44 @@ def main():
 
                 Match = CompareSR(REVTABLEPOINT, Out_REVTABLEPOINT)
 
+                # Only a random sample of the records is copied.  The sampled
+                # records and their geometries are read by id
+                Sample = None
+                MainClauses = [WhereClause]
+                LinkIDs = None
+                if SampleSize:
+                    Sample = SampleRecords(REVTABLEMAIN, WhereClause, SampleSize, SampleField, Filter=Filter)
+                    MainClauses = ChunkClauses(REVTABLEMAIN, GetSchema(REVTABLEMAIN).oid_field, Sample.keys())
+                    LinkIDs = list(Sample.values())
+
+                # With a session index the records and geometries of the
+                # sessions are read by objectid
+                GeometryOIDs = {}
+                if not SampleSize and not RecordClause and SessionClause:
+                    from ReviewerSessionIndex import OpenSessionIndex
+                    index = OpenSessionIndex(Reviewer_Workspace)
+                    if index is not None:
+                        try:
+                            MainClauses = ChunkClauses(REVTABLEMAIN, GetSchema(REVTABLEMAIN).oid_field,
+                                                       index.records(sessionIDs).keys())
+                            for table_name in ("REVTABLEPOINT", "REVTABLELINE", "REVTABLEPOLY"):
+                                GeometryOIDs[table_name] = index.geometryOIDs(table_name, sessionIDs)
+                        finally:
+                            index.close()
+
+                # Check runs and batch runs copied by earlier runs keep the
+                # ids they were given in the output workspace
+                CheckRunMap, BatchRunMap = LoadRunMaps(Reviewer_Workspace, Out_Reviewer_Workspace, OutSessionID)
+                ReusedCheckRuns = set(CheckRunMap)
+
                 # -------------------------
                 # Copy RevTableMain records
                 # -------------------------
                 arcpy.AddMessage("Copying RevTableMain Records")
 
-                in_revtable_fields = [x.name for x in arcpy.ListFields(REVTABLEMAIN)]
-                out_revtable_fields = [x.name for x in arcpy.ListFields(Out_REVTABLEMAIN)]
+                in_revtable_field_types = GetSchema(REVTABLEMAIN).types
+                in_revtable_fields = GetSchema(REVTABLEMAIN).fields
+                out_revtable_fields = GetSchema(Out_REVTABLEMAIN).fields
 
                 UNIQUE_REVTABLEMAIN_FIELDS = (set(in_revtable_fields) & set(out_revtable_fields))
                 READ_REVTABLEMAIN_FIELDS = sorted(list(UNIQUE_REVTABLEMAIN_FIELDS))
@@ -772,103 +2181,183 @@ def main():
 
 
                 REVTABLEMAIN_ID_INDEX = READ_REVTABLEMAIN_FIELDS.index(in_id_field)
-                CheckRunMap = {}
+
+                # Tests the records read against the filter expression
+                matches = None
+                if Filter is not None:
+                    missing = [name for name in Filter.names if name not in READ_REVTABLEMAIN_FIELDS]
+                    if missing:
+                        raise ValueError("The filter expression uses fields that are not in {}: {}".format(
+                            Out_REVTABLEMAIN, ", ".join(missing)))
+                    matches = Filter.predicate(READ_REVTABLEMAIN_FIELDS)
+
                 RowMatches["InIDField"] = in_id_field
                 inID_index = READ_REVTABLEMAIN_FIELDS.index(in_id_field)
                 RowMatches["OutIDField"] = out_id_field
                 outID_index = WRITE_REVTABLEMAIN_FIELDS.index(out_id_field)
-                insert = arcpy.da.InsertCursor(Out_REVTABLEMAIN, WRITE_REVTABLEMAIN_FIELDS)
+                # Daemonic processes, such as the workers of the scheduler,
+                # cannot start reader processes
+                if Readers > 1 and not SampleSize and multiprocessing.current_process().daemon:
+                    arcpy.AddWarning("Reader processes cannot be started from a daemonic process.  "
+                                     "RevTableMain is read in this process.")
+                    Readers = 0
+
+                if Readers > 1 and not SampleSize:
+                    ErrorCount += CopyMainTableParallel(REVTABLEMAIN, Out_REVTABLEMAIN, READ_REVTABLEMAIN_FIELDS,
+                                                        WRITE_REVTABLEMAIN_FIELDS, WhereClause, in_id_field,
+                                                        OutSessionID, db_compatability != 'Old', CheckRunMap,
+                                                        RowMatches, Readers, RecordFilter)
+                elif CanCopyBulk(in_revtable_field_types, READ_REVTABLEMAIN_FIELDS, REVTABLEMAIN, WhereClause):
+                    for MainClause in MainClauses:
+                        ErrorCount += CopyMainTableBulk(REVTABLEMAIN, Out_REVTABLEMAIN, READ_REVTABLEMAIN_FIELDS,
+                                                        WRITE_REVTABLEMAIN_FIELDS, in_revtable_field_types,
+                                                        MainClause, in_id_field, OutSessionID,
+                                                        db_compatability != 'Old', CheckRunMap, RowMatches,
+                                                        matches)
+                else:
+                    insert = arcpy.da.InsertCursor(Out_REVTABLEMAIN, WRITE_REVTABLEMAIN_FIELDS)
 
-                try:
-                    with arcpy.da.SearchCursor(REVTABLEMAIN, READ_REVTABLEMAIN_FIELDS, where_clause=WhereClause) as scursor:                        
-                        for row in scursor:
-                            ErrorCount += 1
-                            # Data Access SearchCursor's return a tuple which are immutable.  We need to create a mutable type so
-                            # we can update the SESSIONID value before inserting the record into the output table.
-                            rowValues = list(row)
+                    try:
+                        for MainClause in MainClauses:
+                            with arcpy.da.SearchCursor(REVTABLEMAIN, READ_REVTABLEMAIN_FIELDS, where_clause=MainClause) as scursor:
+                                for row in scursor:
+                                    if matches is not None and not matches(row):
+                                        continue
 
-                            sessionID = rowValues[REVTABLEMAIN_SESSIONID_INDEX]
-                            checkRunID = rowValues[REVTABLEMAIN_CHECKRUNID_INDEX]
-                            inRecordID = rowValues[REVTABLEMAIN_ID_INDEX]
+                                    ErrorCount += 1
+                                    # Data Access SearchCursor's return a tuple which are immutable.  We need to create a mutable type so
+                                    # we can update the SESSIONID value before inserting the record into the output table.
+                                    rowValues = list(row)
 
-                            # Get CHECKRUNID value
-                            checkRunID = rowValues[REVTABLEMAIN_CHECKRUNID_INDEX]
+                                    sessionID = rowValues[REVTABLEMAIN_SESSIONID_INDEX]
+                                    checkRunID = rowValues[REVTABLEMAIN_CHECKRUNID_INDEX]
+                                    inRecordID = rowValues[REVTABLEMAIN_ID_INDEX]
 
-                            if checkRunID :
-                                # Create new check run IDs
-                                if checkRunID in CheckRunMap:
-                                    check_guid = CheckRunMap[checkRunID]
-                                else:
-                                    check_guid = '{' + str(uuid.uuid4()).upper() + '}'
-                                    CheckRunMap[checkRunID] = check_guid
+                                    # Get CHECKRUNID value
+                                    checkRunID = rowValues[REVTABLEMAIN_CHECKRUNID_INDEX]
 
-                                rowValues[REVTABLEMAIN_CHECKRUNID_INDEX] = check_guid
+                                    if checkRunID :
+                                        # Create new check run IDs
+                                        if checkRunID in CheckRunMap:
+                                            check_guid = CheckRunMap[checkRunID]
+                                        else:
+                                            check_guid = '{' + str(uuid.uuid4()).upper() + '}'
+                                            CheckRunMap[checkRunID] = check_guid
 
-                            # Update the record id map
+                                        rowValues[REVTABLEMAIN_CHECKRUNID_INDEX] = check_guid
 
-                            geomType = rowValues[REVTABLEMAIN_GEOMETRYTYPE_INDEX]
+                                    # Update the record id map
 
-                            rowValues[REVTABLEMAIN_SESSIONID_INDEX] = OutSessionID
+                                    geomType = rowValues[REVTABLEMAIN_GEOMETRYTYPE_INDEX]
 
-                            if db_compatability != 'Old':
-                                record_guid = '{' + str(uuid.uuid4()).upper() + '}'
-                                rowValues[REVTABLEMAIN_ID_INDEX] = record_guid
+                                    rowValues[REVTABLEMAIN_SESSIONID_INDEX] = OutSessionID
 
-                            outRecordID = insert.insertRow(rowValues)
+                                    if db_compatability != 'Old':
+                                        record_guid = '{' + str(uuid.uuid4()).upper() + '}'
+                                        rowValues[REVTABLEMAIN_ID_INDEX] = record_guid
 
-                            if db_compatability == 'Old':
-                                outID = outRecordID
-                            else:
-                                outID = record_guid
-                            RowMatches[inRecordID] = outID
+                                    outRecordID = insert.insertRow(rowValues)
 
-                finally:
-                    del insert
+                                    if db_compatability == 'Old':
+                                        outID = outRecordID
+                                    else:
+                                        outID = record_guid
+                                    RowMatches[inRecordID] = outID
+
+                    finally:
+                        del insert
+
+                # When only some records of the sessions are copied, such as a
+                # batch of an archive, the geometries are read by the link ids
+                # of the copied records instead of by session
+                if LinkIDs is None and not GeometryOIDs and (RecordClause or RecordFilter):
+                    LinkIDs = list(RowIDMatches(RowMatches))
 
                 # ---------------------------
                 # Copy REVTABLEPOINT features
                 # ---------------------------
                 arcpy.AddMessage("Copying Point Geometries")
-                CopyGeometryFeatures(REVTABLEPOINT, Out_REVTABLEPOINT, SessionClause, RowMatches, OutSessionID, PointMatches)
+                CopyLinkedFeatures(REVTABLEPOINT, Out_REVTABLEPOINT, SessionClause, LinkIDs, RowMatches, OutSessionID,
+                                   PointMatches, GeometryOIDs.get("REVTABLEPOINT"))
 
                 # --------------------------
                 # Copy REVTABLELINE features
                 # --------------------------
                 arcpy.AddMessage("Copying Line Geometries")
-                CopyGeometryFeatures(REVTABLELINE, Out_REVTABLELINE, SessionClause, RowMatches, OutSessionID, LineMatches)
+                CopyLinkedFeatures(REVTABLELINE, Out_REVTABLELINE, SessionClause, LinkIDs, RowMatches, OutSessionID,
+                                   LineMatches, GeometryOIDs.get("REVTABLELINE"))
 
                 # --------------------------
                 # Copy REVTABLEPOLY features
                 # --------------------------
                 arcpy.AddMessage("Copying Polygon Geometries")
-                CopyGeometryFeatures(REVTABLEPOLY, Out_REVTABLEPOLY, SessionClause, RowMatches, OutSessionID, PolyMatches)
+                CopyLinkedFeatures(REVTABLEPOLY, Out_REVTABLEPOLY, SessionClause, LinkIDs, RowMatches, OutSessionID,
+                                   PolyMatches, GeometryOIDs.get("REVTABLEPOLY"))
 
                 # ------------------------
                 # Copy REVTABLELOC records
                 # ------------------------
-                arcpy.AddMessage("Copying Location Records")
-                CopyGeometryFeatures(REVTABLELOC, Out_REVTABLELOC, SessionClause, RowMatches, OutSessionID, MisMatches)
+                if SkipAttachments:
+                    arcpy.AddMessage("Skipping Location Records")
+                else:
+                    arcpy.AddMessage("Copying Location Records")
+                    CopyLinkedFeatures(REVTABLELOC, Out_REVTABLELOC, SessionClause, LinkIDs, RowMatches, OutSessionID,
+                                       MisMatches)
 
                 # ------------------------
                 # Copy Batch Job info records
                 # ------------------------
-                CopyRunTables(Reviewer_Workspace, Out_Reviewer_Workspace, SessionClause, OutSessionID, CheckRunMap, BatchRunMatches, CheckRunMatches)
+                CopyRunTables(Reviewer_Workspace, Out_Reviewer_Workspace, SessionClause, OutSessionID, CheckRunMap, BatchRunMatches, CheckRunMatches, SkipAttachments,
+                              ReusedCheckRuns, BatchRunMap)
 
                 # Save edits
                 if edit.isEditing:
                     edit.stopEditing(True)
 
+                SaveRunMaps(Reviewer_Workspace, Out_Reviewer_Workspace, OutSessionID, CheckRunMap, BatchRunMap)
+
+
+                # ----------------------
+                # Verify copied records
+                # ----------------------
+                if Verify or Delete:
+                    arcpy.AddMessage("Verifying Copied Records")
+                    verify_tables = [("REVTABLEPOINT", REVTABLEPOINT, Out_REVTABLEPOINT),
+                                     ("REVTABLELINE", REVTABLELINE, Out_REVTABLELINE),
+                                     ("REVTABLEPOLY", REVTABLEPOLY, Out_REVTABLEPOLY)]
+                    if not SkipAttachments:
+                        verify_tables.append(("REVTABLELOCATION", REVTABLELOC, Out_REVTABLELOC))
+
+                    # Pre 10.6 output records are found by the objectid returned by the insert
+                    if db_compatability == 'Old':
+                        verify_id_field = "OID@"
+                    else:
+                        verify_id_field = WRITE_REVTABLEMAIN_FIELDS[REVTABLEMAIN_ID_INDEX]
+
+                    verification = VerifyCopy(REVTABLEMAIN, Out_REVTABLEMAIN, READ_REVTABLEMAIN_FIELDS,
+                                              WRITE_REVTABLEMAIN_FIELDS, in_id_field, verify_id_field, RowMatches,
+                                              CheckRunMap, verify_tables, Match)
 
                 # If successfully make it to the end of the script and delete is set to
-                # true - delete the records
-                if Delete == "true":
-                    for dictionary in log_dicts:
-                        DeleteRows(Reviewer_Workspace, dictionary)
+                # true - delete the records once the copy is verified
+                if Delete:
+                    if verification["passed"]:
+                        for dictionary in [RowMatches, PointMatches, LineMatches, PolyMatches, MisMatches]:
+                            DeleteRows(Reviewer_Workspace, dictionary)
+
+                        # Run table rows still used by records left in the
+                        # input workspace are not deleted
+                        KeepReferencedRunRows(Reviewer_Workspace, CheckRunMatches, BatchRunMatches)
+                        for dictionary in [BatchRunMatches, CheckRunMatches]:
+                            DeleteRows(Reviewer_Workspace, dictionary)
+                    else:
+                        arcpy.AddError("The copied records do not match the input records.  "
+                                       "No records were deleted from {}".format(Reviewer_Workspace))
 
             # --------------
             # Create logfile
             # --------------
-            if createLog == "true":
+            if createLog:
                 # Determine output folder
                 (filepath, filename) = os.path.split(Out_Reviewer_Workspace)
 
@@ -880,18 +2369,17 @@ def main():
                         if os.access(scratch, os.W_OK):
                             (filepath, fileName) = os.path.split(scratch)
                         else:
-                            createLog = 'false'
+                            createLog = False
                     except Exception as e:
-                        arcpy.AddWarning("Cannot write logfile.  An error occurred while trying to access the geoprocessing scratch workspace: " + e.message)
-                        createLog = "false"
+                        arcpy.AddWarning("Cannot write logfile.  An error occurred while trying to access the geoprocessing scratch workspace: {}".format(e))
+                        createLog = False
 
             # if we will be able to write output log
-            if createLog == "true":
+            if createLog:
                 now = datetime.datetime.now()
                 time_str = now.strftime("%Y%m%dT%H%M%S")
 
-                logfile = filepath + "\\CopyDataReviewerRecordsLog_" + time_str \
-                + ".txt"
+                logfile = os.path.join(filepath, "CopyDataReviewerRecordsLog_" + time_str + ".txt")
 
                 log = open(logfile, "w")
 
@@ -927,27 +2415,101 @@ def main():
                 msg = "Total Records from {}: {}".format(dict_name, cnt)
 
                 arcpy.AddMessage(msg)
-                if createLog == "true":
+                if createLog:
                     log.write(msg + "\n")
 
-            if createLog == "true":
+            if verification is not None:
+                for table_name, table_result in sorted(verification["tables"].items()):
+                    msg = "Verified {}: {} records, {} missing, {} different".format(
+                        table_name, table_result["rows"], table_result["missing"], table_result["mismatched"])
+                    arcpy.AddMessage(msg)
+                    if createLog:
+                        log.write(msg + "\n")
+                summarydict["Verification"] = verification
+
+            if createLog:
                 log.close()
                 arcpy.AddMessage("\n")
                 arcpy.AddMessage("Logfile created at: " + logfile)
 
 
-        except Exception as e:
+        except Exception:
 
             if edit.isEditing:
 
                 arcpy.AddMessage("Rolling back edits made to " + Out_Reviewer_Workspace)
                 edit.stopEditing(False)
 
-            arcpy.AddError('{}'.format(e))
-            tb = sys.exc_info()[2]
-            arcpy.AddError("Failed at Line %i" % tb.tb_lineno)
+            raise
+
+    return summarydict
+
+# ------------------------------------------------------------------------------
+# Runs the main function of a script tool.  A ValueError, such as a workspace
+# that is not a Reviewer workspace, is reported as a tool error
+# ------------------------------------------------------------------------------
+def RunTool(main):
+    try:
+        main()
+    except ValueError as e:
+        arcpy.AddError('{}'.format(e))
+        sys.exit(1)
+
+# ------------------------------------------------------------------
+# Runs the copy with the parameters of the script tool
+# ------------------------------------------------------------------
+def main():
 
+    # Script arguments
+    Reviewer_Workspace = arcpy.GetParameterAsText(0)
+    Sessions = arcpy.GetParameterAsText(1)
+    RecordClause = arcpy.GetParameterAsText(3)
+    Out_Reviewer_Workspace = arcpy.GetParameterAsText(4)
+    Out_Exist_Session = arcpy.GetParameterAsText(5)
+    Delete = arcpy.GetParameterAsText(6)
+    createLog = arcpy.GetParameterAsText(7)
+
+    # Optional plan only parameter.  Toolboxes without the parameter always
+    # copy the records
+    PlanOnly = ''
+    if arcpy.GetArgumentCount() > 8:
+        PlanOnly = arcpy.GetParameterAsText(8)
+
+    SkipAttachments = ''
+    if arcpy.GetArgumentCount() > 9:
+        SkipAttachments = arcpy.GetParameterAsText(9)
+
+    Verify = ''
+    if arcpy.GetArgumentCount() > 10:
+        Verify = arcpy.GetParameterAsText(10)
+
+    SampleSize = ''
+    if arcpy.GetArgumentCount() > 11:
+        SampleSize = arcpy.GetParameterAsText(11)
+
+    SampleField = ''
+    if arcpy.GetArgumentCount() > 12:
+        SampleField = arcpy.GetParameterAsText(12)
+
+    Readers = ''
+    if arcpy.GetArgumentCount() > 13:
+        Readers = arcpy.GetParameterAsText(13)
+
+    RecordFilter = ''
+    if arcpy.GetArgumentCount() > 14:
+        RecordFilter = arcpy.GetParameterAsText(14)
+
+    # Input sessions to Python list
+    SessionsList = Sessions.split(";")
+
+    # Strip any trailing/leading ' that might exist
+    for i,value in enumerate(SessionsList):
+        SessionsList[i] = value.strip("'")
 
+    CopyRecords(Reviewer_Workspace, SessionsList, Out_Reviewer_Workspace, Out_Exist_Session, RecordClause,
+                Delete == "true", createLog == "true", PlanOnly == "true", SkipAttachments == "true",
+                Verify == "true", int(SampleSize) if SampleSize else 0, SampleField or None,
+                int(Readers) if Readers else 0, RecordFilter or None)
 
 if __name__ == '__main__':
-    main()
+    RunTool(main)
@@ -0,0 +1,425 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Runs a manifest of copy and export jobs in parallel worker processes.  Jobs
+# that write to the same Reviewer workspace or output folder run one at a
+# time so they do not fight over edit locks, everything else runs at the same
+# time up to the maximum number of workers.  The number of jobs using the
+# same database connection at once can also be limited, and failed jobs are
+# retried.
+#
+#   python DataReviewerScheduler.py manifest.json [--workers 4] [--per-connection 2]
+#
+# A JSON manifest is a list of jobs, or {"jobs": [...]}.  A CSV manifest has
+# one job per row with the same names as columns.  Each job has a command
+# (copy, export, parquet, tee, summary, archive, grid, index or compare) and the
+# arguments of that command:
+#   copy:    in_workspace, out_workspace, out_session, sessions, where, delete, log,
+#            skip_attachments, verify, sample_size, sample_field, filter
+#   export:  workspace, out_folder, shape_name, sessions, fields, sample_size,
+#            sample_field, incremental, spatial_sort
+#   parquet: workspace, out_folder, sessions, fields, partition_by_status
+#   tee:     workspace, outputs, sessions, fields
+#   summary: workspace, out_table, sessions, fields
+#   archive: in_workspace, out_workspace, out_session, sessions, statuses, phases,
+#            older_than_days, date_field, batch_size, log
+#   grid:    workspace, out_feature_class, cell_size, sessions, hexagon
+#   index:   workspace, rebuild
+#   compare: workspace, other_workspace, out_report, sessions, ignore_sessions
+# plus an optional id, plan and retries.  The workers cannot start processes,
+# so the readers option of copy is ignored.  sessions, fields, outputs, statuses
+# and phases are semicolon delimited lists.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Default number of worker processes
+DEFAULT_WORKERS = 4
+
+# Default number of jobs that may use one database connection at once
+DEFAULT_PER_CONNECTION = 2
+
+# Default number of times a failed job is run again
+DEFAULT_RETRIES = 1
+
+# Seconds to wait before a failed job is run again
+RETRY_DELAY = 30
+
+# Seconds a job may run before its worker process is stopped and it is
+# reported as failed
+DEFAULT_JOB_TIMEOUT = 12 * 60 * 60
+
+# Command line options of each job argument, in the order the command
+# line expects the positional arguments
+POSITIONAL_ARGS = {"copy": ("in_workspace", "out_workspace", "out_session"),
+                   "export": ("workspace", "out_folder", "shape_name"),
+                   "parquet": ("workspace", "out_folder"),
+                   "tee": ("workspace", "outputs"),
+                   "summary": ("workspace", "out_table"),
+                   "archive": ("in_workspace", "out_workspace", "out_session"),
+                   "grid": ("workspace", "out_feature_class", "cell_size"),
+                   "index": ("workspace",),
+                   "compare": ("workspace", "other_workspace", "out_report")}
+VALUE_OPTIONS = ("sessions", "where", "fields", "statuses", "phases", "older_than_days", "date_field",
+                 "batch_size", "sample_size", "sample_field", "spatial_sort", "filter")
+FLAG_OPTIONS = ("delete", "log", "plan", "partition_by_status", "skip_attachments", "verify",
+                "hexagon", "incremental", "rebuild", "ignore_sessions")
+
+# -----------------------------------------------------------
+# Reads the jobs from a JSON or CSV manifest
+# -----------------------------------------------------------
+def ReadManifest(path):
+    if path.lower().endswith(".csv"):
+        with open(path) as f:
+            jobs = [dict((k, v) for k, v in row.items() if v not in (None, '')) for row in csv.DictReader(f)]
+    else:
+        with open(path) as f:
+            jobs = json.load(f)
+        if isinstance(jobs, dict):
+            jobs = jobs["jobs"]
+
+    for i, job in enumerate(jobs):
+        job.setdefault("id", str(i + 1))
+
+    return jobs
+
+# -----------------------------------------------------------
+# Returns True for the values used for a checked option
+# -----------------------------------------------------------
+def IsTrue(value):
+    if hasattr(value, "lower"):
+        return value.lower() in ("true", "yes", "1")
+    return bool(value)
+
+# -----------------------------------------------------------
+# Builds the ManageDataReviewerRecords command line of a job
+# -----------------------------------------------------------
+def BuildArgv(job):
+    command = job["command"]
+    if command not in POSITIONAL_ARGS:
+        raise ValueError("Job {} has an unknown command {}".format(job["id"], command))
+
+    if "readers" in job:
+        print("Job {} reads its records in the worker process, the readers option is ignored".format(job["id"]))
+
+    argv = [command]
+    for name in POSITIONAL_ARGS[command]:
+        if name == "outputs":
+            argv += JobOutputs(job)
+        else:
+            argv.append(str(job[name]))
+    for name in VALUE_OPTIONS:
+        if name in job:
+            value = job[name]
+            if isinstance(value, list):
+                value = ";".join(str(item) for item in value)
+            argv += ["--" + name.replace("_", "-"), str(value)]
+    for name in FLAG_OPTIONS:
+        if IsTrue(job.get(name, False)):
+            argv.append("--" + name.replace("_", "-"))
+
+    return argv
+
+# -----------------------------------------------------------
+# Returns the outputs of a tee job as a list
+# -----------------------------------------------------------
+def JobOutputs(job):
+    outputs = job["outputs"]
+    if not isinstance(outputs, list):
+        outputs = [value.strip() for value in outputs.split(";") if value.strip()]
+    return outputs
+
+# ----------------------------------------------------
+# Returns a key that identifies a workspace or folder
+# ----------------------------------------------------
+def PathKey(path):
+    return os.path.normcase(os.path.abspath(path))
+
+# ------------------------------------------------------------------------------
+# Returns the workspaces and folders a job writes to, which no other job may
+# write to at the same time, and the database connections it uses
+# ------------------------------------------------------------------------------
+def JobResources(job):
+    if job["command"] in ("copy", "archive"):
+        writes = set([PathKey(job["out_workspace"])])
+        if job["command"] == "archive" or IsTrue(job.get("delete", False)):
+            writes.add(PathKey(job["in_workspace"]))
+        connections = set([PathKey(job["in_workspace"]), PathKey(job["out_workspace"])])
+    elif job["command"] == "tee":
+        writes = set(PathKey(os.path.dirname(PathKey(output))) for output in JobOutputs(job))
+        connections = set([PathKey(job["workspace"])])
+    elif job["command"] == "index":
+        writes = set([PathKey(job["workspace"]) + ".sessions"])
+        connections = set([PathKey(job["workspace"])])
+    elif job["command"] == "compare":
+        writes = set([PathKey(os.path.dirname(PathKey(job["out_report"])))])
+        connections = set([PathKey(job["workspace"]), PathKey(job["other_workspace"])])
+    elif job["command"] in ("summary", "grid"):
+        output = job["out_table"] if job["command"] == "summary" else job["out_feature_class"]
+        writes = set([PathKey(os.path.dirname(PathKey(output)))])
+        connections = set([PathKey(job["workspace"])])
+    else:
+        writes = set([PathKey(job["out_folder"])])
+        connections = set([PathKey(job["workspace"])])
+
+    # a plan only job does not write anything
+    if IsTrue(job.get("plan", False)):
+        writes = set()
+
+    return writes, connections
+
+# ------------------------------------------------------------------------------
+# Runs one job in a worker process.  Worker processes stay open between jobs,
+# so arcpy is imported once per worker
+# ------------------------------------------------------------------------------
+def RunJob(argv):
+    start = time.time()
+    try:
+        import ManageDataReviewerRecords
+
+        args = ManageDataReviewerRecords.MakeParser(ManageDataReviewerRecords.JobArgumentParser).parse_args(argv)
+        result = args.run(args)
+        status = "ok" if result is not None else "failed"
+        error = None
+    except (Exception, SystemExit) as e:
+        result = None
+        status = "error"
+        error = "{}\n{}".format(e, traceback.format_exc())
+
+    return {"status": status, "result": json.loads(json.dumps(result, default=str)),
+            "error": error, "seconds": time.time() - start}
+
+# ------------------------------------------------------------------------------
+# Runs the jobs sent to a worker process until it is sent None, and puts
+# (key, result) on the done queue for each
+# ------------------------------------------------------------------------------
+def WorkerLoop(tasks, done):
+    for key, argv in iter(tasks.get, None):
+        done.put((key, RunJob(argv)))
+
+# ------------------------------------------------------------------------------
+# Returns the result of a job that failed outside RunJob, such as when its
+# worker process died, or that did not finish in time
+# ------------------------------------------------------------------------------
+def FailedResult(error, timeout=False):
+    result = {"status": "error", "result": None, "error": "{}".format(error)}
+    if timeout:
+        result["timeout"] = True
+    return result
+
+# ------------------------------------------------------------------------------
+# Worker process running one job at a time.  Each worker has its own task
+# queue, so the scheduler knows which process runs which job and can stop it
+# ------------------------------------------------------------------------------
+class JobWorker(object):
+
+    def __init__(self, done):
+        self.tasks = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=WorkerLoop, args=(self.tasks, done))
+        self.process.daemon = True
+        self.process.start()
+        self.attempt = None
+
+    def run(self, key, argv, attempt):
+        self.attempt = attempt
+        self.tasks.put((key, argv))
+
+    def exited(self):
+        return not self.process.is_alive()
+
+    # Asks the worker to exit once its current job is done
+    def close(self):
+        if not self.exited():
+            self.tasks.put(None)
+
+    # Stops the worker and waits for its process to exit
+    def terminate(self):
+        self.process.terminate()
+        self.process.join()
+
+    def join(self):
+        self.process.join()
+
+# ------------------------------------------------------------------------------
+# Workspaces and folders locked by the running jobs, and the number of running
+# jobs using each database connection
+# ------------------------------------------------------------------------------
+class ResourceLocks(object):
+
+    def __init__(self, per_connection=DEFAULT_PER_CONNECTION):
+        self.per_connection = max(1, per_connection)
+        self.locked = set()
+        self.connection_use = {}
+
+    def free(self, entry):
+        if entry["writes"] & self.locked:
+            return False
+        return all(self.connection_use.get(c, 0) < self.per_connection for c in entry["connections"])
+
+    def acquire(self, entry):
+        self.locked.update(entry["writes"])
+        for c in entry["connections"]:
+            self.connection_use[c] = self.connection_use.get(c, 0) + 1
+
+    def release(self, entry):
+        self.locked.difference_update(entry["writes"])
+        for c in entry["connections"]:
+            self.connection_use[c] -= 1
+            if not self.connection_use[c]:
+                del self.connection_use[c]
+
+# ------------------------------------------------------------------------------
+# Runs the jobs.  A job that runs past the timeout has its worker process
+# stopped before the workspaces it writes to are unlocked, and a job whose
+# worker process dies fails at once.  Both are replaced by a new worker.
+# Timed out jobs are not retried.  Returns a dictionary of job id: result of
+# the last attempt
+# ------------------------------------------------------------------------------
+def RunJobs(jobs, workers=DEFAULT_WORKERS, per_connection=DEFAULT_PER_CONNECTION, retries=DEFAULT_RETRIES,
+            retry_delay=RETRY_DELAY, job_timeout=DEFAULT_JOB_TIMEOUT):
+
+    pending = []
+    for job in jobs:
+        writes, connections = JobResources(job)
+        pending.append({"job": job, "argv": BuildArgv(job), "writes": writes, "connections": connections,
+                        "attempts": 0, "retries": int(job.get("retries", retries)), "notBefore": 0})
+
+    locks = ResourceLocks(per_connection)
+    results = {}
+    done = multiprocessing.Queue()
+    pool = [JobWorker(done) for i in range(max(1, workers))]
+
+    # Finishes an attempt whose worker is no longer running it
+    def Finish(worker, result):
+        entry = worker.attempt
+        worker.attempt = None
+        result.setdefault("seconds", time.time() - entry["started"])
+        locks.release(entry)
+
+        job_id = entry["job"]["id"]
+        result["attempts"] = entry["attempts"]
+        results[job_id] = result
+        print("Job {} {} in {:.1f} seconds".format(job_id, result["status"], result["seconds"]))
+
+        if result["status"] != "ok" and entry["attempts"] <= entry["retries"] and not result.get("timeout"):
+            entry["notBefore"] = time.time() + retry_delay
+            pending.append(entry)
+
+    try:
+        while pending or any(worker.attempt for worker in pool):
+            # Start every pending job whose workspaces and connections are free
+            now = time.time()
+            for entry in list(pending):
+                idle = [worker for worker in pool if worker.attempt is None]
+                if not idle:
+                    break
+                if entry["notBefore"] > now or not locks.free(entry):
+                    continue
+
+                pending.remove(entry)
+                locks.acquire(entry)
+                entry["attempts"] += 1
+                entry["started"] = time.time()
+
+                print("Starting job {} (attempt {}): {}".format(entry["job"]["id"], entry["attempts"],
+                                                                " ".join(entry["argv"])))
+                idle[0].run((entry["job"]["id"], entry["attempts"]), entry["argv"], entry)
+
+            # Wait for a job to finish, or for a retry delay to pass
+            try:
+                key, result = done.get(timeout=1)
+            except queue.Empty:
+                key = None
+
+            # A job is only finished once, a result that arrives after its
+            # worker was stopped is dropped
+            if key is not None:
+                for worker in pool:
+                    if worker.attempt and (worker.attempt["job"]["id"], worker.attempt["attempts"]) == key:
+                        Finish(worker, result)
+
+            # Workers that died or ran past the timeout are replaced.  The
+            # locks of their job are released once the process has exited
+            now = time.time()
+            for i, worker in enumerate(pool):
+                if worker.attempt and worker.exited():
+                    worker.join()
+                    Finish(worker, FailedResult("Worker process exited with code {}".format(worker.process.exitcode)))
+                elif worker.attempt and job_timeout and now - worker.attempt["started"] > job_timeout:
+                    worker.terminate()
+                    Finish(worker, FailedResult("Job did not finish in {} seconds".format(job_timeout), True))
+                else:
+                    continue
+                pool[i] = JobWorker(done)
+    finally:
+        for worker in pool:
+            if worker.attempt:
+                worker.terminate()
+            else:
+                worker.close()
+        for worker in pool:
+            worker.join()
+
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a manifest of Data Reviewer copy and export jobs.")
+    parser.add_argument("manifest", help="JSON or CSV manifest of jobs")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="number of worker processes")
+    parser.add_argument("--per-connection", type=int, default=DEFAULT_PER_CONNECTION,
+                        help="number of jobs that may use one workspace connection at once")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="times a failed job is run again")
+    parser.add_argument("--retry-delay", type=float, default=RETRY_DELAY, help="seconds before a retry")
+    parser.add_argument("--job-timeout", type=float, default=DEFAULT_JOB_TIMEOUT,
+                        help="seconds a job may run before it is reported as failed, 0 for no limit")
+    parser.add_argument("--results", help="write the job results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = RunJobs(ReadManifest(args.manifest), args.workers, args.per_connection, args.retries, args.retry_delay,
+                      args.job_timeout)
+
+    if args.results:
+        with open(args.results, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    failed = [job_id for job_id, result in results.items() if result["status"] != "ok"]
+    if failed:
+        print("Failed jobs: {}".format(", ".join(sorted(failed))))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,267 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Long running worker that imports arcpy once and runs copy and export jobs
+# sent to it over a local socket.  Table paths and workspace versions are
+# cached between jobs, so only the first job against a workspace pays for
+# looking them up.
+#
+# Start the worker:
+#   python DataReviewerWorker.py serve [--port 8765]
+# Send a job (one JSON object per line, one JSON reply per line):
+#   {"command": "copy", "args": {"Reviewer_Workspace": "...", "SessionsList": ["..."],
+#    "Out_Reviewer_Workspace": "...", "Out_Exist_Session": "..."}}
+#   {"argv": ["export", "C:\\data\\Reviewer.gdb", "C:\\out", "errors", "--sessions", "Session 1"]}
+# Other commands: ping, stats, clear_cache, shutdown
+#   python DataReviewerWorker.py submit job.json [--port 8765]
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules.  arcpy and the tools are imported by the worker
+# when it starts, so submitting jobs does not need arcpy
+import argparse
+import json
+import socket
+import sys
+import time
+import traceback
+
+# Default port.  The worker only listens on the local machine
+DEFAULT_PORT = 8765
+HOST = "127.0.0.1"
+
+# ----------------------------------------------------------------------
+# Imports arcpy and the tools, and returns the functions that can be run
+# by name with keyword arguments
+# ----------------------------------------------------------------------
+def LoadTools():
+    import CopyDataReviewerRecords
+    import ExportDataReviewerRecordstoShapefile
+    import ExportDataReviewerRecordstoParquet
+    import ExportDataReviewerRecordstoMultipleFormats
+    import ArchiveDataReviewerRecords
+    import SummarizeDataReviewerRecords
+    import ExportDataReviewerRecordstoGrid
+    import ReviewerSessionIndex
+    import CompareDataReviewerRecords
+
+    return {"copy": CopyDataReviewerRecords.CopyRecords,
+            "export": ExportDataReviewerRecordstoShapefile.ExportRecords,
+            "parquet": ExportDataReviewerRecordstoParquet.ExportToParquet,
+            "tee": ExportDataReviewerRecordstoMultipleFormats.ExportToSinks,
+            "archive": ArchiveDataReviewerRecords.ArchiveRecords,
+            "summary": SummarizeDataReviewerRecords.SummarizeRecords,
+            "grid": ExportDataReviewerRecordstoGrid.ExportToGrid,
+            "index": ReviewerSessionIndex.BuildSessionIndex,
+            "compare": CompareDataReviewerRecords.CompareRecords}
+
+# ------------------------------------------------------------
+# Returns the workspaces given in the arguments of a job
+# ------------------------------------------------------------
+def JobWorkspaces(args):
+    return [value for name, value in args.items() if "workspace" in name.lower() and value]
+
+# ------------------------------------------------------------------------
+# Returns the arcpy messages of the last tool, or None without arcpy
+# ------------------------------------------------------------------------
+def ToolMessages():
+    try:
+        import arcpy
+    except ImportError:
+        return None
+    return arcpy.GetMessages()
+
+# ------------------------------------------------------------------------
+# Runs one job and returns the reply sent to the client.  cache is the
+# module holding the table metadata cache, CopyDataReviewerRecords
+# ------------------------------------------------------------------------
+def RunJob(job, tools, stats, cache):
+    import ManageDataReviewerRecords
+
+    reply = {"id": job.get("id")}
+    command = job.get("command")
+    start = time.time()
+    cached = len(cache.METADATA_CACHE)
+
+    try:
+        # The cached metadata of workspaces changed since the last job is
+        # looked up again
+        if "argv" in job:
+            parser = ManageDataReviewerRecords.MakeParser(ManageDataReviewerRecords.JobArgumentParser)
+            args = parser.parse_args(job["argv"])
+            command = args.command
+            cache.RefreshMetadataCache(*JobWorkspaces(vars(args)))
+            result = args.run(args)
+        elif command in tools:
+            cache.RefreshMetadataCache(*JobWorkspaces(job.get("args", {})))
+            result = tools[command](**job.get("args", {}))
+        elif command == "ping":
+            result = "pong"
+        elif command == "stats":
+            result = dict(stats)
+        elif command == "clear_cache":
+            cache.ClearMetadataCache()
+            result = "cleared"
+        else:
+            raise ValueError("Unknown command {}".format(command))
+
+        reply["status"] = "ok" if result is not None else "failed"
+        reply["result"] = result
+
+    # the tools raise ValueError when a workspace is not valid or the job's
+    # arguments are not. The worker reports the failure and keeps running,
+    # also when a tool calls sys.exit
+    except (Exception, SystemExit) as e:
+        reply["status"] = "error"
+        reply["error"] = "{}".format(e)
+        reply["traceback"] = traceback.format_exc()
+
+    if reply["status"] != "ok":
+        reply["messages"] = ToolMessages()
+
+    elapsed = time.time() - start
+    reply["metrics"] = {"seconds": elapsed,
+                        "cachedMetadata": len(cache.METADATA_CACHE),
+                        "newMetadata": len(cache.METADATA_CACHE) - cached}
+
+    if command in tools:
+        stats["jobs"] += 1
+        stats["jobSeconds"] += elapsed
+        if reply["status"] != "ok":
+            stats["failedJobs"] += 1
+
+    return reply
+
+# ------------------------------------------------------------------
+# Reads JSON lines from one client and answers each with a JSON line
+# ------------------------------------------------------------------
+def ServeClient(connection, tools, stats, cache):
+    stream = connection.makefile("rwb")
+    try:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                job = json.loads(line.decode("utf-8"))
+            except ValueError as e:
+                job = None
+                reply = {"status": "error", "error": "Invalid job: {}".format(e)}
+
+            if job is not None:
+                if job.get("command") == "shutdown":
+                    reply = {"id": job.get("id"), "status": "ok", "result": "shutdown"}
+                else:
+                    reply = RunJob(job, tools, stats, cache)
+
+            stream.write((json.dumps(reply, default=str) + "\n").encode("utf-8"))
+            stream.flush()
+
+            if job is not None and job.get("command") == "shutdown":
+                return False
+    finally:
+        stream.close()
+
+    return True
+
+# ---------------------------------------------------------------
+# Accepts clients one at a time until a shutdown job is received.
+# Jobs run one after another, arcpy is not safe to use from threads
+# ---------------------------------------------------------------
+def Serve(port=DEFAULT_PORT):
+    start = time.time()
+    tools = LoadTools()
+    stats = {"startupSeconds": time.time() - start, "jobs": 0, "failedJobs": 0, "jobSeconds": 0.0}
+
+    import arcpy
+    import CopyDataReviewerRecords
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((HOST, port))
+    server.listen(5)
+    arcpy.AddMessage("Data Reviewer worker listening on {}:{}".format(HOST, port))
+
+    try:
+        running = True
+        while running:
+            connection, address = server.accept()
+            try:
+                running = ServeClient(connection, tools, stats, CopyDataReviewerRecords)
+            finally:
+                connection.close()
+    finally:
+        server.close()
+
+    return stats
+
+# -------------------------------------------------------
+# Sends jobs to a running worker and returns the replies
+# -------------------------------------------------------
+def SubmitJobs(jobs, port=DEFAULT_PORT, timeout=None):
+    connection = socket.create_connection((HOST, port), timeout)
+    stream = connection.makefile("rwb")
+    replies = []
+    try:
+        for job in jobs:
+            stream.write((json.dumps(job) + "\n").encode("utf-8"))
+            stream.flush()
+            replies.append(json.loads(stream.readline().decode("utf-8")))
+    finally:
+        stream.close()
+        connection.close()
+
+    return replies
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker that runs Data Reviewer copy and export jobs.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    serve = commands.add_parser("serve", help="start the worker")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    submit = commands.add_parser("submit", help="send the jobs in a JSON file to a running worker")
+    submit.add_argument("jobs", help="JSON file with a job or a list of jobs")
+    submit.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        Serve(args.port)
+        return 0
+
+    with open(args.jobs) as f:
+        jobs = json.load(f)
+    if isinstance(jobs, dict):
+        jobs = [jobs]
+
+    replies = SubmitJobs(jobs, args.port)
+    print(json.dumps(replies, indent=2))
+
+    if any(reply.get("status") != "ok" for reply in replies):
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Exports the density of the reviewer errors in the selected Reviewer
+# workspace sessions to a grid of square or hexagon cells.  The
+# representative point of each error, the same point the shapefile export
+# writes, is binned into a cell and one polygon is written for each cell with
+# errors.  Each cell has the number of errors, the number of point, line and
+# polygon errors and the number of errors with each lifecycle status.  The
+# points are binned with numpy a chunk at a time, so memory use and the size
+# of the output depend on the number of cells, not the number of errors.
+# Errors without geometry are not included.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import arcpy
+import math
+import os
+
+from CopyDataReviewerRecords import getFullPath, GetSchema, RunTool
+from ReviewerRecordStream import GetSessionIDs, MakeSessionClause, IterErrorRecords
+
+# numpy ships with ArcGIS, the grid export cannot run without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Number of points binned at a time
+GRID_CHUNK_SIZE = 100000
+
+# Cell shapes
+GRID_SHAPES = ("SQUARE", "HEXAGON")
+
+# Geometry types counted for each cell, by the index returned by GeometryIndex
+GEOMETRY_FIELDS = ("POINTS", "LINES", "POLYGONS")
+
+# Cell indexes are stored in one unsigned 64 bit key, 32 bits each
+KEY_OFFSET = 2 ** 31
+
+# ----------------------------------------------------------------
+# Returns the index in GEOMETRY_FIELDS of a reviewer geometry type
+# ----------------------------------------------------------------
+def GeometryIndex(shape):
+    if shape.type == 'polyline':
+        return 1
+    if shape.type == 'polygon':
+        return 2
+    return 0
+
+# ---------------------------------------------------------------------------
+# Returns the column and row of the cell of each point.  Hexagons are pointy
+# topped, with CellSize the distance across their flat sides, and the column
+# and row are axial hexagon coordinates
+# ---------------------------------------------------------------------------
+def CellIndexes(x, y, CellSize, GridShape):
+    if GridShape == "SQUARE":
+        return numpy.floor(x / CellSize).astype(numpy.int64), numpy.floor(y / CellSize).astype(numpy.int64)
+
+    radius = CellSize / math.sqrt(3)
+    q = (math.sqrt(3) / 3 * x - y / 3.0) / radius
+    r = (2.0 / 3 * y) / radius
+
+    # Round the cube coordinates (q, -q-r, r) to the nearest hexagon
+    rq = numpy.rint(q)
+    rr = numpy.rint(r)
+    rs = numpy.rint(-q - r)
+    dq = numpy.abs(rq - q)
+    dr = numpy.abs(rr - r)
+    ds = numpy.abs(rs + q + r)
+
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr >= ds)
+    rq[fix_q] = -rr[fix_q] - rs[fix_q]
+    rr[fix_r] = -rq[fix_r] - rs[fix_r]
+
+    return rq.astype(numpy.int64), rr.astype(numpy.int64)
+
+# ------------------------------------------------------------
+# Returns the polygon of a cell
+# ------------------------------------------------------------
+def CellPolygon(column, row, CellSize, GridShape, spatialReference):
+    if GridShape == "SQUARE":
+        x = column * CellSize
+        y = row * CellSize
+        corners = [(x, y), (x, y + CellSize), (x + CellSize, y + CellSize), (x + CellSize, y)]
+    else:
+        radius = CellSize / math.sqrt(3)
+        cx = radius * math.sqrt(3) * (column + row / 2.0)
+        cy = radius * 1.5 * row
+        corners = [(cx + radius * math.cos(math.radians(angle)), cy + radius * math.sin(math.radians(angle)))
+                   for angle in (90, 30, -30, -90, -150, 150)]
+
+    points = arcpy.Array([arcpy.Point(x, y) for x, y in corners + corners[:1]])
+    return arcpy.Polygon(points, spatialReference)
+
+# ------------------------------------------------------------------------------
+# Bins a chunk of points and adds the counts to cells, a dictionary of cell
+# key: [count, points, lines, polygons, {status: count}]
+# ------------------------------------------------------------------------------
+def BinPoints(cells, x, y, geometries, statuses, CellSize, GridShape):
+    if len(x) == 0:
+        return
+
+    columns, rows = CellIndexes(numpy.array(x, dtype=numpy.float64), numpy.array(y, dtype=numpy.float64),
+                                CellSize, GridShape)
+    keys = ((columns + KEY_OFFSET).astype(numpy.uint64) << numpy.uint64(32)) | (rows + KEY_OFFSET).astype(numpy.uint64)
+
+    unique_keys, inverse = numpy.unique(keys, return_inverse=True)
+    size = len(unique_keys)
+
+    totals = numpy.bincount(inverse, minlength=size)
+
+    geometry_codes = numpy.array(geometries, dtype=numpy.int64)
+    geometry_counts = numpy.bincount(inverse * 3 + geometry_codes, minlength=size * 3).reshape(size, 3)
+
+    # NULL statuses are counted as -1
+    status_codes = numpy.array([-1 if value is None else value for value in statuses], dtype=numpy.int64)
+    status_values, status_inverse = numpy.unique(status_codes, return_inverse=True)
+    width = len(status_values)
+    status_counts = numpy.bincount(inverse * width + status_inverse, minlength=size * width).reshape(size, width)
+
+    status_values = status_values.tolist()
+    for i, key in enumerate(unique_keys.tolist()):
+        cell = cells.get(key)
+        if cell is None:
+            cell = [0, 0, 0, 0, {}]
+            cells[key] = cell
+
+        cell[0] += int(totals[i])
+        for j in range(3):
+            cell[j + 1] += int(geometry_counts[i, j])
+        for j, count in enumerate(status_counts[i].tolist()):
+            if count:
+                cell[4][status_values[j]] = cell[4].get(status_values[j], 0) + count
+
+# ------------------------------------------------------------
+# Returns the name of the field counting a lifecycle status
+# ------------------------------------------------------------
+def StatusField(status):
+    if status == -1:
+        return "STATUS_NUL"
+    return "STATUS_{}".format(status)
+
+# ------------------------------------------------------------------------------
+# Exports the density of the errors in the selected sessions to a polygon
+# feature class or shapefile of grid cells.  Can be called from other scripts
+# without the toolbox.
+#   ReviewerWorkspace (str): path to the Reviewer workspace
+#   SessionsList (list of str): names of the sessions to export
+#   OutFeatureClass (str): output feature class or .shp file
+#   CellSize (float): width of a square cell or the distance across the flat
+#       sides of a hexagon, in the units of the Reviewer geometries
+#   GridShape (str): SQUARE or HEXAGON
+# Returns a dictionary with the number of errors and cells written, or None if
+# the export failed
+# ------------------------------------------------------------------------------
+def ExportToGrid(ReviewerWorkspace, SessionsList, OutFeatureClass, CellSize, GridShape="SQUARE"):
+
+    if numpy is None:
+        arcpy.AddError("The grid export requires the numpy package.")
+        return None
+
+    GridShape = GridShape.upper()
+    CellSize = float(CellSize)
+    if GridShape not in GRID_SHAPES or CellSize <= 0:
+        arcpy.AddError("Choose a positive cell size and a {} grid.".format(" or ".join(GRID_SHAPES)))
+        return None
+
+    if arcpy.Exists(OutFeatureClass):
+        arcpy.AddError("Output {} already exists.".format(OutFeatureClass))
+        return None
+
+    REVTABLEPOINT = getFullPath(ReviewerWorkspace, "REVTABLEPOINT", True)
+    SessionsTable = getFullPath(ReviewerWorkspace, "REVSESSIONTABLE", True)
+
+    sessions, rowcount = GetSessionIDs(SessionsTable, [value.strip("'") for value in SessionsList])
+    SessionClause = MakeSessionClause(SessionsTable, sessions.keys(), rowcount)
+
+    cells = {}
+    x, y, geometries, statuses = [], [], [], []
+    TotalErrors = 0
+    NoGeometry = 0
+
+    for values, shape, point in IterErrorRecords(ReviewerWorkspace, ["LIFECYCLESTATUS"], SessionClause,
+                                                 SessionClause, SessionIDs=sessions.keys()):
+        if point is None:
+            NoGeometry += 1
+            continue
+
+        first = point.firstPoint
+        x.append(first.X)
+        y.append(first.Y)
+        geometries.append(GeometryIndex(shape))
+        statuses.append(values[0])
+        TotalErrors += 1
+
+        if len(x) >= GRID_CHUNK_SIZE:
+            BinPoints(cells, x, y, geometries, statuses, CellSize, GridShape)
+            x, y, geometries, statuses = [], [], [], []
+
+    BinPoints(cells, x, y, geometries, statuses, CellSize, GridShape)
+
+    # ----------------------
+    # Write one cell per row
+    # ----------------------
+    status_values = sorted(set(status for cell in cells.values() for status in cell[4]))
+    fields = ["RECORDS"] + list(GEOMETRY_FIELDS) + [StatusField(status) for status in status_values]
+
+    spatialReference = GetSchema(REVTABLEPOINT).spatial_reference
+    folder, name = os.path.split(OutFeatureClass)
+    arcpy.CreateFeatureclass_management(folder, name, "POLYGON", spatial_reference=spatialReference)
+    for field in fields:
+        arcpy.AddField_management(OutFeatureClass, field, "LONG")
+
+    with arcpy.da.InsertCursor(OutFeatureClass, ["SHAPE@"] + fields) as cursor:
+        for key in sorted(cells):
+            count, points, lines, polygons, by_status = cells[key]
+            column = (key >> 32) - KEY_OFFSET
+            row = (key & 0xFFFFFFFF) - KEY_OFFSET
+            cursor.insertRow([CellPolygon(column, row, CellSize, GridShape, spatialReference),
+                              count, points, lines, polygons] +
+                             [by_status.get(status, 0) for status in status_values])
+
+    if NoGeometry:
+        arcpy.AddMessage("  .. {} errors without geometry were not included".format(NoGeometry))
+    arcpy.AddMessage("\nTotal Errors Binned: {} into {} cells".format(TotalErrors, len(cells)))
+
+    return {"total": TotalErrors, "cells": len(cells), "featureClass": OutFeatureClass}
+
+def main():
+
+    # Script arguments
+    ReviewerWorkspace = arcpy.GetParameterAsText(0)
+    Sessions = arcpy.GetParameterAsText(1)
+    OutFeatureClass = arcpy.GetParameterAsText(2)
+    CellSize = arcpy.GetParameterAsText(3)
+    GridShape = arcpy.GetParameterAsText(4)
+
+    SessionsList = Sessions.split(";")
+
+    ExportToGrid(ReviewerWorkspace, SessionsList, OutFeatureClass, CellSize, GridShape or "SQUARE")
+
+if __name__ == '__main__':
+    RunTool(main)
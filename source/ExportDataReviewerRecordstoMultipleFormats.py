@@ -0,0 +1,146 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Exports the reviewer errors from the selected Reviewer workspace sessions to
+# several outputs at once.  The records and their geometries are read once
+# and the representative point of each record is calculated once, then each
+# record is written to every output.  The format of each output is chosen by
+# its extension:
+#   .shp      point shapefile, records without geometry go to <name>_Table.dbf
+#   .gpkg     GeoPackage with a point feature class and a table of the records
+#             without geometry
+#   .csv      CSV file with the X and Y of the representative point
+#   .parquet  Parquet file with the WKB of the geometry, requires pyarrow
+# The CSV and Parquet outputs are written on their own threads through a
+# buffer, so a slow output does not hold up the others.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import arcpy
+import os
+
+from CopyDataReviewerRecords import getFullPath, GetSchema, RunTool
+from ReviewerRecordStream import GetSessionIDs, MakeSessionClause, IterErrorRecords
+from ReviewerRecordSinks import (ADD_FIELD_TYPES, NativeShapefileSink, GeoPackageSink, CsvSink, ParquetSink,
+                                 BufferedSink)
+import ExportDataReviewerRecordstoParquet
+
+# ------------------------------------------------------------
+# Returns the output for a path, chosen by the extension
+# ------------------------------------------------------------
+def MakeSink(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".shp":
+        return BufferedSink(NativeShapefileSink(path))
+    if extension == ".gpkg":
+        return GeoPackageSink(path)
+    if extension == ".csv":
+        return BufferedSink(CsvSink(path))
+    if extension == ".parquet":
+        if ExportDataReviewerRecordstoParquet.pyarrow is None:
+            arcpy.AddError("Output {} requires the pyarrow package.".format(path))
+            return None
+        return BufferedSink(ParquetSink(path))
+
+    arcpy.AddError("Output {} is not a .shp, .gpkg, .csv or .parquet file.".format(path))
+    return None
+
+# ------------------------------------------------------------------------------
+# Exports the records of the selected sessions to each of the outputs with one
+# read of the Reviewer workspace.  Can be called from other scripts without
+# the toolbox.
+#   ReviewerWorkspace (str): path to the Reviewer workspace
+#   SessionsList (list of str): names of the sessions to export
+#   FieldsList (list of str): REVTABLEMAIN fields to include in the outputs
+#   Outputs (list of str): paths of the outputs
+# Returns a dictionary with the number of records read and the number of
+# records written to each output, or None if the export failed
+# ------------------------------------------------------------------------------
+def ExportToSinks(ReviewerWorkspace, SessionsList, FieldsList, Outputs):
+
+    sinks = [MakeSink(path) for path in Outputs]
+    if None in sinks:
+        return None
+
+    Exists = False
+    for sink in sinks:
+        if sink.exists():
+            arcpy.AddError("Output {} already exists.".format(sink.path))
+            Exists = True
+    if Exists:
+        return None
+
+    REVTABLEMAIN = getFullPath(ReviewerWorkspace, "REVTABLEMAIN", True)
+    REVTABLEPOINT = getFullPath(ReviewerWorkspace, "REVTABLEPOINT", True)
+    SessionsTable = getFullPath(ReviewerWorkspace, "REVSESSIONTABLE", True)
+
+    sessions, rowcount = GetSessionIDs(SessionsTable, [value.strip("'") for value in SessionsList])
+    SessionClause = MakeSessionClause(SessionsTable, sessions.keys(), rowcount)
+
+    schema = GetSchema(REVTABLEMAIN)
+    fields = [name for name in FieldsList if schema.field_type(name) in ADD_FIELD_TYPES]
+
+    # The outputs use the spatial reference of the Reviewer geometries
+    spatialReference = GetSchema(REVTABLEPOINT).spatial_reference
+
+    TotalErrors = 0
+    opened = []
+    try:
+        for sink in sinks:
+            sink.open(fields, schema, spatialReference)
+            opened.append(sink)
+
+        for values, shape, point in IterErrorRecords(ReviewerWorkspace, fields, SessionClause, SessionClause,
+                                                     SessionIDs=sessions.keys()):
+            for sink in sinks:
+                sink.add(values, shape, point)
+            TotalErrors += 1
+
+    finally:
+        for sink in opened:
+            sink.close()
+
+    result = {"total": TotalErrors, "outputs": {}}
+    for sink in sinks:
+        arcpy.AddMessage("  .. {} records written to {}".format(sink.count, sink.path))
+        result["outputs"][sink.path] = sink.count
+
+    arcpy.AddMessage("\nTotal Errors Exported: {}".format(TotalErrors))
+    return result
+
+def main():
+
+    # Script arguments
+    ReviewerWorkspace = arcpy.GetParameterAsText(0)
+    Sessions = arcpy.GetParameterAsText(1)
+    Fields = arcpy.GetParameterAsText(2)
+    Outputs = arcpy.GetParameterAsText(3)
+
+    SessionsList = Sessions.split(";")
+    FieldsList = Fields.split(";")
+    OutputsList = [value.strip("'") for value in Outputs.split(";")]
+
+    ExportToSinks(ReviewerWorkspace, SessionsList, FieldsList, OutputsList)
+
+if __name__ == '__main__':
+    RunTool(main)
@@ -0,0 +1,216 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Exports the reviewer errors from the selected Reviewer workspace sessions to
+# a Parquet dataset for analysis in pandas or other dataframe tools.  Field
+# names, dates and GUIDs are kept as they are in REVTABLEMAIN.  Each record
+# has the WKB of its geometry and the X and Y of its representative point,
+# and records without geometry are written to the same dataset with empty
+# geometry columns.  The dataset is partitioned by session and optionally by
+# lifecycle status (SESSIONID=1/LIFECYCLESTATUS=2/part-00000.parquet).
+# Requires the pyarrow package.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import arcpy
+import os
+
+from CopyDataReviewerRecords import getFullPath, GetSchema, RunTool
+from ReviewerRecordStream import GetSessionIDs, MakeSessionClause, IterErrorRecords
+
+# pyarrow is not installed with ArcGIS.  It is only needed by this tool
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Default number of records in each Parquet row group
+ROW_GROUP_SIZE = 50000
+
+# Default number of records held in memory across all partitions.  When it is
+# reached the partition holding the most records is written as a row group
+MAX_BUFFERED_ROWS = ROW_GROUP_SIZE
+
+# Geometry columns added after the REVTABLEMAIN fields
+GEOMETRY_COLUMNS = ("SHAPE_WKB", "POINT_X", "POINT_Y")
+
+# -----------------------------------------------------
+# Returns the Arrow type used for an arcpy field type
+# -----------------------------------------------------
+def ArrowType(field_type):
+    types = {'OID': pyarrow.int64(),
+             'Integer': pyarrow.int32(),
+             'SmallInteger': pyarrow.int16(),
+             'Double': pyarrow.float64(),
+             'Single': pyarrow.float32(),
+             'Date': pyarrow.timestamp('ms'),
+             'Blob': pyarrow.binary()}
+
+    # String, Guid and GlobalID fields are written as strings
+    return types.get(field_type, pyarrow.string())
+
+# ---------------------------------------------------------------------------
+# Buffers the records of one partition and writes them as row groups
+# ---------------------------------------------------------------------------
+class PartitionWriter(object):
+
+    def __init__(self, path, schema, row_group_size):
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.columns = [[] for _ in schema.names]
+        self.count = 0
+        self.writer = None
+
+    @property
+    def buffered(self):
+        # Number of records not written yet
+        return len(self.columns[0])
+
+    def add(self, values):
+        for column, value in zip(self.columns, values):
+            column.append(value)
+        self.count += 1
+
+        if len(self.columns[0]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.columns[0]) == 0:
+            return
+
+        if self.writer is None:
+            folder = os.path.dirname(self.path)
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+
+        arrays = [pyarrow.array(column, type=field.type) for column, field in zip(self.columns, self.schema)]
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+        self.columns = [[] for _ in self.schema.names]
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+# ----------------------------------------------------------------------------
+# Exports the records of the selected sessions to a partitioned Parquet
+# dataset.  At most MaxBufferedRows records are held in memory across all the
+# partitions.  Returns the number of records exported, or None if pyarrow is
+# not installed or OutFolder is not empty
+# ----------------------------------------------------------------------------
+def ExportToParquet(ReviewerWorkspace, SessionsList, FieldsList, OutFolder, PartitionByStatus=False,
+                    RowGroupSize=ROW_GROUP_SIZE, MaxBufferedRows=MAX_BUFFERED_ROWS):
+
+    if pyarrow is None:
+        arcpy.AddError("This tool requires the pyarrow package.  Install pyarrow "
+                       "in the ArcGIS Python environment to export to Parquet.")
+        return None
+
+    # The files of an earlier export would be mixed with the new ones
+    if os.path.exists(OutFolder) and os.listdir(OutFolder):
+        arcpy.AddError("Output folder {} is not empty.  Please choose a new output folder.".format(OutFolder))
+        return None
+
+    REVTABLEMAIN = getFullPath(ReviewerWorkspace, "REVTABLEMAIN", True)
+    SessionsTable = getFullPath(ReviewerWorkspace, "REVSESSIONTABLE", True)
+
+    sessions, rowcount = GetSessionIDs(SessionsTable, SessionsList)
+    SessionClause = MakeSessionClause(SessionsTable, sessions.keys(), rowcount)
+
+    # Partition fields are read from REVTABLEMAIN but kept out of the files,
+    # their values are in the folder names
+    partition_fields = ["SESSIONID"]
+    if PartitionByStatus:
+        partition_fields.append("LIFECYCLESTATUS")
+
+    field_types = GetSchema(REVTABLEMAIN).types
+    fields = [name for name in FieldsList if name in field_types and name not in partition_fields]
+
+    geometry_types = (pyarrow.binary(), pyarrow.float64(), pyarrow.float64())
+    schema = pyarrow.schema([pyarrow.field(name, ArrowType(field_types[name])) for name in fields] +
+                            [pyarrow.field(name, arrow_type) for name, arrow_type in zip(GEOMETRY_COLUMNS, geometry_types)])
+
+    writers = {}
+    buffered = 0
+    TotalErrors = 0
+
+    try:
+        for values, shape, point in IterErrorRecords(ReviewerWorkspace, fields + partition_fields,
+                                                     SessionClause, SessionClause, SessionIDs=sessions.keys()):
+            partition = values[len(fields):]
+            values = values[:len(fields)]
+
+            if shape is not None:
+                wkb = bytes(shape.WKB)
+                first = point.firstPoint
+                values = values + (wkb, first.X, first.Y)
+            else:
+                values = values + (None, None, None)
+
+            writer = writers.get(partition)
+            if writer is None:
+                folder = OutFolder
+                for name, value in zip(partition_fields, partition):
+                    folder = os.path.join(folder, "{}={}".format(name, value))
+                writer = PartitionWriter(os.path.join(folder, "part-00000.parquet"), schema, RowGroupSize)
+                writers[partition] = writer
+
+            before = writer.buffered
+            writer.add(values)
+            buffered += writer.buffered - before
+            TotalErrors += 1
+
+            if buffered >= MaxBufferedRows:
+                largest = max(writers.values(), key=lambda w: w.buffered)
+                buffered -= largest.buffered
+                largest.flush()
+
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    for writer in sorted(writers.values(), key=lambda w: w.path):
+        arcpy.AddMessage("  .. {} records written to {}".format(writer.count, writer.path))
+
+    arcpy.AddMessage("\nTotal Errors Exported: {}".format(TotalErrors))
+    return TotalErrors
+
+def main():
+
+    # Script arguments
+    ReviewerWorkspace = arcpy.GetParameterAsText(0)
+    Sessions = arcpy.GetParameterAsText(1)
+    Fields = arcpy.GetParameterAsText(2)
+    OutFolder = arcpy.GetParameterAsText(3)
+    PartitionByStatus = arcpy.GetParameterAsText(4)
+
+    SessionsList = [value.strip("'") for value in Sessions.split(";")]
+    FieldsList = Fields.split(";")
+
+    ExportToParquet(ReviewerWorkspace, SessionsList, FieldsList, OutFolder, PartitionByStatus == "true")
+
+if __name__ == '__main__':
+    RunTool(main)
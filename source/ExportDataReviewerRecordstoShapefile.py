@@ -22,7 +22,9 @@
 # shapefiles.  One point shapefile will be created. The XY location of line and
 # polygon errors will be calculated and included in the output point shapefile.
 # If errors exist without associated geometry in the selected sessions, these
-# records will be exported to a dbf table.
+# records will be exported to a dbf table.  An incremental export keeps a
+# watermark file next to the output and later runs only rewrite the records
+# added, changed or deleted since.
 
 # Disclaimer:
 # Due to the complex relationship of tables within the Reviewer Workspace,
@@ -35,496 +37,477 @@
 
 # Import necessary modules
 import arcpy
+import hashlib
+import json
+import math
 import os
-import shutil
-import sys
 import datetime
 
-# Importing license level
-try:
-    import arcinfo
-except:
-    arcpy.AddError("This tool requires an ArcInfo license.")
-    sys.exit("ArcInfo license not available")
+from CopyDataReviewerRecords import (getFullPath, GetSchema, MakeInClause, CountRows, CountRunRows, EstimateRowBytes,
+                                     ReportPlan, SampleRecords, NormalizeValue, RunTool, EXPORT_ROWS_PER_SECOND)
+from ReviewerRecordStream import GetSessionIDs, MakeSessionClause, IterErrorRecords
+from ReviewerRecordSinks import ADD_FIELD_TYPES, SPATIAL_SORTS, ShapefileSink, NativeShapefileSink, SortedSink
 
-##Script arguments
-ReviewerWorkspace = arcpy.GetParameterAsText(0)
-Sessions = arcpy.GetParameterAsText(1)
-Fields = arcpy.GetParameterAsText(2)
-Workspace = arcpy.GetParameterAsText(3)
-ShapeName = arcpy.GetParameterAsText(4)
+# Size in bytes of a one point multipoint record in the .shp and .shx files
+SHAPE_RECORD_BYTES = 64
 
+# Watermark file written next to the output of an incremental export
+WATERMARK_EXTENSION = ".export.json"
+WATERMARK_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
 
-SessionsList = Sessions.split(";")
-FieldsList = Fields.split(";")
+# Tables of a plan whose rows are written by the export
+PLAN_WRITTEN_TABLES = ("REVTABLEPOINT", "REVTABLELINE", "REVTABLEPOLY", "NOGEOMETRY")
 
-# Script functions
-def Renamefield_Pro(temp_shape, temp_out, workspace, ShapeFileName):
-    
-    RenameFields = ["ORIGINTABLE", "ORIGINCHECK", "REVIEWSTATUS", "CORRECTIONSTATUS", "VERIFICATIONSTATUS", "REVIEWTECHNICIAN", "REVIEWDATE", "CORRECTIONTECHNICIAN", "CORRECTIONDATE", "VERIFICATIONTECHNICIAN", "VERIFICATIONDATE", "LIFECYCLESTATUS", "LIFECYCLEPHASE"]
-    NewNames = ["ORIG_TABLE", "ORIG_CHECK", "ERROR_DESC", "COR_STATUS", "VER_STATUS", "REV_TECH", "REV_DATE", "COR_TECH", "COR_DATE", "VER_TECH", "VER_DATE", "STATUS", "PHASE"]
-
-    arcpy.CopyFeatures_management(temp_shape, temp_out)
-    
-    fields = arcpy.ListFields(temp_out)  #get a list of fields for each feature class
-
-    for field in fields:    
-        if "REVTABLEMAIN" in field.name:
-            if field.type == "OID" or field.type == "Geometry" :
-                continue
-            if "OBJECTID" in field.name:
-                ## Manage OID field
-                arcpy.AddField_management(temp_out, "FeatureOID", field.type)
-                expr = "!" + field.name + "!"
-                arcpy.CalculateField_management(temp_out, "FeatureOID", expr, "PYTHON3")
-                arcpy.DeleteField_management(temp_out, field.name)
-                continue
-            
-            fieldNames = field.name.split("_")
-            outname = fieldNames[1]
-            if fieldNames[1] in RenameFields:
-                i = RenameFields.index(outname)
-                outname = NewNames[i]
-            # add a new field using the same properties as the original field
-            arcpy.AddField_management(temp_out, outname, field.type)
-
-            # calculate the values of the new field
-            # set it to be equal to the old field       
-            exp = "!" + field.name + "!"
-            arcpy.CalculateField_management(temp_out, outname, exp, "PYTHON3")
-
-            # delete the old fields
-            arcpy.DeleteField_management(temp_out, field.name)
-        else:
-            if field.type == "OID" or field.type == "Geometry" :
-                continue
-            arcpy.DeleteField_management(temp_out, field.name)
-     
-    ##Save the layer as a shapefile
-    arcpy.FeatureClassToShapefile_conversion(temp_out, workspace)
-    shape_1 = workspace + "\\tmp_out.shp"
-    arcpy.Rename_management(shape_1, ShapeFileName)
-
-
-
-# Check if shapefiles created by script exists. If so error and do not process.
-if ".shp" in ShapeName:
-    FileName = ShapeName[:-4] + "_Table.dbf"
-else:
-    FileName = ShapeName + "_Table.dbf"
-    ShapeName = ShapeName + ".shp"
-
-FinalPointShape = Workspace + "\\" + ShapeName
-Table = Workspace + "\\" + FileName
-
-# Create a temporary database for processing errors
-now = datetime.datetime.now()
-
-if arcpy.GetInstallInfo()['ProductName'] == 'Desktop':
-	gdbname = now.strftime("%Y%m%dT%H%M%S") + ".mdb"
-else :
-	gdbname = now.strftime("%Y%m%dT%H%M%S") + ".gdb"
-arcpy.AddMessage("Product is  " + arcpy.GetInstallInfo()['ProductName'])
-
-TempWksp = Workspace + "\\Temp\\" + gdbname
-TempDir = Workspace + "\\Temp"
-os.mkdir(TempDir)
-arcpy.AddMessage("Temp = " + TempWksp)
-
-if arcpy.GetInstallInfo()['ProductName'] == 'Desktop':
-	arcpy.CreatePersonalGDB_management(Workspace + "\\Temp", gdbname)
-else :
-	arcpy.CreateFileGDB_management(Workspace + "\\Temp", gdbname)
-
-LineShape = TempWksp + "\\RevLine"
-PolyShape = TempWksp + "\\RevPoly"
-LineShapeSingle = TempWksp + "\\RevLine_single"
-LineShapeDissolve = TempWksp + "\\RevLine_dissolve"
-PolyShapeSingle = TempWksp + "\\RevPoly_single"
-PolyShapeDissolve = TempWksp + "\\RevPoly_dissolve"
-TempFC = TempWksp + "\\TempPoint"
-
-# Paths to tables in Reviewer workspace
-SessionsTable = ReviewerWorkspace + "\\REVSESSIONTABLE"
-REVTABLEMAIN = ReviewerWorkspace + "\\REVTABLEMAIN"
-REVTABLEPOINT = ReviewerWorkspace + "\\REVDATASET\\REVTABLEPOINT"
-REVTABLELINE = ReviewerWorkspace + "\\REVDATASET\\REVTABLELINE"
-REVTABLEPOLY = ReviewerWorkspace + "\\REVDATASET\\REVTABLEPOLY"
-
-Exists = False
-
-if not arcpy.Exists(Workspace):
-    os.makedirs(Workspace)
-
-# Check to see if output shapefile already exists. If exists do not process.
-if arcpy.Exists(FinalPointShape):
-    arcpy.AddError("Point shapefile already exists in output workspace " \
-    + FinalPointShape)
-    Exists = True
-if arcpy.Exists(Table):
-    arcpy.AddError("Table for non geometry errors already exists in output " \
-    + "workspace " + Table)
-    Exists = True
-
-if Exists == False:
-
-    # Local variables:
-    TableFields = Fields
-
-    RenameFields = ["ORIGINTABLE", "ORIGINCHECK", "REVIEWSTATUS",
-    "CORRECTIONSTATUS", "VERIFICATIONSTATUS", "REVIEWTECHNICIAN", "REVIEWDATE",
-    "CORRECTIONTECHNICIAN", "CORRECTIONDATE", "VERIFICATIONTECHNICIAN",
-    "VERIFICATIONDATE", "LIFECYCLESTATUS", "LIFECYCLEPHASE"]
-                                            
-    NewNames = ["ORIG_TABLE", "ORIG_CHECK", "ERROR_DESC", "COR_STATUS",
-    "VER_STATUS", "REV_TECH", "REV_DATE", "COR_TECH", "COR_DATE",
-    "VER_TECH", "VER_DATE", "STATUS", "PHASE"]
-
-    PointFieldInfo = "REVTABLEPOINT.SHAPE SHAPE VISIBLE NONE; " \
-    + "REVTABLEPOINT.OID REVTABLEPOINT.OID HIDDEN NONE; " \
-    + "REVTABLEPOINT.LINKGUID REVTABLEPOINT.LINKGUID HIDDEN NONE; " \
-    + "REVTABLEPOINT.SESSIONID SESSIONID HIDDEN NONE; "
-    TableFieldInfo = "; "
-
-    try:
-        sessionIDs = []
-        WhereClause = ""
-        TotalErrors = 0
-
-        # -------------------------------------------------------
-        # Determine what fields will be in output shapefile\table
-        # -------------------------------------------------------
-
-        # Get RevTableMain and RevTablePoint fully qualified names
-        arcpy.env.workspace = ReviewerWorkspace
-        tableList = arcpy.ListTables()
-        for table in tableList:
-            if "REVTABLEMAIN" in table:
-                RevMainFullName = table + "."
-
-        fcList = arcpy.ListFeatureClasses("", "", "REVDATASET")
-        for fc in fcList:
-            if "REVTABLEPOINT" in fc:
-                RevPointFullName = fc + "."
-
-        PointFieldInfo = "SHAPE SHAPE VISIBLE NONE; " + RevPointFullName \
-        + "OBJECTID OID HIDDEN NONE; TempPoint.LINKGUID TempPoint.LINKGUID HIDDEN " \
-        + "NONE; TempPoint.SESSIONID TempPoint.SESSIONID HIDDEN NONE; "
-        TableFieldInfo = "; "
-
-        # Get the fields in RevTableMain
-        desc = arcpy.Describe(REVTABLEMAIN)
-        for field in desc.fields:
-            name = field.name
-
-            # For each field determine if it will be visible in output based on
-            # fields input value
-            view = "HIDDEN"
-            if name in FieldsList:
-                view = "VISIBLE"
-
-            # If the field is over 10 characters (in RenameFields array)
-            # replace with new name (from NewNames array).
-            outname = name
-            if name in RenameFields:
-                i = RenameFields.index(name)
-                outname = NewNames[i]
-
-            # Update the information of the shapefile and table outputs
-            PointFieldInfo = PointFieldInfo + RevMainFullName + name + " " \
-            + outname + " " + view + " NONE; "
-
-            TableFieldInfo = TableFieldInfo + name + " " + outname + " " \
-            + view + " NONE; "
-
-        # Trim last characters from output strings
-        PointFieldInfo = PointFieldInfo[:-2]
-        TableFieldInfo = TableFieldInfo[:-2]
-
-        # ---------------------------------------------------------
-        # Build the whereclause to select the input session records
-        # ---------------------------------------------------------
-
-        # Get the Session ID(s)
-        rows = arcpy.SearchCursor(SessionsTable)
-        RowCount = int(arcpy.GetCount_management(SessionsTable).getOutput(0))
-        for row in rows:
-
-            # I am interested in the value in column SessionName
-            if row.SESSIONNAME in Sessions:
-                sessionIDs.append(str(row.SESSIONID))
-
-        # Delete cursor and row objects to remove locks on the data
-        del row
-        del rows
-
-        SessionCount = len(sessionIDs)
-
-        # If you did not select all the session, make a whereclause to select
-        # only features from the desired sessions
-        if SessionCount != RowCount:
-            WhereClause = "("
-            SessionFieldName = arcpy.AddFieldDelimiters(ReviewerWorkspace,
-            "SessionID")
-
-            for sessionID in sessionIDs:
-                WhereClause = WhereClause + SessionFieldName + " = " \
-                + str(sessionID) + " OR "
-
-            WhereClause = WhereClause[:-4] + ")"
-
-        WhereCount = len(WhereClause)
-
-        # Expression parameter of make layer and create table view only allows
-        # 247 characters.
-
-        # If the number of sessions selected is more than 13 this limit will
-        # be reached.
+# REVTABLEMAIN dates set when a record is reviewed, corrected or verified
+WATERMARK_DATE_FIELDS = ("REVIEWDATE", "CORRECTIONDATE", "VERIFICATIONDATE")
 
-        if WhereCount > 222:
+# REVTABLEMAIN fields always fingerprinted by an incremental export, they can
+# be edited without changing a date
+WATERMARK_FINGERPRINT_FIELDS = ("LIFECYCLESTATUS", "LIFECYCLEPHASE")
 
-            # Return error and do not process records
-            arcpy.AddMessage(WhereClause)
-            arcpy.AddMessage("Whereclause length " + str(WhereCount))
-            arcpy.AddError("Too many sessions were selected. The whereclause " \
-            + "for selecting only records from the chosen session will be too " \
-            + "long. You must select less than 12 sessions or you must " \
-            + "select all.")
+# Number of hex digits of the fingerprint of each record kept in the
+# watermark file
+WATERMARK_FINGERPRINT_DIGITS = 16
 
+# Script functions
+def CheckLicense():
+    # Importing license level.  Checked when the export runs instead of when
+    # the script is imported
+    try:
+        import arcinfo
+    except:
+        arcpy.AddError("This tool requires an ArcInfo license.")
+        return False
+    return True
+
+def PlanExport(ReviewerWorkspace, SessionsList, FieldsList):
+    # Counts the records the export would write and estimates the bytes and
+    # time it will take, without creating any output
+    REVTABLEMAIN = getFullPath(ReviewerWorkspace, "REVTABLEMAIN", True)
+    SessionsTable = getFullPath(ReviewerWorkspace, "REVSESSIONTABLE", True)
+
+    plan = {"sessions": {}, "whereClause": "", "tables": {},
+            "estimatedBytes": 0, "estimatedSeconds": 0.0}
+
+    names = [value.strip("'") for value in SessionsList]
+    rowcount = 0
+    with arcpy.da.SearchCursor(SessionsTable, ["SESSIONID", "SESSIONNAME"]) as rows:
+        for row in rows:
+            rowcount += 1
+            if row[1] in names:
+                plan["sessions"][row[0]] = row[1]
+
+    WhereClause = ''
+    if len(plan["sessions"]) != rowcount:
+        WhereClause = MakeInClause(SessionsTable, "SESSIONID", list(plan["sessions"])) or ''
+    plan["whereClause"] = WhereClause
+
+    # The records and run tables are only counted, the records are written
+    # once for each of their geometries or once to the table
+    plan["tables"]["REVTABLEMAIN"] = {"rows": CountRows(REVTABLEMAIN, WhereClause), "bytes": 0}
+    checkRows, batchRows = CountRunRows(ReviewerWorkspace, WhereClause)
+    if checkRows is not None:
+        plan["tables"]["REVCHECKRUNTABLE"] = {"rows": checkRows, "bytes": 0}
+    if batchRows is not None:
+        plan["tables"]["REVBATCHRUNTABLE"] = {"rows": batchRows, "bytes": 0}
+
+    # Each exported record is a multipoint in the .shp and a row in the .dbf
+    recordBytes = SHAPE_RECORD_BYTES + EstimateRowBytes(REVTABLEMAIN, WhereClause, FieldsList)
+
+    for name in ("REVTABLEPOINT", "REVTABLELINE", "REVTABLEPOLY"):
+        table = getFullPath(ReviewerWorkspace, name)
+        if table != '':
+            count = CountRows(table, WhereClause)
+            plan["tables"][name] = {"rows": count, "bytes": count * recordBytes}
+
+    noGeometryClause = arcpy.AddFieldDelimiters(REVTABLEMAIN, "GEOMETRYTYPE") + " IS NULL"
+    if WhereClause != '':
+        noGeometryClause = WhereClause + " AND " + noGeometryClause
+    count = CountRows(REVTABLEMAIN, noGeometryClause)
+    plan["tables"]["NOGEOMETRY"] = {"rows": count, "bytes": count * (recordBytes - SHAPE_RECORD_BYTES)}
+
+    for name in PLAN_WRITTEN_TABLES:
+        table = plan["tables"].get(name)
+        if table is not None:
+            plan["estimatedBytes"] += table["bytes"]
+            plan["estimatedSeconds"] += table["rows"] / EXPORT_ROWS_PER_SECOND
+
+    ReportPlan(plan)
+    return plan
+
+# ------------------------------------------------------------------------------
+# Returns the extent (xmin, ymin, xmax, ymax) of the Reviewer geometry tables,
+# or None if they are all empty
+# ------------------------------------------------------------------------------
+def GeometryExtent(ReviewerWorkspace):
+    extent = None
+    for name in ("REVTABLEPOINT", "REVTABLELINE", "REVTABLEPOLY"):
+        table = getFullPath(ReviewerWorkspace, name)
+        if table == '':
+            continue
+
+        # Empty feature classes have a NaN extent
+        table_extent = arcpy.Describe(table).extent
+        if table_extent is None or math.isnan(table_extent.XMin):
+            continue
+
+        box = (table_extent.XMin, table_extent.YMin, table_extent.XMax, table_extent.YMax)
+        if extent is None:
+            extent = box
         else:
+            extent = (min(extent[0], box[0]), min(extent[1], box[1]), max(extent[2], box[2]),
+                      max(extent[3], box[3]))
+    return extent
+
+# ------------------------------------------------------------------------------
+# Returns the output of the shapefile export, sorted along the SpatialSort
+# curve when it is given
+# ------------------------------------------------------------------------------
+def MakeShapefileSink(ReviewerWorkspace, FinalPointShape, SpatialSort=None):
+    sink = NativeShapefileSink(FinalPointShape)
+    if SpatialSort:
+        extent = GeometryExtent(ReviewerWorkspace)
+        if extent is not None:
+            arcpy.AddMessage("  .. sorting the records along a {} curve".format(SpatialSort.lower()))
+            sink = SortedSink(sink, extent, SpatialSort)
+    return sink
+
+# ------------------------------------------------------------------------------
+# Builds the spatial index of a sorted export, so the output is ready for
+# spatial queries as soon as it is written
+# ------------------------------------------------------------------------------
+def IndexShapefile(FinalPointShape, SpatialSort, pointCount):
+    if SpatialSort and pointCount:
+        arcpy.AddMessage("  .. building the spatial index")
+        arcpy.AddSpatialIndex_management(FinalPointShape)
+
+# ------------------------------------------------------------------------------
+# Exports the records of the selected sessions, or a random sample of them
+# when SampleSize is given, with one read of REVTABLEMAIN.  Each record is
+# written to the point shapefile once for each of its geometries, lines and
+# polygons with a point inside each part, or to the table when it has no
+# geometry, and the rows are counted as they are written.  Sampled records are
+# read by objectid and only their geometries are fetched, so the time taken
+# follows the size of the sample.  The outputs are deleted if the export
+# fails.  Returns the same dictionary as ExportRecords
+# ------------------------------------------------------------------------------
+def ExportStream(ReviewerWorkspace, SessionsList, FieldsList, FinalPointShape, Table, SampleSize=0,
+                 SampleField=None, SpatialSort=None):
+    REVTABLEMAIN = getFullPath(ReviewerWorkspace, "REVTABLEMAIN", True)
+    REVTABLEPOINT = getFullPath(ReviewerWorkspace, "REVTABLEPOINT", True)
+    SessionsTable = getFullPath(ReviewerWorkspace, "REVSESSIONTABLE", True)
+    schema = GetSchema(REVTABLEMAIN)
+
+    if SampleField and not schema.has(SampleField):
+        arcpy.AddError("{} is not a field of {}.  The sample cannot be stratified by it.".format(
+            SampleField, REVTABLEMAIN))
+        return None
+
+    sink = MakeShapefileSink(ReviewerWorkspace, FinalPointShape, SpatialSort)
+    if sink.exists():
+        arcpy.AddError("Point shapefile or table already exists in output workspace " + FinalPointShape)
+        arcpy.AddError("Please choose new output directory or delete existing files")
+        return None
+
+    sessions, rowcount = GetSessionIDs(SessionsTable, SessionsList)
+    SessionClause = MakeSessionClause(SessionsTable, sessions.keys(), rowcount)
+    Sample = None
+    if SampleSize:
+        Sample = SampleRecords(REVTABLEMAIN, SessionClause, SampleSize, SampleField)
+
+    arcpy.AddMessage("\nCreating point shapefile.")
+    fields = [name for name in FieldsList if schema.field_type(name) in ADD_FIELD_TYPES]
+    sink.open(fields, schema, GetSchema(REVTABLEPOINT).spatial_reference)
+    try:
+        try:
+            for values, shape, point in IterErrorRecords(ReviewerWorkspace, fields, SessionClause, SessionClause,
+                                                         Sample=Sample, SessionIDs=sessions.keys()):
+                sink.add(values, shape, point)
+        finally:
+            sink.close()
+    except Exception:
+        # Delete the output shapefile and table, they are only partly written
+        for path in (FinalPointShape, Table):
+            if arcpy.Exists(path):
+                arcpy.Delete_management(path)
+        raise
+
+    pointCount = sink.count - sink.tableCount
+    IndexShapefile(FinalPointShape, SpatialSort, pointCount)
+
+    if sink.tableCount >= 1:
+        arcpy.AddMessage("  .. " + str(sink.tableCount) + " errors exist with no geometry and were exported to "
+                         "a table.")
+    else:
+        arcpy.AddMessage("No errors exist with no geometry in selected session.  No table will be created.")
+
+    arcpy.AddMessage("\nTotal Errors Exported: " + str(sink.count))
+    arcpy.AddMessage("Output shapefile path " + FinalPointShape)
+
+    result = {"total": sink.count, "shapefile": FinalPointShape, "table": None}
+    if sink.tableCount >= 1:
+        arcpy.AddMessage("Output Table path " + Table)
+        result["table"] = Table
+    return result
+
+# ------------------------------------------------------------
+# Returns the path of the watermark file of an export
+# ------------------------------------------------------------
+def WatermarkPath(FinalPointShape):
+    return FinalPointShape[:-4] + WATERMARK_EXTENSION
+
+# ------------------------------------------------------------------------------
+# Returns the fingerprint of a record kept in the watermark file
+# ------------------------------------------------------------------------------
+def RecordFingerprint(values, fieldTypes):
+    values = [NormalizeValue(value, fieldType) for value, fieldType in zip(values, fieldTypes)]
+    return hashlib.md5(repr(values).encode('utf-8')).hexdigest()[:WATERMARK_FINGERPRINT_DIGITS]
+
+# ------------------------------------------------------------------------------
+# Reads the objectid, dates and exported fields of the records of the selected
+# sessions, without their geometry.  Returns the set of record ids, a
+# dictionary of objectid: record id of the records added or changed since the
+# watermark, and the new watermark.  A record is changed if it was added after
+# the watermark, one of its dates is later, or the fingerprint of its exported
+# fields and lifecycle fields differs from the one in the watermark.  With no
+# watermark every record is changed
+# ------------------------------------------------------------------------------
+def ScanRecords(REVTABLEMAIN, SessionClause, fields, watermark=None):
+    schema = GetSchema(REVTABLEMAIN)
+    date_fields = [name for name in WATERMARK_DATE_FIELDS if schema.has(name)]
+    fingerprint_fields = [name for name in fields if name != schema.id_field]
+    fingerprint_fields += [name for name in WATERMARK_FINGERPRINT_FIELDS
+                           if schema.has(name) and name not in fingerprint_fields]
+    fingerprint_types = [schema.types[name] for name in fingerprint_fields]
+
+    lastObjectID = -1
+    lastDate = None
+    lastFingerprints = {}
+    if watermark is not None:
+        lastObjectID = watermark["maxObjectID"]
+        if watermark["maxDate"]:
+            lastDate = datetime.datetime.strptime(watermark["maxDate"], WATERMARK_DATE_FORMAT)
+        lastFingerprints = watermark.get("fingerprints", {})
+
+    records = set()
+    changed = {}
+    fingerprints = {}
+    maxObjectID = lastObjectID
+    maxDate = lastDate
+    date_end = 2 + len(date_fields)
+    with arcpy.da.SearchCursor(REVTABLEMAIN, ["OID@", schema.id_field] + date_fields + fingerprint_fields,
+                               SessionClause) as cursor:
+        for row in cursor:
+            records.add(row[1])
+            dates = [value for value in row[2:date_end] if value is not None]
+            latest = max(dates) if dates else None
+            fingerprint = RecordFingerprint(row[date_end:], fingerprint_types)
+            fingerprints[row[1]] = fingerprint
+
+            if (row[0] > lastObjectID or (latest is not None and (lastDate is None or latest > lastDate)) or
+                    lastFingerprints.get(row[1], fingerprint) != fingerprint):
+                changed[row[0]] = row[1]
+
+            maxObjectID = max(maxObjectID, row[0])
+            if latest is not None and (maxDate is None or latest > maxDate):
+                maxDate = latest
+
+    newWatermark = {"maxObjectID": maxObjectID,
+                    "maxDate": maxDate.strftime(WATERMARK_DATE_FORMAT) if maxDate else None,
+                    "fingerprints": fingerprints}
+    return records, changed, newWatermark
+
+# ------------------------------------------------------------------------------
+# Refreshes an export made with Incremental.  The watermark file next to the
+# output holds the largest objectid, the latest review, correction or
+# verification date and a fingerprint of each record at the last export.
+# Records added or changed since are deleted from the output and written
+# again with their current values, and records no longer in the sessions are
+# deleted.  The first incremental export writes every record, with the same
+# writer as the later exports.  The record id is always exported, it is how
+# the records in the output are found.  Returns the same dictionary as
+# ExportRecords, with the number of records removed from the output
+# ------------------------------------------------------------------------------
+def ExportIncremental(ReviewerWorkspace, SessionsList, FieldsList, Workspace, ShapeName, FinalPointShape, Table):
+    REVTABLEMAIN = getFullPath(ReviewerWorkspace, "REVTABLEMAIN", True)
+    REVTABLEPOINT = getFullPath(ReviewerWorkspace, "REVTABLEPOINT", True)
+    SessionsTable = getFullPath(ReviewerWorkspace, "REVSESSIONTABLE", True)
+    schema = GetSchema(REVTABLEMAIN)
+
+    fields = [name for name in FieldsList if schema.field_type(name) in ADD_FIELD_TYPES]
+    if schema.id_field not in fields:
+        fields.append(schema.id_field)
+
+    sessions, rowcount = GetSessionIDs(SessionsTable, SessionsList)
+    SessionClause = MakeSessionClause(SessionsTable, sessions.keys(), rowcount)
+
+    sink = ShapefileSink(FinalPointShape)
+    sidecar = WatermarkPath(FinalPointShape)
+    state = {"workspace": ReviewerWorkspace, "sessions": sorted(SessionsList), "fields": fields}
+
+    if not os.path.exists(sidecar):
+        # --- First export, every record is written ---
+        if sink.exists():
+            arcpy.AddError("{} was not made by an incremental export.  Delete it or choose a new output."
+                           .format(FinalPointShape))
+            return None
+
+        records, changed, watermark = ScanRecords(REVTABLEMAIN, SessionClause, fields)
+        removed = 0
+        sink.open(fields, schema, GetSchema(REVTABLEPOINT).spatial_reference)
+    else:
+        with open(sidecar) as f:
+            previous = json.load(f)
+
+        if [previous.get(key) for key in ("workspace", "sessions", "fields")] != [state[key] for key in
+                                                                               ("workspace", "sessions", "fields")]:
+            arcpy.AddError("{} was exported from other sessions or with other fields.  Delete it and {} to "
+                           "export it again.".format(FinalPointShape, sidecar))
+            return None
+
+        # --- Remove the changed and deleted records, then write the changes ---
+        records, changed, watermark = ScanRecords(REVTABLEMAIN, SessionClause, fields, previous)
+        arcpy.AddMessage("  .. {} records were added or changed since the last export".format(len(changed)))
+
+        remove = set(changed.values())
+        sink.nameFields(fields)
+        for path in (FinalPointShape, Table):
+            if arcpy.Exists(path):
+                with arcpy.da.SearchCursor(path, [sink.outputName(schema.id_field)]) as cursor:
+                    remove.update(row[0] for row in cursor if row[0] not in records)
+
+        removed = sink.deleteRecords(schema.id_field, remove)
+        sink.append(fields, schema)
 
-            # ----------------------
-            # Add XY to Point Errors
-            # ----------------------
-
-            count = 0
-            arcpy.AddMessage("\nProcessing Point Errors...")
-
-            # Make a point layer and join to RevTableMain to get error
-            # information
-            arcpy.MakeFeatureLayer_management(REVTABLEPOINT, "TempPoint",
-            WhereClause, "", "")
-
-            count = int(arcpy.GetCount_management("TempPoint").getOutput(0))
-
-            arcpy.AddMessage("  .. " + str(count) \
-            + " point features will be processed.")
-
-            TotalErrors = TotalErrors + count
-
-            arcpy.FeatureClassToFeatureClass_conversion("TempPoint",
-            TempWksp, "TempPoint")
-
-            # -------------------------------
-            # Add Line Errors to XY Shapefile
-            # -------------------------------
-
-            count = 0
-
-            arcpy.AddMessage("\nProcessing Line Errors...")
-
-            # Make Line Layer with only records from selected sessions
-            arcpy.MakeFeatureLayer_management(REVTABLELINE, "RevLine",
-            WhereClause, "", "")
-
-            count = int(arcpy.GetCount_management("RevLine").getOutput(0))
-
-            if count >= 1:
-                arcpy.AddMessage("  .. " + str(count) + " line features will " \
-                + "be processed.")
-                arcpy.AddMessage("  .. Converting line geometry to point.")
-
-                # --- Handle multi-part geometries ---
-                # Explode into single part features
-                arcpy.MultipartToSinglepart_management("RevLine",
-                LineShapeSingle)
-
-                # Run repair geometry incase any bad geometry created.
-                arcpy.RepairGeometry_management(LineShapeSingle)
-
-                # Create a point for each part
-                arcpy.FeatureToPoint_management(LineShapeSingle, LineShape,
-                "INSIDE")
-
-                # Dissolve the points into a multi-part point using the LinkGUID
-                # field
-                arcpy.Dissolve_management(LineShape, LineShapeDissolve,
-                "LINKGUID", "", "MULTI_PART", "DISSOLVE_LINES")
-
-                TotalErrors = TotalErrors + count
-
-                arcpy.Append_management(LineShapeDissolve, TempFC, "NO_TEST",
-                "")
-
-            else:
-                arcpy.AddMessage("  .. No line errors exist in selected " \
-                + "session.")
-
-            # ----------------------------------
-            # Add Polygon Errors to XY Shapefile
-            # ----------------------------------
-
-            count = 0
-
-            # Make Polygon Layer with only records from selected sessions
-            arcpy.AddMessage("\nProcessing Polygon Errors...")
-            arcpy.MakeFeatureLayer_management(REVTABLEPOLY, "RevPoly",
-            WhereClause, "", PointFieldInfo)
-
-            count = int(arcpy.GetCount_management("RevPoly").getOutput(0))
-
-            if count >= 1:
-                arcpy.AddMessage("  .. " + str(count) + " polygon features " \
-                + "will be exported to shapefile.")
-                arcpy.AddMessage("  .. Converting polygon geometry to point.")
-
-                # --- Handle multi-part geometries ---
-                # Explode into single part features
-                arcpy.MultipartToSinglepart_management("RevPoly",
-                PolyShapeSingle)
-
-                # Run repair geometry incase any bad geometry created.
-                arcpy.RepairGeometry_management(PolyShapeSingle)
-
-                # Create a point for each part
-                arcpy.FeatureToPoint_management(PolyShapeSingle, PolyShape,
-                "INSIDE")
-
-                # Dissolve the points into a multi-part point using the
-                # LinkGUID field
-                arcpy.Dissolve_management(PolyShape, PolyShapeDissolve,
-                "LINKGUID", "", "MULTI_PART", "DISSOLVE_LINES")
-
-                TotalErrors = TotalErrors + count
-
-                arcpy.Append_management(PolyShapeDissolve, TempFC, "NO_TEST",
-                "")
-
-            else:
-                arcpy.AddMessage("  .. No polygon errors exist in selected " \
-                + "session.")
-
-            arcpy.MakeFeatureLayer_management(TempFC, "Final_pt", "", "", "")
-            arcpy.AddMessage("  .. Joining to RevTableMain for error " \
-            + "information.")
-            arcpy.AddJoin_management("Final_pt", "LINKGUID", REVTABLEMAIN,
-            "ID", "KEEP_COMMON")
-            
-            # Make new layer with appropriate output field names
-            shape = ShapeName[:-4]
-            arcpy.MakeFeatureLayer_management("Final_pt", shape, "", "",
-            PointFieldInfo)
-            count = int(arcpy.GetCount_management(shape).getOutput(0))
-
-            arcpy.AddMessage("\nCreating point shapefile.")
-            shape_out = ShapeName[:-4]
-            
-            if arcpy.GetInstallInfo()['ProductName'] == 'Desktop':           
-                # Save the layer as a shapefile
-                arcpy.FeatureClassToShapefile_conversion(shape, Workspace)
-            else:
-                tmp_out = TempWksp + "\\tmp_out"
-                Renamefield_Pro(shape, tmp_out, Workspace, ShapeName)
-
-
-            # -------------------------------
-            # Process Errors with no geometry
-            # -------------------------------
-
-            arcpy.AddMessage("\nProcessing errors with no geometry...")
-            count = 0
-
-            # To find only table records, add the GeometryType field records
-            # that are null to the list
-            GeoFieldName = arcpy.AddFieldDelimiters(ReviewerWorkspace,
-            "GEOMETRYTYPE")
-            if SessionCount != RowCount:
-                WhereClause = WhereClause + " AND " + GeoFieldName + " IS NULL"
-            else:
-                WhereClause = GeoFieldName + " IS NULL"
-
-            # Create a table view of records that meet query
-            arcpy.MakeTableView_management(REVTABLEMAIN, "RevTable",
-            WhereClause, "#", TableFieldInfo)
-            count = int(arcpy.GetCount_management("RevTable").getOutput(0))
-
-            # If errors with no geometry exist
-            if count >= 1:
-                TotalErrors = TotalErrors + count
-                arcpy.AddMessage("  .. " + str(count) + " errors exist with " \
-                + "no geometry and will be exported to a table.")
-
-                # Create the .dbf table of errors
-                arcpy.TableToTable_conversion("RevTable", Workspace, FileName)
-
-            else:
-                arcpy.AddMessage("No errors exist with no geometry in " \
-                + "selected session.  No table will be created.")
-
-            # Provide summary information about processing
-            arcpy.AddMessage("\nTotal Errors Exported: " + str(TotalErrors))
-            arcpy.AddMessage("Output shapefile path " + FinalPointShape)
-            if count >= 1:
-                arcpy.AddMessage("Output Table path " + Table)
-
-            if arcpy.Exists("RevTable"):
-                arcpy.Delete_management("RevTable")
-
-        del REVTABLEMAIN,  REVTABLEPOINT, REVTABLELINE, REVTABLEPOLY
-
-    except SystemExit:
-
-        # If the script fails...
-        arcpy.AddMessage("Exiting the script")
-        tb = sys.exc_info()[2]
-        arcpy.AddMessage("Failed at step 3 \n" "Line %i" % tb.tb_lineno)
-        arcpy.AddMessage(e.message)
-
-        # Delete the output shapefile and table if created
-        # (likely created incorrectly)
-        if arcpy.Exists(FinalPointShape):
-            arcpy.Delete_management(FinalPointShape)
-        if arcpy.Exists(Table):
-            arcpy.Delete_management(Table)
-        if arcpy.Exists(TempWksp):
-            arcpy.Delete_management(TempWksp)
-
+    try:
+        for values, shape, point in IterErrorRecords(ReviewerWorkspace, fields, SessionClause, SessionClause,
+                                                     Sample=changed):
+            sink.add(values, shape, point)
     finally:
-
-        # Delete temporary layers\shapefiles
-        arcpy.AddMessage("Deleting temporary shapefiles.")
-        if arcpy.Exists("RevLine"):
-            arcpy.Delete_management("RevLine")
-        if arcpy.Exists("RevPoly"):
-            arcpy.Delete_management("RevPoly")
-        if arcpy.Exists("Final_pt"):
-            arcpy.Delete_management("Final_pt")
-        if arcpy.Exists("TempPoint"):
-            arcpy.Delete_management("TempPoint")
-        if arcpy.Exists(LineShape):
-            arcpy.Delete_management(LineShape)
-        if arcpy.Exists(PolyShape):
-            arcpy.Delete_management(PolyShape)
-        if arcpy.Exists(LineShapeSingle):
-            arcpy.Delete_management(LineShapeSingle)
-        if arcpy.Exists(LineShapeDissolve):
-            arcpy.Delete_management(LineShapeDissolve)
-        if arcpy.Exists(PolyShapeSingle):
-            arcpy.Delete_management(PolyShapeSingle)
-        if arcpy.Exists(PolyShapeDissolve):
-            arcpy.Delete_management(PolyShapeDissolve)
-        if arcpy.Exists(TempFC):
-            arcpy.Delete_management(TempFC)
-        if arcpy.Exists(TempWksp):
-            arcpy.Delete_management(TempWksp)
-        if arcpy.Exists(TempDir):
-            shutil.rmtree(TempDir)
-
-        if arcpy.GetInstallInfo()['ProductName'] == 'Desktop':
-            arcpy.RefreshCatalog(Workspace)
-
-
-else:
-    arcpy.AddError("Please choose new output directory or delete " \
-    + "existing files")
-
+        sink.close()
+
+    state.update(watermark)
+    with open(sidecar, "w") as f:
+        json.dump(state, f)
+
+    arcpy.AddMessage("  .. {} rows of changed or deleted records were removed".format(removed))
+    arcpy.AddMessage("\nTotal Errors Exported: " + str(sink.count))
+    arcpy.AddMessage("Output shapefile path " + FinalPointShape)
+
+    result = {"total": sink.count, "removed": removed, "shapefile": FinalPointShape, "table": None}
+    if arcpy.Exists(Table):
+        result["table"] = Table
+    return result
+
+# ------------------------------------------------------------------------------
+# Exports the records of the selected sessions to a point shapefile and a table
+# of the records without geometry.  Can be called from other scripts without
+# the toolbox.
+#   ReviewerWorkspace (str): path to the Reviewer workspace
+#   SessionsList (list of str): names of the sessions to export
+#   FieldsList (list of str): REVTABLEMAIN fields to include in the output
+#   Workspace (str): output folder
+#   ShapeName (str): name of the output shapefile
+#   PlanOnly (bool): count the records without creating any output
+#   SampleSize (int): export a random sample of this many records instead of
+#       all of them
+#   SampleField (str): REVTABLEMAIN field the sample is stratified by, so
+#       SampleSize records are exported for each of its values
+#   Incremental (bool): only write the records added, changed or deleted
+#       since the last incremental export to the same output
+#   SpatialSort (str): HILBERT or MORTON, write the records in the order of
+#       their points along the curve and build the spatial index of the output.
+#       Cannot be used with Incremental
+# Returns a dictionary with the number of records exported and the output
+# paths, the plan when PlanOnly is True, or None if the export failed
+# ------------------------------------------------------------------------------
+def ExportRecords(ReviewerWorkspace, SessionsList, FieldsList, Workspace, ShapeName, PlanOnly=False,
+                  SampleSize=0, SampleField=None, Incremental=False, SpatialSort=None):
+
+    if not CheckLicense():
+        return None
+
+    if SpatialSort:
+        SpatialSort = SpatialSort.upper()
+        if SpatialSort not in SPATIAL_SORTS:
+            arcpy.AddError("The records can only be sorted along a {} curve.".format(" or ".join(SPATIAL_SORTS)))
+            return None
+
+        # An incremental export deletes and appends rows in place, so its
+        # output cannot be kept in curve order
+        if Incremental:
+            arcpy.AddError("An incremental export cannot be sorted along a curve.  Choose a spatial sort or "
+                           "an incremental export.")
+            return None
+
+    SessionsList = [value.strip("'") for value in SessionsList]
+
+    # Names of the point shapefile and of the table of errors with no geometry
+    if ".shp" in ShapeName:
+        FileName = ShapeName[:-4] + "_Table.dbf"
+    else:
+        FileName = ShapeName + "_Table.dbf"
+        ShapeName = ShapeName + ".shp"
+
+    FinalPointShape = os.path.join(Workspace, ShapeName)
+    Table = os.path.join(Workspace, FileName)
+
+    # Count the records without creating any output
+    if PlanOnly:
+        return PlanExport(ReviewerWorkspace, SessionsList, FieldsList)
+
+    if not os.path.exists(Workspace):
+        os.makedirs(Workspace)
+
+    if Incremental:
+        return ExportIncremental(ReviewerWorkspace, SessionsList, FieldsList, Workspace, ShapeName,
+                                 FinalPointShape, Table)
+
+    result = ExportStream(ReviewerWorkspace, SessionsList, FieldsList, FinalPointShape, Table, SampleSize,
+                          SampleField, SpatialSort)
+
+    if arcpy.GetInstallInfo()['ProductName'] == 'Desktop':
+        arcpy.RefreshCatalog(Workspace)
+
+    return result
+
+def main():
+
+    ##Script arguments
+    ReviewerWorkspace = arcpy.GetParameterAsText(0)
+    Sessions = arcpy.GetParameterAsText(1)
+    Fields = arcpy.GetParameterAsText(2)
+    Workspace = arcpy.GetParameterAsText(3)
+    ShapeName = arcpy.GetParameterAsText(4)
+
+    # Optional plan only parameter.  Toolboxes without the parameter always
+    # export the records
+    PlanOnly = ''
+    if arcpy.GetArgumentCount() > 5:
+        PlanOnly = arcpy.GetParameterAsText(5)
+
+    SampleSize = ''
+    if arcpy.GetArgumentCount() > 6:
+        SampleSize = arcpy.GetParameterAsText(6)
+
+    SampleField = ''
+    if arcpy.GetArgumentCount() > 7:
+        SampleField = arcpy.GetParameterAsText(7)
+
+    Incremental = ''
+    if arcpy.GetArgumentCount() > 8:
+        Incremental = arcpy.GetParameterAsText(8)
+
+    SpatialSort = ''
+    if arcpy.GetArgumentCount() > 9:
+        SpatialSort = arcpy.GetParameterAsText(9)
+
+    SessionsList = Sessions.split(";")
+    FieldsList = Fields.split(";")
+
+    ExportRecords(ReviewerWorkspace, SessionsList, FieldsList, Workspace, ShapeName, PlanOnly == "true",
+                  int(SampleSize) if SampleSize else 0, SampleField or None, Incremental == "true",
+                  SpatialSort or None)
+
+if __name__ == '__main__':
+    RunTool(main)
@@ -0,0 +1,321 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Command line entry point for the Data Reviewer management tools.  Runs the
+# copy and export tools without the toolbox and prints the result as JSON.
+#
+#   python ManageDataReviewerRecords.py copy <input workspace> <output workspace>
+#       <output session> --sessions "Session 1;Session 2" [--where <expression>]
+#       [--delete] [--log] [--plan] [--skip-attachments] [--verify]
+#       [--sample-size 500] [--sample-field ORIGINCHECK] [--readers 4]
+#       [--filter "SEVERITY <= 2 and ORIGINTABLE in ('Roads', 'Rivers')"]
+#   python ManageDataReviewerRecords.py export <workspace> <output folder>
+#       <shapefile name> --sessions "Session 1" [--fields "ORIGINTABLE;ORIGINCHECK"]
+#       [--plan] [--sample-size 500] [--sample-field ORIGINCHECK] [--incremental]
+#       [--spatial-sort HILBERT]
+#   python ManageDataReviewerRecords.py parquet <workspace> <output folder>
+#       --sessions "Session 1" [--fields ...] [--partition-by-status]
+#   python ManageDataReviewerRecords.py tee <workspace> <output> [<output> ...]
+#       --sessions "Session 1" [--fields ...]
+#   python ManageDataReviewerRecords.py summary <workspace> <output table>
+#       --sessions "Session 1" [--fields "SESSIONID;ORIGINCHECK"]
+#   python ManageDataReviewerRecords.py archive <input workspace> <archive workspace>
+#       <archive session> --sessions "Session 1" [--statuses "6;7"] [--phases 8]
+#       [--older-than-days 365] [--date-field VERIFICATIONDATE] [--batch-size 5000]
+#       [--log] [--plan]
+#   python ManageDataReviewerRecords.py grid <workspace> <output feature class>
+#       <cell size> --sessions "Session 1" [--hexagon]
+#   python ManageDataReviewerRecords.py index <workspace> [--rebuild]
+#   python ManageDataReviewerRecords.py compare <workspace> <other workspace>
+#       <report .csv> [--sessions "Session 1"] [--ignore-sessions]
+#
+# The copy command, and the tee command with only .csv outputs, also run
+# without arcpy when the workspaces are GeoPackage or SQLite databases
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import argparse
+import json
+import sys
+
+from ReviewerStorage import IsSqliteWorkspace, SqliteBackend
+import SqliteReviewerRecords
+
+# The tools are imported by the commands that use them, so the copy and tee
+# commands run without arcpy on GeoPackage and SQLite Reviewer workspaces
+
+# --------------------------------------------------------------
+# Splits a semicolon delimited list of names, as used by the toolbox
+# --------------------------------------------------------------
+def SplitList(value):
+    return [name.strip().strip("'") for name in value.split(";") if name.strip()]
+
+# --------------------------------------------------------------
+# Returns the fields to export, by default all REVTABLEMAIN fields
+# except the internal RECORDID objectid
+# --------------------------------------------------------------
+def ExportFields(workspace, fields):
+    if fields:
+        return SplitList(fields)
+
+    if IsSqliteWorkspace(workspace):
+        backend = SqliteBackend(workspace)
+        try:
+            schema = backend.schema(backend.fullPath("REVTABLEMAIN"))
+        finally:
+            backend.close()
+    else:
+        from CopyDataReviewerRecords import getFullPath, GetSchema
+        schema = GetSchema(getFullPath(workspace, "REVTABLEMAIN", True))
+
+    return [name for name in schema.fields if name != schema.oid_field and name.upper() != "RECORDID"]
+
+# --------------------------------------------------------------
+# Adds the random sample options of the copy and export commands
+# --------------------------------------------------------------
+def AddSampleArguments(parser):
+    parser.add_argument("--sample-size", type=int, default=0,
+                        help="process a random sample of this many records instead of all of them")
+    parser.add_argument("--sample-field", help="REVTABLEMAIN field to stratify the sample by, "
+                                               "--sample-size records are taken for each of its values")
+
+def RunCopy(args):
+    if IsSqliteWorkspace(args.in_workspace) and IsSqliteWorkspace(args.out_workspace) and not (
+            args.plan or args.sample_size or args.filter or args.log or args.verify or args.delete):
+        return SqliteReviewerRecords.CopyRecordsSql(args.in_workspace, SplitList(args.sessions), args.out_workspace,
+                                                    args.out_session, args.where, args.skip_attachments)
+
+    try:
+        from CopyDataReviewerRecords import CopyRecords
+    except ImportError as e:
+        raise ValueError("Copies with --delete, --log, --verify, --plan, --sample-size or --filter need arcpy, "
+                         "also between GeoPackage and SQLite workspaces: {}".format(e))
+    return CopyRecords(args.in_workspace, SplitList(args.sessions), args.out_workspace, args.out_session,
+                       args.where, args.delete, args.log, args.plan, args.skip_attachments, args.verify,
+                       args.sample_size, args.sample_field, args.readers, args.filter)
+
+def RunExport(args):
+    from ExportDataReviewerRecordstoShapefile import ExportRecords
+    return ExportRecords(args.workspace, SplitList(args.sessions), ExportFields(args.workspace, args.fields),
+                         args.out_folder, args.shape_name, args.plan, args.sample_size, args.sample_field,
+                         args.incremental, args.spatial_sort)
+
+def RunParquet(args):
+    import ExportDataReviewerRecordstoParquet
+
+    total = ExportDataReviewerRecordstoParquet.ExportToParquet(args.workspace, SplitList(args.sessions),
+                                                               ExportFields(args.workspace, args.fields),
+                                                               args.out_folder, args.partition_by_status,
+                                                               args.row_group_size or
+                                                               ExportDataReviewerRecordstoParquet.ROW_GROUP_SIZE)
+    if total is None:
+        return None
+    return {"total": total, "folder": args.out_folder}
+
+def RunTee(args):
+    fields = ExportFields(args.workspace, args.fields)
+
+    # CSV outputs of a GeoPackage or SQLite workspace are written with SQL
+    if IsSqliteWorkspace(args.workspace) and all(path.lower().endswith(".csv") for path in args.outputs):
+        result = {"total": 0, "outputs": {}}
+        for path in args.outputs:
+            written = SqliteReviewerRecords.ExportRecordsSql(args.workspace, SplitList(args.sessions), fields, path)
+            if written is None:
+                return None
+            result["total"] = written["total"]
+            result["outputs"].update(written["outputs"])
+        return result
+
+    from ExportDataReviewerRecordstoMultipleFormats import ExportToSinks
+    return ExportToSinks(args.workspace, SplitList(args.sessions), fields, args.outputs)
+
+def RunSummary(args):
+    from SummarizeDataReviewerRecords import SummarizeRecords, SUMMARY_FIELDS
+
+    fields = SUMMARY_FIELDS
+    if args.fields:
+        fields = SplitList(args.fields)
+    return SummarizeRecords(args.workspace, SplitList(args.sessions), args.out_table, fields)
+
+def RunArchive(args):
+    from ArchiveDataReviewerRecords import ArchiveRecords, ARCHIVE_BATCH_SIZE
+
+    return ArchiveRecords(args.in_workspace, SplitList(args.sessions), args.out_workspace, args.out_session,
+                          [int(value) for value in SplitList(args.statuses or "")],
+                          [int(value) for value in SplitList(args.phases or "")],
+                          args.older_than_days, args.date_field, args.batch_size or ARCHIVE_BATCH_SIZE,
+                          args.log, args.plan)
+
+def RunGrid(args):
+    from ExportDataReviewerRecordstoGrid import ExportToGrid
+    return ExportToGrid(args.workspace, SplitList(args.sessions), args.out_feature_class, args.cell_size,
+                        "HEXAGON" if args.hexagon else "SQUARE")
+
+def RunIndex(args):
+    from ReviewerSessionIndex import BuildSessionIndex
+    return BuildSessionIndex(args.workspace, args.rebuild)
+
+def RunCompare(args):
+    from CompareDataReviewerRecords import CompareRecords
+    return CompareRecords(args.workspace, args.other_workspace, args.out_report, SplitList(args.sessions or ""),
+                          not args.ignore_sessions)
+
+# --------------------------------------------------------------
+# Parser of the commands of jobs run by the worker and scheduler.  Invalid
+# arguments raise ValueError instead of exiting the process
+# --------------------------------------------------------------
+class JobArgumentParser(argparse.ArgumentParser):
+
+    def error(self, message):
+        raise ValueError("{}: {}".format(self.prog, message))
+
+    def exit(self, status=0, message=None):
+        raise ValueError(message or "{} exited with status {}".format(self.prog, status))
+
+def MakeParser(parserClass=argparse.ArgumentParser):
+    parser = parserClass(description="Copy and export ArcGIS Data Reviewer records.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    copy = commands.add_parser("copy", help="copy records into another Reviewer session")
+    copy.add_argument("in_workspace", help="input Reviewer workspace")
+    copy.add_argument("out_workspace", help="output Reviewer workspace")
+    copy.add_argument("out_session", help="name of the output Reviewer session")
+    copy.add_argument("--sessions", required=True, help="semicolon delimited names of the input sessions")
+    copy.add_argument("--where", default="", help="SQL expression selecting the records to copy")
+    copy.add_argument("--delete", action="store_true", help="delete the copied records from the input workspace")
+    copy.add_argument("--log", action="store_true", help="write a logfile")
+    copy.add_argument("--plan", action="store_true", help="count the records without copying them")
+    copy.add_argument("--skip-attachments", action="store_true",
+                      help="do not copy location records or check run properties, not with --delete")
+    copy.add_argument("--verify", action="store_true",
+                      help="compare the copied records with the input records, always done with --delete")
+    AddSampleArguments(copy)
+    copy.add_argument("--readers", type=int, default=0,
+                      help="number of processes reading the records in parallel objectid ranges")
+    copy.add_argument("--filter", default=None,
+                      help="Python expression over the REVTABLEMAIN fields selecting the records to copy")
+    copy.set_defaults(run=RunCopy)
+
+    export = commands.add_parser("export", help="export records to a point shapefile")
+    export.add_argument("workspace", help="Reviewer workspace")
+    export.add_argument("out_folder", help="output folder")
+    export.add_argument("shape_name", help="name of the output shapefile")
+    export.add_argument("--sessions", required=True, help="semicolon delimited names of the sessions to export")
+    export.add_argument("--fields", help="semicolon delimited REVTABLEMAIN fields, all fields by default")
+    export.add_argument("--plan", action="store_true", help="count the records without exporting them")
+    AddSampleArguments(export)
+    export.add_argument("--incremental", action="store_true",
+                        help="only write the records added, changed or deleted since the last incremental export")
+    export.add_argument("--spatial-sort", type=str.upper, choices=("HILBERT", "MORTON"),
+                        help="write the records in the order of their points along the curve and build the "
+                             "spatial index of the output, not with --incremental")
+    export.set_defaults(run=RunExport)
+
+    parquet = commands.add_parser("parquet", help="export records to a Parquet dataset")
+    parquet.add_argument("workspace", help="Reviewer workspace")
+    parquet.add_argument("out_folder", help="output folder")
+    parquet.add_argument("--sessions", required=True, help="semicolon delimited names of the sessions to export")
+    parquet.add_argument("--fields", help="semicolon delimited REVTABLEMAIN fields, all fields by default")
+    parquet.add_argument("--partition-by-status", action="store_true", help="partition by LIFECYCLESTATUS")
+    parquet.add_argument("--row-group-size", type=int, help="number of records in each row group")
+    parquet.set_defaults(run=RunParquet)
+
+    tee = commands.add_parser("tee", help="export records to several outputs with one read")
+    tee.add_argument("workspace", help="Reviewer workspace")
+    tee.add_argument("outputs", nargs="+", help=".shp, .gpkg, .csv or .parquet outputs")
+    tee.add_argument("--sessions", required=True, help="semicolon delimited names of the sessions to export")
+    tee.add_argument("--fields", help="semicolon delimited REVTABLEMAIN fields, all fields by default")
+    tee.set_defaults(run=RunTee)
+
+    summary = commands.add_parser("summary", help="count records by session, check, severity, status and reviewer")
+    summary.add_argument("workspace", help="Reviewer workspace")
+    summary.add_argument("out_table", help="output geodatabase table, .dbf or .csv file")
+    summary.add_argument("--sessions", required=True, help="semicolon delimited names of the sessions to summarize")
+    summary.add_argument("--fields", help="semicolon delimited REVTABLEMAIN fields to group by, by default the "
+                                          "session, table, check, severity, status and reviewer")
+    summary.set_defaults(run=RunSummary)
+
+    archive = commands.add_parser("archive", help="move finished records to an archive workspace")
+    archive.add_argument("in_workspace", help="active Reviewer workspace")
+    archive.add_argument("out_workspace", help="archive Reviewer workspace")
+    archive.add_argument("out_session", help="name of the archive Reviewer session")
+    archive.add_argument("--sessions", required=True, help="semicolon delimited names of the sessions to archive")
+    archive.add_argument("--statuses", help="semicolon delimited LIFECYCLESTATUS values to archive")
+    archive.add_argument("--phases", help="semicolon delimited LIFECYCLEPHASE values to archive")
+    archive.add_argument("--older-than-days", type=float, help="archive records older than this number of days")
+    archive.add_argument("--date-field", default="VERIFICATIONDATE",
+                         help="REVIEWDATE, CORRECTIONDATE or VERIFICATIONDATE, the date field the age of a "
+                              "record is taken from")
+    archive.add_argument("--batch-size", type=int, help="number of records moved in each batch")
+    archive.add_argument("--log", action="store_true", help="write a logfile for each batch")
+    archive.add_argument("--plan", action="store_true", help="count the records without moving them")
+    archive.set_defaults(run=RunArchive)
+
+    grid = commands.add_parser("grid", help="count records in the cells of a square or hexagon grid")
+    grid.add_argument("workspace", help="Reviewer workspace")
+    grid.add_argument("out_feature_class", help="output polygon feature class or .shp file")
+    grid.add_argument("cell_size", type=float, help="cell size in the units of the Reviewer geometries")
+    grid.add_argument("--sessions", required=True, help="semicolon delimited names of the sessions to export")
+    grid.add_argument("--hexagon", action="store_true", help="use hexagon cells instead of squares")
+    grid.set_defaults(run=RunGrid)
+
+    index = commands.add_parser("index", help="build or refresh the session index of a Reviewer workspace")
+    index.add_argument("workspace", help="Reviewer workspace")
+    index.add_argument("--rebuild", action="store_true", help="build the index of every table again")
+    index.set_defaults(run=RunIndex)
+
+    compare = commands.add_parser("compare", help="report the records that differ between two Reviewer workspaces")
+    compare.add_argument("workspace", help="Reviewer workspace")
+    compare.add_argument("other_workspace", help="Reviewer workspace compared with it")
+    compare.add_argument("out_report", help="output .csv report")
+    compare.add_argument("--sessions", help="semicolon delimited names of the sessions to compare, by default all")
+    compare.add_argument("--ignore-sessions", action="store_true",
+                         help="match records across sessions instead of by session name")
+    compare.set_defaults(run=RunCompare)
+
+    return parser
+
+def main(argv=None):
+    args = MakeParser().parse_args(argv)
+    try:
+        result = args.run(args)
+    except ValueError as e:
+        sys.stderr.write("{}\n".format(e))
+        return 1
+    # Only copies and CSV tee outputs of GeoPackage and SQLite workspaces
+    # run without arcpy
+    except ImportError as e:
+        sys.stderr.write("The {} command needs arcpy for these arguments: {}\n".format(args.command, e))
+        return 1
+
+    print(json.dumps(result, indent=2, sort_keys=True, default=str))
+
+    if result is None:
+        return 1
+    if isinstance(result, dict) and not result.get("Verification", {}).get("passed", True):
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Restores the NULL values of REVTABLEMAIN columns read into a numpy
+# structured array by the bulk copy, and maps the CHECKRUNID column to the
+# output check runs.  Does not need arcpy.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import datetime
+
+# numpy ships with ArcGIS, but the bulk copy falls back to the per-row copy
+# if it cannot be imported
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Values used in place of NULL when reading REVTABLEMAIN into a numpy array.
+# TableToNumPyArray cannot store NULL in integer, text or date columns.  numpy
+# drops trailing NUL characters from text, so u'\x00' would read back as an
+# empty string; text uses the SOH control character instead
+NUMPY_NULL_VALUES = {'String': u'\x01',
+                     'Guid': u'\x01',
+                     'GlobalID': u'\x01',
+                     'Integer': -2147483648,
+                     'SmallInteger': -32768,
+                     'Date': datetime.datetime(1, 1, 1)}
+
+# ------------------------------------------------------------------------------
+# Converts a column of a structured array to a list, restoring the NULL values
+# ------------------------------------------------------------------------------
+def NumPyColumnToList(column, fieldType):
+    values = column.astype(object)
+
+    if fieldType in ('Double', 'Single'):
+        values[numpy.isnan(column)] = None
+    elif fieldType == 'Date':
+        values[column == numpy.datetime64(NUMPY_NULL_VALUES['Date'])] = None
+    elif fieldType in NUMPY_NULL_VALUES:
+        values[column == NUMPY_NULL_VALUES[fieldType]] = None
+
+    return values.tolist()
+
+# ------------------------------------------------------------------------------
+# Maps a CHECKRUNID column to the output check run IDs.  Check runs not yet in
+# checkRunMap are given a new ID from newIDs(count) and added to it.  NULL
+# stays NULL.  Returns the mapped column as a list
+# ------------------------------------------------------------------------------
+def MapCheckRuns(column, checkRunMap, newIDs):
+    uniqueCheckRuns, inverse = numpy.unique(column, return_inverse=True)
+    uniqueCheckRuns = NumPyColumnToList(uniqueCheckRuns, 'Guid')
+
+    newCheckRuns = [value for value in uniqueCheckRuns if value is not None and value not in checkRunMap]
+    checkRunMap.update(zip(newCheckRuns, newIDs(len(newCheckRuns))))
+
+    mappedCheckRuns = numpy.array([checkRunMap[value] if value is not None else None for value in uniqueCheckRuns],
+                                  dtype=object)
+    return mappedCheckRuns[inverse.reshape(-1)].tolist()
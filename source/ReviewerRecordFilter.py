@@ -0,0 +1,197 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Compiles a Python expression over the fields of REVTABLEMAIN into a function
+# that tests one row read by a cursor, for selections that are too long or
+# too complex for a SQL where clause, such as
+#   ORIGINTABLE in ('Roads', 'Rivers') and (SEVERITY <= 2 or 'gap' in NOTES.lower())
+# Field names are written in upper case.  Only literals, fields, comparisons,
+# boolean and arithmetic operators, the functions in FILTER_FUNCTIONS and the
+# string methods in FILTER_METHODS are allowed.  A row is not selected when
+# the expression fails for it, such as comparing a NULL value with a number.
+#
+# The equality and IN comparisons joined by "and" at the top of the expression
+# can also be written as a SQL where clause, so the database returns fewer
+# rows.  The expression is still tested on every row the database returns.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import ast
+import datetime
+import operator
+
+# Functions the expression can call
+FILTER_FUNCTIONS = {"abs": abs, "bool": bool, "float": float, "int": int, "len": len, "max": max,
+                    "min": min, "round": round, "str": str, "datetime": datetime.datetime}
+
+# String methods the expression can call
+FILTER_METHODS = ("lower", "upper", "strip", "startswith", "endswith", "replace", "date")
+
+# Names that are literals in Python 2
+FILTER_CONSTANTS = ("None", "True", "False")
+
+# Syntax allowed in the expression.  Some node types only exist in some
+# versions of Python
+FILTER_NODES = tuple(node for node in (getattr(ast, name, None) for name in (
+    "Expression", "BoolOp", "And", "Or", "UnaryOp", "Not", "USub", "UAdd", "BinOp", "Add", "Sub", "Mult",
+    "Div", "Mod", "FloorDiv", "Compare", "Eq", "NotEq", "Lt", "LtE", "Gt", "GtE", "In", "NotIn", "Is",
+    "IsNot", "IfExp", "Name", "Load", "Num", "Str", "Bytes", "NameConstant", "Constant", "Tuple", "List",
+    "Set", "Call", "Attribute", "Subscript", "Index", "Slice")) if node is not None)
+
+# Field types that numbers and strings are compared with in SQL
+SQL_NUMBER_TYPES = ('Double', 'Integer', 'OID', 'Single', 'SmallInteger')
+SQL_STRING_TYPES = ('String', 'Guid', 'GlobalID')
+
+# Largest number of values in an IN comparison written as SQL
+SQL_MAX_IN_VALUES = 1000
+
+# --------------------------------------------------------
+# Returns the value of a literal node, or raises ValueError
+# --------------------------------------------------------
+def LiteralValue(node):
+    value = ast.literal_eval(node)
+    if isinstance(value, bool) or value is None:
+        raise ValueError("not a number or string")
+    return value
+
+# ------------------------------------------------------------------------------
+# An expression over the fields of REVTABLEMAIN.  Use CompileRecordFilter to
+# check and compile an expression
+# ------------------------------------------------------------------------------
+class RecordFilter(object):
+
+    def __init__(self, expression, fields):
+        self.expression = expression.strip()
+        try:
+            self.tree = ast.parse(self.expression, mode='eval')
+        except SyntaxError as e:
+            raise ValueError("The filter expression is not valid: {}".format(e))
+
+        fields = set(fields)
+        names = set()
+        for node in ast.walk(self.tree):
+            if not isinstance(node, FILTER_NODES):
+                raise ValueError("The filter expression cannot use {}".format(type(node).__name__))
+            if isinstance(node, ast.Call):
+                if isinstance(node.func, ast.Name) and node.func.id in FILTER_FUNCTIONS:
+                    continue
+                if isinstance(node.func, ast.Attribute) and node.func.attr in FILTER_METHODS:
+                    continue
+                raise ValueError("The filter expression can only call {} and the string methods {}".format(
+                    ", ".join(sorted(FILTER_FUNCTIONS)), ", ".join(FILTER_METHODS)))
+            if isinstance(node, ast.Attribute) and node.attr not in FILTER_METHODS:
+                raise ValueError("The filter expression cannot use the attribute {}".format(node.attr))
+            if isinstance(node, ast.Name) and node.id not in FILTER_FUNCTIONS and node.id not in FILTER_CONSTANTS:
+                if node.id not in fields:
+                    raise ValueError("{} is not a REVTABLEMAIN field".format(node.id))
+                names.add(node.id)
+
+        # The fields are the arguments of the compiled function
+        self.names = sorted(names)
+        namespace = dict(FILTER_FUNCTIONS)
+        namespace["__builtins__"] = {}
+        self.function = eval(compile("lambda {}: ({})".format(", ".join(self.names), self.expression),
+                                     "<filter>", "eval"), namespace)
+
+    def predicate(self, fields):
+        # Returns a function that tests a row with the given fields
+        function = self.function
+        indexes = [list(fields).index(name) for name in self.names]
+        if len(indexes) == 1:
+            index = indexes[0]
+            getter = lambda row: (row[index],)
+        else:
+            getter = operator.itemgetter(*indexes) if indexes else (lambda row: ())
+
+        def matches(row):
+            try:
+                return bool(function(*getter(row)))
+            except Exception:
+                return False
+
+        return matches
+
+    def conjuncts(self):
+        body = self.tree.body
+        if isinstance(body, ast.BoolOp) and isinstance(body.op, ast.And):
+            return body.values
+        return [body]
+
+    def sqlClause(self, fieldTypes, delimit, maxLength):
+        # Returns the comparisons that can be written as SQL, joined by AND
+        # and no longer than maxLength, or '' if there are none
+        clauses = []
+        length = 0
+        for node in self.conjuncts():
+            clause = self.sqlComparison(node, fieldTypes, delimit)
+            if clause is None:
+                continue
+            added = len(clause) + (5 if clauses else 0)
+            if length + added > maxLength:
+                continue
+            clauses.append(clause)
+            length += added
+        return " AND ".join(clauses)
+
+    def sqlComparison(self, node, fieldTypes, delimit):
+        # FIELD == literal, literal == FIELD or FIELD in (literal, ...).  Other
+        # comparisons treat NULL values differently in SQL and Python
+        if not isinstance(node, ast.Compare) or len(node.ops) != 1:
+            return None
+        left, op, right = node.left, node.ops[0], node.comparators[0]
+        if isinstance(op, ast.Eq) and isinstance(right, ast.Name):
+            left, right = right, left
+        if not isinstance(left, ast.Name) or left.id not in self.names:
+            return None
+
+        try:
+            if isinstance(op, ast.Eq):
+                values = [LiteralValue(right)]
+            elif isinstance(op, ast.In) and isinstance(right, (ast.Tuple, ast.List, ast.Set)):
+                values = [LiteralValue(element) for element in right.elts]
+            else:
+                return None
+        except ValueError:
+            return None
+
+        if not values or len(values) > SQL_MAX_IN_VALUES:
+            return None
+
+        fieldType = fieldTypes.get(left.id)
+        if fieldType in SQL_NUMBER_TYPES and all(isinstance(value, (int, float)) for value in values):
+            literals = [repr(value) for value in values]
+        elif fieldType in SQL_STRING_TYPES and all(isinstance(value, str) for value in values):
+            literals = ["'{}'".format(value.replace("'", "''")) for value in values]
+        else:
+            return None
+
+        if len(literals) == 1:
+            return "{} = {}".format(delimit(left.id), literals[0])
+        return "{} IN ({})".format(delimit(left.id), ",".join(literals))
+
+# ------------------------------------------------------------------------------
+# Checks and compiles a filter expression over a list of fields.  Raises
+# ValueError if the expression is not valid or uses other fields
+# ------------------------------------------------------------------------------
+def CompileRecordFilter(expression, fields):
+    return RecordFilter(expression, fields)
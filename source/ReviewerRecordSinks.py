@@ -0,0 +1,749 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Outputs the exports write reviewer records to.  Each output is opened with
+# the REVTABLEMAIN fields to write and is given each record with its geometry
+# and representative point.  Records without geometry have None for both.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import arcpy
+import csv
+import datetime
+import heapq
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import ExportDataReviewerRecordstoParquet
+from ReviewerStorage import ReadWKB
+
+# REVTABLEMAIN fields with names over 10 characters and their shapefile names
+RENAME_FIELDS = ["ORIGINTABLE", "ORIGINCHECK", "REVIEWSTATUS",
+"CORRECTIONSTATUS", "VERIFICATIONSTATUS", "REVIEWTECHNICIAN", "REVIEWDATE",
+"CORRECTIONTECHNICIAN", "CORRECTIONDATE", "VERIFICATIONTECHNICIAN",
+"VERIFICATIONDATE", "LIFECYCLESTATUS", "LIFECYCLEPHASE"]
+
+NEW_NAMES = ["ORIG_TABLE", "ORIG_CHECK", "ERROR_DESC", "COR_STATUS",
+"VER_STATUS", "REV_TECH", "REV_DATE", "COR_TECH", "COR_DATE",
+"VER_TECH", "VER_DATE", "STATUS", "PHASE"]
+
+# Number of records an output running on its own thread can fall behind
+SINK_BUFFER_ROWS = 10000
+
+# REVTABLEMAIN fields renamed in a GeoPackage, where the feature class and
+# table already have an OBJECTID field
+GEOPACKAGE_RENAME_FIELDS = {"OBJECTID": "ORIGINOID"}
+
+# AddField type of each REVTABLEMAIN field type that can be exported
+ADD_FIELD_TYPES = {'String': 'TEXT',
+                   'Integer': 'LONG',
+                   'SmallInteger': 'SHORT',
+                   'Double': 'DOUBLE',
+                   'Single': 'FLOAT',
+                   'Date': 'DATE',
+                   'Guid': 'TEXT',
+                   'GlobalID': 'TEXT',
+                   'OID': 'LONG'}
+
+# Length of the text fields GUIDs are written to
+GUID_LENGTH = 38
+
+# dBASE type, width and decimals of each AddField type, the same as the
+# fields AddField makes in a shapefile
+DBF_FIELD_TYPES = {'TEXT': ('C', 254, 0),
+                   'LONG': ('N', 10, 0),
+                   'SHORT': ('N', 5, 0),
+                   'DOUBLE': ('N', 19, 11),
+                   'FLOAT': ('F', 13, 11),
+                   'DATE': ('D', 8, 0)}
+
+# Code page of the text in the .dbf files, written to the .cpg file
+DBF_ENCODING = "UTF-8"
+
+# Longest field name of a shapefile
+SHAPEFILE_NAME_LENGTH = 10
+
+# Id field every shapefile made by CreateFeatureclass has, always 0
+SHAPEFILE_ID_COLUMN = ('Id', 'N', 6, 0)
+SHAPEFILE_ID_VALUE = b'     0'
+
+# Shapefile header values of the multipoint shapefiles the exports write
+SHAPEFILE_CODE = 9994
+SHAPEFILE_VERSION = 1000
+SHAPE_TYPE_MULTIPOINT = 8
+
+# Size of the write buffer of each file written by the native writer
+SHAPEFILE_BUFFER_BYTES = 1024 * 1024
+
+# Curves the records can be sorted along
+SPATIAL_SORTS = ("HILBERT", "MORTON")
+
+# Bits of each coordinate of the sort curve, the extent of the records is
+# divided into a grid of 2 ** SORT_CURVE_BITS cells across
+SORT_CURVE_BITS = 16
+
+# Number of records sorted in memory before they are written to a run file
+SORT_BUFFER_ROWS = 200000
+
+# ---------------------------------------------------------------------------
+# Returns the shapefile name of a REVTABLEMAIN field
+# ---------------------------------------------------------------------------
+def ShapefileFieldName(name):
+    if name in RENAME_FIELDS:
+        return NEW_NAMES[RENAME_FIELDS.index(name)]
+    return name[:SHAPEFILE_NAME_LENGTH]
+
+# ---------------------------------------------------------------------------
+# Returns the shapefile names of a list of fields.  Names that are the same
+# once cut to 10 characters are told apart by a number, such as
+# CORRECTION and CORRECTI_1
+# ---------------------------------------------------------------------------
+def ShapefileFieldNames(names):
+    shortNames = []
+    used = set()
+    for name in names:
+        shortName = ShapefileFieldName(name)
+        number = 0
+        while shortName.upper() in used:
+            number += 1
+            suffix = "_{}".format(number)
+            shortName = ShapefileFieldName(name)[:SHAPEFILE_NAME_LENGTH - len(suffix)] + suffix
+        used.add(shortName.upper())
+        shortNames.append(shortName)
+    return shortNames
+
+# ---------------------------------------------------------------------------
+# Base class of the outputs.  prepare is called on the thread reading the
+# records and turns a record into the row written by write, which may run on
+# another thread
+# ---------------------------------------------------------------------------
+class RecordSink(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+
+    def exists(self):
+        return arcpy.Exists(self.path)
+
+    def open(self, fields, schema, spatialReference):
+        pass
+
+    def prepare(self, values, shape, point):
+        return values, shape, point
+
+    def write(self, row):
+        self.count += 1
+
+    def add(self, values, shape, point):
+        self.write(self.prepare(values, shape, point))
+
+    def close(self):
+        pass
+
+# ---------------------------------------------------------------------------
+# Writes the records to a point feature class and the records without
+# geometry to a table, in a folder of shapefiles or in a GeoPackage
+# ---------------------------------------------------------------------------
+class FeatureClassSink(RecordSink):
+
+    # REVTABLEMAIN fields written with other names
+    renameFields = {}
+
+    def __init__(self, path, workspace, featureClass, table, shortNames):
+        RecordSink.__init__(self, path)
+        self.workspace = workspace
+        self.featureClass = featureClass
+        self.table = table
+        self.shortNames = shortNames
+        self.names = {}
+        self.tableCount = 0
+        self.pointCursor = None
+        self.tableCursor = None
+
+    def exists(self):
+        return (arcpy.Exists(os.path.join(self.workspace, self.featureClass)) or
+                arcpy.Exists(os.path.join(self.workspace, self.table)))
+
+    def createWorkspace(self):
+        if not os.path.exists(self.workspace):
+            os.makedirs(self.workspace)
+
+    def nameFields(self, fields):
+        # Sets the output names of the fields written
+        self.fields = fields
+        names = [self.renameFields.get(name.upper(), name) for name in fields]
+        if self.shortNames:
+            names = ShapefileFieldNames(names)
+        self.names = dict(zip(fields, names))
+
+    def outputName(self, name):
+        if name in self.names:
+            return self.names[name]
+        name = self.renameFields.get(name.upper(), name)
+        if not self.shortNames:
+            return name
+        return ShapefileFieldName(name)
+
+    def addFields(self, table):
+        for name in self.fields:
+            field_type = self.schema.types[name]
+            length = self.schema.lengths.get(name)
+            if field_type in ('Guid', 'GlobalID'):
+                length = GUID_LENGTH
+            if ADD_FIELD_TYPES[field_type] == 'TEXT':
+                arcpy.AddField_management(table, self.outputName(name), 'TEXT', field_length=length)
+            else:
+                arcpy.AddField_management(table, self.outputName(name), ADD_FIELD_TYPES[field_type])
+
+    def open(self, fields, schema, spatialReference):
+        self.nameFields(fields)
+        self.schema = schema
+        self.createWorkspace()
+
+        arcpy.CreateFeatureclass_management(self.workspace, self.featureClass, "MULTIPOINT",
+                                            spatial_reference=spatialReference)
+        point_path = os.path.join(self.workspace, self.featureClass)
+        self.addFields(point_path)
+        self.pointCursor = arcpy.da.InsertCursor(point_path, ["SHAPE@"] + [self.outputName(name) for name in fields])
+
+    def append(self, fields, schema):
+        # Adds records to the point feature class and table written by an
+        # earlier export with the same fields
+        self.nameFields(fields)
+        self.schema = schema
+        point_path = os.path.join(self.workspace, self.featureClass)
+        self.pointCursor = arcpy.da.InsertCursor(point_path, ["SHAPE@"] + [self.outputName(name) for name in fields])
+
+    def deleteRecords(self, field, remove):
+        # Deletes the points and table rows whose value of field is in
+        # remove, a set, and returns the number of rows deleted
+        count = 0
+        for path in (os.path.join(self.workspace, self.featureClass), os.path.join(self.workspace, self.table)):
+            if not arcpy.Exists(path):
+                continue
+            with arcpy.da.UpdateCursor(path, [self.outputName(field)]) as cursor:
+                for row in cursor:
+                    if row[0] in remove:
+                        cursor.deleteRow()
+                        count += 1
+        return count
+
+    def openTable(self):
+        # The table is only created if there are records without geometry
+        table_path = os.path.join(self.workspace, self.table)
+        if not arcpy.Exists(table_path):
+            arcpy.CreateTable_management(self.workspace, self.table)
+            self.addFields(table_path)
+        self.tableCursor = arcpy.da.InsertCursor(table_path, [self.outputName(name) for name in self.fields])
+
+    def write(self, row):
+        values, shape, point = row
+        if point is None:
+            if self.tableCursor is None:
+                self.openTable()
+            self.tableCursor.insertRow(values)
+            self.tableCount += 1
+        else:
+            self.pointCursor.insertRow((point,) + tuple(values))
+        self.count += 1
+
+    def close(self):
+        if self.pointCursor is not None:
+            del self.pointCursor
+            self.pointCursor = None
+        if self.tableCursor is not None:
+            del self.tableCursor
+            self.tableCursor = None
+
+class ShapefileSink(FeatureClassSink):
+
+    def __init__(self, path):
+        folder, name = os.path.split(path)
+        FeatureClassSink.__init__(self, path, folder, name, name[:-4] + "_Table.dbf", True)
+
+class GeoPackageSink(FeatureClassSink):
+
+    renameFields = GEOPACKAGE_RENAME_FIELDS
+
+    def __init__(self, path):
+        name = os.path.splitext(os.path.basename(path))[0]
+        FeatureClassSink.__init__(self, path, path, name, name + "_Table", False)
+
+    def exists(self):
+        return arcpy.Exists(self.path)
+
+    def createWorkspace(self):
+        folder = os.path.dirname(self.path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        arcpy.CreateSQLiteDatabase_management(self.path, "GEOPACKAGE")
+
+# ---------------------------------------------------------------------------
+# Writes a dBASE file for the native shapefile writer.  The header is written
+# when the file is opened and the record count is fixed when it is closed
+# ---------------------------------------------------------------------------
+class DbfWriter(object):
+
+    def __init__(self, path, columns):
+        # columns is a list of (name, dBASE type, width, decimals)
+        self.columns = columns
+        self.count = 0
+        self.file = open(path, "wb", SHAPEFILE_BUFFER_BYTES)
+
+        today = datetime.date.today()
+        self.file.write(struct.pack('<BBBBIHH20x', 3, today.year - 1900, today.month, today.day, 0,
+                                    32 + 32 * len(columns) + 1, 1 + sum(column[2] for column in columns)))
+        for name, dbf_type, width, decimals in columns:
+            self.file.write(struct.pack('<11sc4xBB14x', name.encode('ascii'), dbf_type.encode('ascii'), width,
+                                        decimals))
+        self.file.write(b'\x0d')
+
+        with open(os.path.splitext(path)[0] + ".cpg", "w") as f:
+            f.write(DBF_ENCODING)
+
+    def write(self, data):
+        # data is the values of one record from DbfValue
+        self.file.write(b' ' + data)
+        self.count += 1
+
+    def close(self):
+        self.file.write(b'\x1a')
+        self.file.seek(4)
+        self.file.write(struct.pack('<I', self.count))
+        self.file.close()
+
+# ---------------------------------------------------------------------------
+# Returns the dBASE bytes of a value, padded to the width of the field.
+# Numbers that do not fit lose decimals, and are written as * if they still
+# do not fit
+# ---------------------------------------------------------------------------
+def DbfValue(value, dbf_type, width, decimals):
+    if value is None:
+        return b' ' * width
+
+    if dbf_type == 'C':
+        if not isinstance(value, type(u'')):
+            value = u'{}'.format(value)
+        data = value.encode('utf-8')[:width]
+        # Do not leave part of a multi-byte character at the end
+        data = data.decode('utf-8', 'ignore').encode('utf-8')
+        return data.ljust(width)
+
+    if dbf_type == 'D':
+        return '{:04d}{:02d}{:02d}'.format(value.year, value.month, value.day).encode('ascii')
+
+    text = '{:.{}f}'.format(value, decimals)
+    if len(text) > width and decimals:
+        text = '{:.{}f}'.format(value, max(0, decimals - (len(text) - width)))
+    if len(text) > width:
+        text = '*' * width
+    return text.rjust(width).encode('ascii')
+
+# ---------------------------------------------------------------------------
+# Returns the dBASE columns of the exported fields, with the shapefile names
+# of the fields
+# ---------------------------------------------------------------------------
+def DbfColumns(fields, schema):
+    columns = []
+    for name, shortName in zip(fields, ShapefileFieldNames(fields)):
+        field_type = schema.types[name]
+        dbf_type, width, decimals = DBF_FIELD_TYPES[ADD_FIELD_TYPES[field_type]]
+        if field_type in ('Guid', 'GlobalID'):
+            width = GUID_LENGTH
+        elif dbf_type == 'C':
+            width = min(width, schema.lengths.get(name) or width)
+        columns.append((shortName, dbf_type, width, decimals))
+    return columns
+
+# ---------------------------------------------------------------------------
+# Writes the records to a multipoint shapefile and a _Table.dbf of the
+# records without geometry, without arcpy.  The .shp, .shx and .dbf records
+# are packed with struct on the reading thread and written with large
+# buffered writes.  Space is left for the headers and they are written when
+# the output is closed, once the number of records and extent are known
+# ---------------------------------------------------------------------------
+class NativeShapefileSink(RecordSink):
+
+    def __init__(self, path):
+        RecordSink.__init__(self, path)
+        self.base = os.path.splitext(path)[0]
+        self.tablePath = self.base + "_Table.dbf"
+        self.tableCount = 0
+        self.table = None
+
+    def exists(self):
+        return os.path.exists(self.base + ".shp") or os.path.exists(self.tablePath)
+
+    def open(self, fields, schema, spatialReference):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self.columns = DbfColumns(fields, schema)
+        self.shapes = 0
+        self.offset = 50
+        self.extent = None
+
+        self.shp = open(self.base + ".shp", "wb", SHAPEFILE_BUFFER_BYTES)
+        self.shx = open(self.base + ".shx", "wb", SHAPEFILE_BUFFER_BYTES)
+        self.shp.write(b'\x00' * 100)
+        self.shx.write(b'\x00' * 100)
+        self.dbf = DbfWriter(self.base + ".dbf", [SHAPEFILE_ID_COLUMN] + self.columns)
+
+        if spatialReference is not None and spatialReference.name != "Unknown":
+            with open(self.base + ".prj", "w") as f:
+                f.write(spatialReference.exportToString().split(";")[0])
+
+    def prepare(self, values, shape, point):
+        data = b''.join(DbfValue(value, *column[1:]) for value, column in zip(values, self.columns))
+        if point is None:
+            return None, data
+
+        geometry_type, parts, end = ReadWKB(bytes(point.WKB))
+        return [xy for part in parts for xy in part], data
+
+    def write(self, row):
+        coords, data = row
+        if coords is None:
+            if self.table is None:
+                self.table = DbfWriter(self.tablePath, self.columns or [SHAPEFILE_ID_COLUMN])
+            self.table.write(data if self.columns else SHAPEFILE_ID_VALUE)
+            self.tableCount += 1
+        else:
+            self.writeShape(coords)
+            self.dbf.write(SHAPEFILE_ID_VALUE + data)
+        self.count += 1
+
+    def writeShape(self, coords):
+        if coords:
+            xs = [x for x, y in coords]
+            ys = [y for x, y in coords]
+            box = (min(xs), min(ys), max(xs), max(ys))
+            content = (struct.pack('<i4di', SHAPE_TYPE_MULTIPOINT, box[0], box[1], box[2], box[3], len(coords)) +
+                       struct.pack('<{}d'.format(2 * len(coords)), *[value for xy in coords for value in xy]))
+
+            if self.extent is None:
+                self.extent = list(box)
+            else:
+                self.extent = [min(self.extent[0], box[0]), min(self.extent[1], box[1]),
+                               max(self.extent[2], box[2]), max(self.extent[3], box[3])]
+        else:
+            # Null shape
+            content = struct.pack('<i', 0)
+
+        self.shapes += 1
+        length = len(content) // 2
+        self.shx.write(struct.pack('>ii', self.offset, length))
+        self.shp.write(struct.pack('>ii', self.shapes, length) + content)
+        self.offset += 4 + length
+
+    def close(self):
+        extent = self.extent or [0.0, 0.0, 0.0, 0.0]
+        for f, words in ((self.shp, self.offset), (self.shx, 50 + 4 * self.shapes)):
+            f.seek(0)
+            f.write(struct.pack('>7i', SHAPEFILE_CODE, 0, 0, 0, 0, 0, words) +
+                    struct.pack('<2i8d', SHAPEFILE_VERSION, SHAPE_TYPE_MULTIPOINT,
+                                extent[0], extent[1], extent[2], extent[3], 0.0, 0.0, 0.0, 0.0))
+            f.close()
+
+        self.dbf.close()
+        if self.table is not None:
+            self.table.close()
+
+# ---------------------------------------------------------------------------
+# Writes the records to a CSV file with the X and Y of the representative
+# point of each record
+# ---------------------------------------------------------------------------
+class CsvSink(RecordSink):
+
+    def open(self, fields, schema, spatialReference):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        if sys.version_info[0] < 3:
+            self.file = open(self.path, "wb")
+        else:
+            self.file = open(self.path, "w", newline='', encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(list(fields) + ["POINT_X", "POINT_Y"])
+
+    def prepare(self, values, shape, point):
+        row = [CsvValue(value) for value in values]
+        if point is not None:
+            first = point.firstPoint
+            row += [first.X, first.Y]
+        else:
+            row += ['', '']
+        return row
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+# ---------------------------------------------------------------------------
+# Writes the records to a Parquet file with the WKB of the geometry and the
+# X and Y of the representative point of each record
+# ---------------------------------------------------------------------------
+class ParquetSink(RecordSink):
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def open(self, fields, schema, spatialReference):
+        pyarrow = ExportDataReviewerRecordstoParquet.pyarrow
+        geometry_types = (pyarrow.binary(), pyarrow.float64(), pyarrow.float64())
+        arrow_schema = pyarrow.schema(
+            [pyarrow.field(name, ExportDataReviewerRecordstoParquet.ArrowType(schema.types[name])) for name in fields] +
+            [pyarrow.field(name, arrow_type) for name, arrow_type in
+             zip(ExportDataReviewerRecordstoParquet.GEOMETRY_COLUMNS, geometry_types)])
+        self.writer = ExportDataReviewerRecordstoParquet.PartitionWriter(
+            self.path, arrow_schema, ExportDataReviewerRecordstoParquet.ROW_GROUP_SIZE)
+
+    def prepare(self, values, shape, point):
+        if shape is None:
+            return tuple(values) + (None, None, None)
+        first = point.firstPoint
+        return tuple(values) + (bytes(shape.WKB), first.X, first.Y)
+
+    def write(self, row):
+        self.writer.add(row)
+        self.count += 1
+
+    def close(self):
+        self.writer.close()
+
+# ---------------------------------------------------------------------------
+# Returns the distance along a Hilbert curve of a cell of a grid of
+# 2 ** bits by 2 ** bits cells
+# ---------------------------------------------------------------------------
+def HilbertKey(x, y, bits=SORT_CURVE_BITS):
+    n = 1 << bits
+    key = 0
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        key += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve is continuous
+        if ry == 0:
+            if rx == 1:
+                x = n - 1 - x
+                y = n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return key
+
+# ---------------------------------------------------------------------------
+# Returns the Morton (Z order) key of a cell, the bits of x and y interleaved
+# ---------------------------------------------------------------------------
+def MortonKey(x, y, bits=SORT_CURVE_BITS):
+    key = 0
+    for i in range(bits):
+        key |= ((x >> i) & 1) << (2 * i) | ((y >> i) & 1) << (2 * i + 1)
+    return key
+
+# ---------------------------------------------------------------------------
+# Reads back the rows of a sorted run written by SortedSink
+# ---------------------------------------------------------------------------
+def ReadRun(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                break
+
+# ---------------------------------------------------------------------------
+# Writes the records to an output in the order of their representative
+# points along a Hilbert or Morton curve.  The records are prepared for the
+# output and kept in memory SORT_BUFFER_ROWS at a time.  Each full buffer is
+# sorted and written to a temporary run file and the runs are merged when the
+# output is closed, so memory use does not grow with the number of records.
+# Records without geometry come first.  The prepared rows are pickled, so only
+# outputs that do not use arcpy geometries in their rows can be sorted
+# ---------------------------------------------------------------------------
+class SortedSink(object):
+
+    def __init__(self, sink, extent, curve="HILBERT", size=SORT_BUFFER_ROWS):
+        # extent is (xmin, ymin, xmax, ymax) of the records
+        self.sink = sink
+        self.extent = extent
+        self.curveKey = MortonKey if curve.upper() == "MORTON" else HilbertKey
+        self.size = size
+        self.rows = []
+        self.runs = []
+        self.folder = None
+        self.sequence = 0
+
+    @property
+    def path(self):
+        return self.sink.path
+
+    @property
+    def count(self):
+        return self.sink.count
+
+    @property
+    def tableCount(self):
+        return self.sink.tableCount
+
+    def exists(self):
+        return self.sink.exists()
+
+    def open(self, fields, schema, spatialReference):
+        self.sink.open(fields, schema, spatialReference)
+
+    def key(self, point):
+        if point is None:
+            return -1
+
+        first = point.firstPoint
+        xmin, ymin, xmax, ymax = self.extent
+        cells = (1 << SORT_CURVE_BITS) - 1
+        x = int((first.X - xmin) / ((xmax - xmin) or 1.0) * cells)
+        y = int((first.Y - ymin) / ((ymax - ymin) or 1.0) * cells)
+        return self.curveKey(min(max(x, 0), cells), min(max(y, 0), cells))
+
+    def add(self, values, shape, point):
+        # The key and sequence are unique, so the rows are never compared
+        self.rows.append((self.key(point), self.sequence, self.sink.prepare(values, shape, point)))
+        self.sequence += 1
+        if len(self.rows) >= self.size:
+            self.spill()
+
+    def spill(self):
+        self.rows.sort()
+        if self.folder is None:
+            self.folder = tempfile.mkdtemp(prefix="reviewer_sort_")
+        path = os.path.join(self.folder, "run{}.bin".format(len(self.runs)))
+        with open(path, "wb") as f:
+            for row in self.rows:
+                pickle.dump(row, f, pickle.HIGHEST_PROTOCOL)
+        self.runs.append(path)
+        self.rows = []
+
+    def close(self):
+        try:
+            if self.runs:
+                self.spill()
+                merged = heapq.merge(*[ReadRun(path) for path in self.runs])
+            else:
+                self.rows.sort()
+                merged = self.rows
+
+            for key, sequence, row in merged:
+                self.sink.write(row)
+        finally:
+            self.sink.close()
+            if self.folder is not None:
+                shutil.rmtree(self.folder, ignore_errors=True)
+
+# ---------------------------------------------------------------------------
+# Runs an output on its own thread.  Records are prepared on the reading
+# thread and queued, and the reading thread only waits when the output has
+# fallen SINK_BUFFER_ROWS records behind.  Only outputs that do not use
+# arcpy can run on another thread
+# ---------------------------------------------------------------------------
+class BufferedSink(object):
+
+    STOP = object()
+
+    def __init__(self, sink, size=SINK_BUFFER_ROWS):
+        self.sink = sink
+        self.rows = queue.Queue(size)
+        self.error = None
+        self.thread = None
+
+    @property
+    def path(self):
+        return self.sink.path
+
+    @property
+    def count(self):
+        return self.sink.count
+
+    def exists(self):
+        return self.sink.exists()
+
+    def open(self, fields, schema, spatialReference):
+        self.sink.open(fields, schema, spatialReference)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while True:
+            row = self.rows.get()
+            if row is BufferedSink.STOP:
+                break
+            # after an error keep emptying the queue so the reading thread
+            # is not blocked
+            if self.error is None:
+                try:
+                    self.sink.write(row)
+                except Exception as e:
+                    self.error = e
+
+    def add(self, values, shape, point):
+        if self.error is not None:
+            raise self.error
+        self.rows.put(self.sink.prepare(values, shape, point))
+
+    def close(self):
+        if self.thread is not None:
+            self.rows.put(BufferedSink.STOP)
+            self.thread.join()
+        self.sink.close()
+        if self.error is not None:
+            raise self.error
+
+# ------------------------------------------------------------
+# Returns a value as it is written to a CSV file
+# ------------------------------------------------------------
+def CsvValue(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if sys.version_info[0] < 3 and isinstance(value, unicode):
+        return value.encode("utf-8")
+    return value
@@ -0,0 +1,271 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Reads the reviewer records of the selected sessions together with their
+# geometry and the representative point used by the exports.  Records are read
+# from REVTABLEMAIN with one cursor and their geometries are fetched in chunks.
+# The link ids of the geometries are kept in a temporary SQLite file instead of
+# in memory, so memory use does not grow with the number of records.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import arcpy
+import os
+import sqlite3
+import tempfile
+
+from CopyDataReviewerRecords import getFullPath, GetSchema, MakeInClause, ChunkClauses, MAX_IN_VALUES
+from ReviewerSessionIndex import OpenSessionIndex
+
+# Reviewer geometry tables and the GEOMETRYTYPE of the records they store
+GEOMETRY_TABLES = (("REVTABLEPOINT", "Point"),
+                   ("REVTABLELINE", "Polyline"),
+                   ("REVTABLEPOLY", "Polygon"))
+
+# Number of REVTABLEMAIN records whose geometries are fetched at a time
+CHUNK_SIZE = 1000
+
+# Number of rows added to the geometry index at a time
+GEOMETRY_INDEX_BATCH_ROWS = 10000
+
+# Largest number of values in one SQLite query, SQLite allows 999
+SQLITE_MAX_VARIABLES = 900
+
+# -----------------------------------------------------------
+# Gets the IDs of the selected sessions from REVSESSIONTABLE
+# -----------------------------------------------------------
+def GetSessionIDs(SessionsTable, SessionsList):
+    # Returns a dictionary of session id: session name for the selected
+    # sessions and the total number of sessions in the workspace
+    sessions = {}
+    rowcount = 0
+    with arcpy.da.SearchCursor(SessionsTable, ["SESSIONID", "SESSIONNAME"]) as rows:
+        for row in rows:
+            rowcount += 1
+            if row[1] in SessionsList:
+                sessions[row[0]] = row[1]
+
+    return sessions, rowcount
+
+# --------------------------------------------------------------------------
+# Makes the where clause selecting the records of the selected sessions.
+# No where clause is needed when every session in the workspace is selected
+# --------------------------------------------------------------------------
+def MakeSessionClause(SessionsTable, sessionIDs, rowcount):
+    if len(sessionIDs) == rowcount:
+        return ''
+
+    clause = MakeInClause(SessionsTable, "SESSIONID", list(sessionIDs))
+    if clause is None:
+        clause = ''
+    return clause
+
+# ------------------------------------------------------------------------------
+# The geometry table and objectid of each geometry, by link id, kept in a
+# temporary SQLite file that is deleted when the index is closed
+# ------------------------------------------------------------------------------
+class GeometryIndex(object):
+
+    def __init__(self):
+        handle, self.path = tempfile.mkstemp(suffix=".sqlite")
+        os.close(handle)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute("CREATE TABLE geometries (link, tbl TEXT, oid INTEGER)")
+        self.indexed = False
+
+    def add(self, table, rows):
+        # Adds the (objectid, link id) rows of a geometry table
+        batch = []
+        for oid, link in rows:
+            batch.append((link, table, oid))
+            if len(batch) >= GEOMETRY_INDEX_BATCH_ROWS:
+                self.connection.executemany("INSERT INTO geometries VALUES (?, ?, ?)", batch)
+                batch = []
+        self.connection.executemany("INSERT INTO geometries VALUES (?, ?, ?)", batch)
+
+    def lookup(self, links):
+        # Returns a dictionary of link id: [(geometry table, objectid), ...]
+        # for a list of link ids
+        if not self.indexed:
+            self.connection.execute("CREATE INDEX geometries_link ON geometries (link)")
+            self.indexed = True
+
+        links = list(links)
+        locations = {}
+        for i in range(0, len(links), SQLITE_MAX_VARIABLES):
+            batch = links[i:i + SQLITE_MAX_VARIABLES]
+            sql = "SELECT link, tbl, oid FROM geometries WHERE link IN ({}) ORDER BY rowid".format(
+                ", ".join("?" for link in batch))
+            for link, table, oid in self.connection.execute(sql, batch):
+                locations.setdefault(link, []).append((table, oid))
+        return locations
+
+    def close(self):
+        self.connection.close()
+        os.remove(self.path)
+
+# ------------------------------------------------------------------------
+# Makes a GeometryIndex of the geometries in the selected sessions, or only
+# of the geometries of linkIDs when it is given.  Only the ids are read,
+# geometries are fetched later by FetchGeometries
+# ------------------------------------------------------------------------
+def IndexGeometries(RevWorkspace, SessionClause, linkIDs=None):
+    index = GeometryIndex()
+    for table_name, geom_type in GEOMETRY_TABLES:
+        table = getFullPath(RevWorkspace, table_name)
+        if table == '':
+            continue
+
+        link_field = GetSchema(table).link_field
+        whereClauses = [SessionClause]
+        if linkIDs is not None:
+            whereClauses = ChunkClauses(table, link_field, linkIDs)
+
+        for whereClause in whereClauses:
+            with arcpy.da.SearchCursor(table, ["OID@", link_field], whereClause) as cursor:
+                index.add(table, cursor)
+
+    return index
+
+# ------------------------------------------------------------
+# Fetches the geometries of a list of objectids from one table
+# ------------------------------------------------------------
+def FetchGeometries(table, oids):
+    shapes = {}
+    oid_field = GetSchema(table).oid_field
+    oids = sorted(oids)
+
+    for i in range(0, len(oids), MAX_IN_VALUES):
+        whereClause = MakeInClause(table, oid_field, oids[i:i + MAX_IN_VALUES])
+        with arcpy.da.SearchCursor(table, ["OID@", "SHAPE@"], whereClause) as cursor:
+            for oid, shape in cursor:
+                shapes[oid] = shape
+
+    return shapes
+
+# ------------------------------------------------------------------------------
+# Returns the representative point of a reviewer geometry.  Same as the
+# shapefile export, lines and polygons get one point inside each part and the
+# points are combined into a multipoint
+# ------------------------------------------------------------------------------
+def RepresentativePoint(shape):
+    if shape is None:
+        return None
+
+    if shape.type in ('point', 'multipoint'):
+        return shape
+
+    points = arcpy.Array()
+    for i in range(shape.partCount):
+        if shape.type == 'polygon':
+            part = arcpy.Polygon(shape.getPart(i), shape.spatialReference)
+        else:
+            part = arcpy.Polyline(shape.getPart(i), shape.spatialReference)
+        points.add(part.labelPoint)
+
+    return arcpy.Multipoint(points, shape.spatialReference)
+
+# ----------------------------------------------------------------------------
+# Yields (values, geometry, representative point) for each of the records
+# in a chunk of REVTABLEMAIN rows
+# ----------------------------------------------------------------------------
+def _ResolveChunk(chunk, geometryIndex):
+    # Group the geometries needed by this chunk by table
+    locations = geometryIndex.lookup(set(link for values, link in chunk))
+    needed = {}
+    for link_locations in locations.values():
+        for table, oid in link_locations:
+            needed.setdefault(table, []).append(oid)
+
+    shapes = {}
+    for table, oids in needed.items():
+        for oid, shape in FetchGeometries(table, oids).items():
+            shapes[(table, oid)] = shape
+
+    for values, link in chunk:
+        link_locations = locations.get(link)
+        if not link_locations:
+            yield values, None, None
+            continue
+
+        for location in link_locations:
+            shape = shapes.get(location)
+            yield values, shape, RepresentativePoint(shape)
+
+# -------------------------------------------------------------------------
+# Yields (values, geometry, representative point) for each of the records in
+# REVTABLEMAIN that meet the where clause.  values holds the value of each
+# field in fields.  Records without geometry have None for the geometry and
+# point.  Records with more than one geometry are returned once per geometry.
+# When Sample, a dictionary of objectid: record id from SampleRecords, is
+# given only the sampled records and their geometries are read.  When the
+# workspace has a session index and SessionIDs, the ids of the sessions in
+# SessionClause, is given the records of the sessions are read by objectid.
+# -------------------------------------------------------------------------
+def IterErrorRecords(RevWorkspace, fields, WhereClause, SessionClause, chunkSize=CHUNK_SIZE, Sample=None,
+                     SessionIDs=None):
+    REVTABLEMAIN = getFullPath(RevWorkspace, "REVTABLEMAIN", True)
+
+    schema = GetSchema(REVTABLEMAIN)
+    id_field = schema.id_field
+
+    index = None
+    if Sample is None and SessionIDs is not None and SessionClause and WhereClause == SessionClause:
+        index = OpenSessionIndex(RevWorkspace)
+
+    if index is not None:
+        try:
+            Sample = index.records(SessionIDs)
+            geometryIndex = GeometryIndex()
+            for table_name, geom_type in GEOMETRY_TABLES:
+                table = index.tablePath(table_name)
+                if table != '':
+                    geometryIndex.add(table, index.sessionRows(table_name, SessionIDs))
+        finally:
+            index.close()
+        whereClauses = ChunkClauses(REVTABLEMAIN, schema.oid_field, Sample.keys())
+    elif Sample is None:
+        geometryIndex = IndexGeometries(RevWorkspace, SessionClause)
+        whereClauses = [WhereClause]
+    else:
+        geometryIndex = IndexGeometries(RevWorkspace, SessionClause, list(Sample.values()))
+        whereClauses = ChunkClauses(REVTABLEMAIN, schema.oid_field, Sample.keys())
+
+    read_fields = list(fields) + [id_field]
+    chunk = []
+    try:
+        for whereClause in whereClauses:
+            with arcpy.da.SearchCursor(REVTABLEMAIN, read_fields, whereClause) as cursor:
+                for row in cursor:
+                    chunk.append((row[:-1], row[-1]))
+                    if len(chunk) >= chunkSize:
+                        for record in _ResolveChunk(chunk, geometryIndex):
+                            yield record
+                        chunk = []
+
+        for record in _ResolveChunk(chunk, geometryIndex):
+            yield record
+    finally:
+        geometryIndex.close()
@@ -0,0 +1,89 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Remembers the check runs and batch runs copied from one Reviewer workspace
+# into another, in a SQLite file next to the output workspace.  Each input
+# CHECKRUNID is kept with the CHECKRUNID it was given in each output session,
+# and each input batch run GUID with the GUID it was given in the output
+# workspace, so later copies of records from the same runs reuse the output
+# run rows instead of adding them again.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import os
+import sqlite3
+
+# File name added to the output workspace path for the run map
+RUN_MAP_EXTENSION = ".runs.sqlite"
+
+# Kinds of runs in the map
+CHECK_RUNS = "CHECKRUN"
+BATCH_RUNS = "BATCHRUN"
+
+# Seconds to wait for another process writing the run map
+RUN_MAP_TIMEOUT = 60
+
+# --------------------------------------------------------
+# Returns the path of the run map of an output workspace
+# --------------------------------------------------------
+def RunMapPath(out_workspace):
+    return os.path.normpath(str(out_workspace)) + RUN_MAP_EXTENSION
+
+# --------------------------------------------------------
+# Returns the key the input workspace is stored under
+# --------------------------------------------------------
+def WorkspaceKey(in_workspace):
+    return os.path.normcase(os.path.abspath(str(in_workspace)))
+
+# ------------------------------------------------------------------------------
+# Run ids copied from one input workspace into one output workspace.  Check
+# runs are kept by output session, batch runs are stored with session 0
+# ------------------------------------------------------------------------------
+class RunMap(object):
+
+    def __init__(self, in_workspace, out_workspace):
+        self.source = WorkspaceKey(in_workspace)
+        self.connection = sqlite3.connect(RunMapPath(out_workspace), timeout=RUN_MAP_TIMEOUT)
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS runs (source TEXT, kind TEXT, session INTEGER, old TEXT, new TEXT,
+                                             PRIMARY KEY (source, kind, session, old))''')
+
+    def close(self):
+        self.connection.close()
+
+    def load(self, kind, session=0):
+        # Returns a dictionary of input run id: output run id
+        return dict(self.connection.execute(
+            "SELECT old, new FROM runs WHERE source = ? AND kind = ? AND session = ?",
+            (self.source, kind, int(session))))
+
+    def save(self, kind, mapping, session=0):
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)",
+                                        [(self.source, kind, int(session), old, new)
+                                         for old, new in mapping.items()])
+
+    def remove(self, kind, olds, session=0):
+        with self.connection:
+            self.connection.executemany("DELETE FROM runs WHERE source = ? AND kind = ? AND session = ? AND old = ?",
+                                        [(self.source, kind, int(session), old) for old in olds])
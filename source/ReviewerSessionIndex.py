@@ -0,0 +1,219 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Keeps an index of the reviewer records and geometries of each session in a
+# SQLite file next to the Reviewer workspace.  The index holds the objectid
+# and record id of each REVTABLEMAIN record and the objectid and link id of
+# each geometry, by session, so the tools can read the rows of a few sessions
+# by objectid instead of filtering every row of the tables by SESSIONID.
+#
+# The index is optional.  It is built by BuildSessionIndex, or the index
+# command of ManageDataReviewerRecords.py, and once it exists the tools use
+# it.  Before it is used the row count and largest objectid of each table are
+# compared with the index.  When rows were only added, the new rows are added
+# to the index, otherwise the index of that table is built again.  Records
+# moved to another session by editing SESSIONID in place are not detected,
+# the Reviewer tools always insert new rows instead.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import os
+import sqlite3
+
+# arcpy is only needed to read the Reviewer tables, the index itself is a
+# SQLite file
+try:
+    import arcpy
+    from CopyDataReviewerRecords import getFullPath, GetSchema
+except ImportError:
+    arcpy = None
+
+from ReviewerStorage import AddMessage
+
+# File name added to the workspace path for the index
+SESSION_INDEX_EXTENSION = ".sessions.sqlite"
+
+# Reviewer tables kept in the index
+INDEXED_TABLES = ("REVTABLEMAIN", "REVTABLEPOINT", "REVTABLELINE", "REVTABLEPOLY")
+
+# Number of rows inserted into the index at a time
+INDEX_BATCH_ROWS = 10000
+
+# Seconds to wait for another process writing the index
+INDEX_TIMEOUT = 60
+
+# --------------------------------------------------------
+# Returns the path of the session index of a workspace
+# --------------------------------------------------------
+def SessionIndexPath(in_workspace):
+    return os.path.normpath(str(in_workspace)) + SESSION_INDEX_EXTENSION
+
+# ------------------------------------------------------------------------------
+# Session index of one Reviewer workspace.  Use OpenSessionIndex to get the
+# index of a workspace if it has one
+# ------------------------------------------------------------------------------
+class SessionIndex(object):
+
+    def __init__(self, in_workspace):
+        self.workspace = in_workspace
+        self.path = SessionIndexPath(in_workspace)
+        self.connection = sqlite3.connect(self.path, timeout=INDEX_TIMEOUT)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS tables (name TEXT PRIMARY KEY, row_count INTEGER, max_oid INTEGER);
+            CREATE TABLE IF NOT EXISTS rows (name TEXT, session INTEGER, oid INTEGER, id);
+            CREATE INDEX IF NOT EXISTS rows_session ON rows (name, session);''')
+        self.checked = False
+
+    def close(self):
+        self.connection.close()
+
+    def tablePath(self, table_name):
+        return getFullPath(self.workspace, table_name)
+
+    def refresh(self):
+        # Brings the index of each table up to date.  Only done once for each
+        # time the index is opened
+        if self.checked:
+            return
+        for table_name in INDEXED_TABLES:
+            table = self.tablePath(table_name)
+            if table != '':
+                self.refreshTable(table_name, table)
+        self.checked = True
+
+    def refreshTable(self, table_name, table):
+        row_count, max_oid = self.tableState(table)
+
+        stored = self.connection.execute("SELECT row_count, max_oid FROM tables WHERE name = ?",
+                                         (table_name,)).fetchone()
+        if stored is not None and stored[0] == row_count and stored[1] == max_oid:
+            return
+
+        with self.connection:
+            # Rows added since the index was built, when nothing was deleted
+            if stored is not None and stored[1] is not None and max_oid is not None:
+                added = self.insertRows(table_name, self.readRows(table_name, table, stored[1]))
+                if stored[0] + added == row_count:
+                    AddMessage("  .. added {} {} rows to the session index".format(added, table_name))
+                    self.saveTable(table_name, row_count, max_oid)
+                    return
+
+            AddMessage("  .. building the session index of {}".format(table_name))
+            self.connection.execute("DELETE FROM rows WHERE name = ?", (table_name,))
+            self.insertRows(table_name, self.readRows(table_name, table, None))
+            self.saveTable(table_name, row_count, max_oid)
+
+    def tableState(self, table):
+        # Returns the row count and largest objectid of a table
+        return int(arcpy.GetCount_management(table).getOutput(0)), MaxObjectID(table)
+
+    def readRows(self, table_name, table, after_oid):
+        # Yields the session, objectid and record id of the rows of a table,
+        # or only of the rows after after_oid
+        schema = GetSchema(table)
+        id_field = schema.id_field if table_name == "REVTABLEMAIN" else schema.link_field
+        whereClause = None
+        if after_oid is not None:
+            whereClause = "{} > {}".format(arcpy.AddFieldDelimiters(table, schema.oid_field), after_oid)
+
+        with arcpy.da.SearchCursor(table, ["SESSIONID", "OID@", id_field], whereClause) as cursor:
+            for row in cursor:
+                yield row
+
+    def insertRows(self, table_name, rows):
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append((table_name,) + tuple(row))
+            if len(batch) >= INDEX_BATCH_ROWS:
+                count += self.insertBatch(batch)
+                batch = []
+        return count + self.insertBatch(batch)
+
+    def insertBatch(self, batch):
+        self.connection.executemany("INSERT INTO rows VALUES (?, ?, ?, ?)", batch)
+        return len(batch)
+
+    def saveTable(self, table_name, row_count, max_oid):
+        self.connection.execute("INSERT OR REPLACE INTO tables VALUES (?, ?, ?)", (table_name, row_count, max_oid))
+
+    def sessionRows(self, table_name, sessionIDs):
+        self.refresh()
+        sessionIDs = [int(value) for value in sessionIDs]
+        sql = "SELECT oid, id FROM rows WHERE name = ? AND session IN ({})".format(
+            ", ".join("?" for value in sessionIDs) or "NULL")
+        return self.connection.execute(sql, [table_name] + sessionIDs)
+
+    def records(self, sessionIDs):
+        # Returns a dictionary of objectid: record id of the REVTABLEMAIN
+        # records of the sessions, the same as SampleRecords
+        return dict(self.sessionRows("REVTABLEMAIN", sessionIDs))
+
+    def geometryOIDs(self, table_name, sessionIDs):
+        # Returns the objectids of the rows of a geometry table in the
+        # sessions
+        return [oid for oid, link in self.sessionRows(table_name, sessionIDs)]
+
+# ----------------------------------------------------------------
+# Returns the largest objectid of a table, or None if it is empty
+# ----------------------------------------------------------------
+def MaxObjectID(table):
+    oid_field = arcpy.AddFieldDelimiters(table, GetSchema(table).oid_field)
+    with arcpy.da.SearchCursor(table, ["OID@"], sql_clause=(None, "ORDER BY {} DESC".format(oid_field))) as cursor:
+        for row in cursor:
+            return row[0]
+    return None
+
+# ------------------------------------------------------------------------------
+# Returns the session index of a workspace, or None if the workspace does not
+# have one.  The index is brought up to date when it is first read
+# ------------------------------------------------------------------------------
+def OpenSessionIndex(in_workspace):
+    if not os.path.exists(SessionIndexPath(in_workspace)):
+        return None
+    return SessionIndex(in_workspace)
+
+# ------------------------------------------------------------------------------
+# Builds or refreshes the session index of a workspace.  Can be called from
+# other scripts without the toolbox.
+#   in_workspace (str): path to the Reviewer workspace
+#   Rebuild (bool): build the index of every table again
+# Returns a dictionary with the path of the index and the number of rows
+# indexed in each table
+# ------------------------------------------------------------------------------
+def BuildSessionIndex(in_workspace, Rebuild=False):
+    getFullPath(in_workspace, "REVTABLEMAIN", True)
+
+    index = SessionIndex(in_workspace)
+    try:
+        if Rebuild:
+            with index.connection:
+                index.connection.execute("DELETE FROM tables")
+        index.refresh()
+
+        counts = dict(index.connection.execute("SELECT name, COUNT(*) FROM rows GROUP BY name").fetchall())
+        for table_name in sorted(counts):
+            AddMessage("{}: {} rows indexed".format(table_name, counts[table_name]))
+        return {"index": index.path, "tables": counts}
+    finally:
+        index.close()
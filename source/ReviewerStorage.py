@@ -0,0 +1,381 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Storage of Reviewer workspaces hosted in a GeoPackage or SQLite database.
+# SqliteBackend finds the Reviewer tables of the workspace, describes them,
+# reads, inserts and deletes rows and wraps a set of edits in a transaction
+# with the sqlite3 module, so it runs without arcpy, inserts rows with
+# executemany and can run set-based SQL on the workspace.  Geodatabase
+# workspaces are read and written with arcpy by the tools themselves.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import contextlib
+import os
+import re
+import sqlite3
+import struct
+import sys
+
+# arcpy is only used to write messages
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
+# Extensions of the files that can hold a SQLite hosted Reviewer workspace
+SQLITE_EXTENSIONS = ('.gpkg', '.sqlite', '.db')
+
+# First bytes of every SQLite database file
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+# Number of rows fetched or inserted with one call
+SQLITE_BATCH_ROWS = 10000
+
+# Text fields of the Reviewer tables that hold GUIDs
+GUID_FIELDS = ('ID', 'GLOBALID', 'CHECKRUNID', 'BATCHRUNID', 'LINKGUID')
+
+# Field type of each declared SQLite column type, by the first match
+SQLITE_FIELD_TYPES = (('SMALLINT', 'SmallInteger'),
+                      ('TINYINT', 'SmallInteger'),
+                      ('INT', 'Integer'),
+                      ('FLOAT', 'Single'),
+                      ('REAL', 'Double'),
+                      ('DOUB', 'Double'),
+                      ('DATE', 'Date'),
+                      ('BLOB', 'Blob'),
+                      ('GUID', 'Guid'),
+                      ('TEXT', 'String'),
+                      ('CHAR', 'String'),
+                      ('CLOB', 'String'))
+
+# Number of doubles in a GeoPackage geometry envelope by envelope indicator
+GPKG_ENVELOPE_SIZES = {0: 0, 1: 4, 2: 6, 3: 6, 4: 8}
+
+# --------------------------------------------------------------------
+# Writes a message with arcpy, or to stderr when arcpy is not installed
+# --------------------------------------------------------------------
+def AddMessage(message):
+    if arcpy is not None:
+        arcpy.AddMessage(message)
+    else:
+        sys.stderr.write("{}\n".format(message))
+
+def AddWarning(message):
+    if arcpy is not None:
+        arcpy.AddWarning(message)
+    else:
+        sys.stderr.write("WARNING: {}\n".format(message))
+
+def AddError(message):
+    if arcpy is not None:
+        arcpy.AddError(message)
+    else:
+        sys.stderr.write("ERROR: {}\n".format(message))
+
+# ------------------------------------------------------------------
+# Returns True if a workspace is a GeoPackage or SQLite database file
+# ------------------------------------------------------------------
+def IsSqliteWorkspace(workspace):
+    if os.path.splitext(workspace)[1].lower() not in SQLITE_EXTENSIONS or not os.path.isfile(workspace):
+        return False
+
+    with open(workspace, 'rb') as f:
+        return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+
+# ---------------------------------------------------------------------------
+# Reads the coordinates of a WKB geometry.  Returns the geometry type and a
+# list of parts, each a list of (x, y).  Z and M values are skipped
+# ---------------------------------------------------------------------------
+def ReadWKB(wkb, offset=0):
+    order = '<' if bytearray(wkb[offset:offset + 1])[0] == 1 else '>'
+    code = struct.unpack_from(order + 'I', wkb, offset + 1)[0]
+    offset += 5
+
+    # ISO codes add 1000 for Z, 2000 for M and 3000 for ZM, extended WKB
+    # sets the high bits
+    dims = 2
+    if code & 0x80000000:
+        dims += 1
+    if code & 0x40000000:
+        dims += 1
+    code &= 0x0FFFFFFF
+    dims += (code // 1000 == 3) + (code // 1000 in (1, 2, 3))
+    geometry_type = code % 1000
+    size = 8 * dims
+
+    def points(count, offset):
+        coords = [struct.unpack_from(order + 'dd', wkb, offset + i * size) for i in range(count)]
+        return coords, offset + count * size
+
+    parts = []
+    if geometry_type == 1:
+        coords, offset = points(1, offset)
+        parts.append(coords)
+    elif geometry_type == 2:
+        count = struct.unpack_from(order + 'I', wkb, offset)[0]
+        coords, offset = points(count, offset + 4)
+        parts.append(coords)
+    elif geometry_type == 3:
+        rings = struct.unpack_from(order + 'I', wkb, offset)[0]
+        offset += 4
+        for i in range(rings):
+            count = struct.unpack_from(order + 'I', wkb, offset)[0]
+            coords, offset = points(count, offset + 4)
+            parts.append(coords)
+    elif geometry_type in (4, 5, 6, 7):
+        count = struct.unpack_from(order + 'I', wkb, offset)[0]
+        offset += 4
+        for i in range(count):
+            member_type, member_parts, offset = ReadWKB(wkb, offset)
+            parts.extend(member_parts)
+    else:
+        raise ValueError("WKB geometry type {} is not supported".format(code))
+
+    return geometry_type, parts, offset
+
+# ---------------------------------------------------------------------------
+# Splits a GeoPackage geometry blob into (empty, envelope, WKB).  envelope is
+# (min x, max x, min y, max y) or None when the blob has no envelope
+# ---------------------------------------------------------------------------
+def ReadGeoPackageGeometry(blob):
+    blob = bytes(blob)
+    if blob[:2] != b'GP':
+        return False, None, blob
+
+    flags = bytearray(blob[3:4])[0]
+    order = '<' if flags & 1 else '>'
+    empty = bool(flags & 0x10)
+    doubles = GPKG_ENVELOPE_SIZES.get((flags >> 1) & 7, 0)
+
+    envelope = None
+    if doubles:
+        envelope = struct.unpack_from(order + 'dddd', blob, 8)
+
+    return empty, envelope, blob[8 + 8 * doubles:]
+
+# ------------------------------------------------------------------
+# Returns the envelope (min x, max x, min y, max y) of a geometry blob
+# ------------------------------------------------------------------
+def GeometryEnvelope(blob):
+    empty, envelope, wkb = ReadGeoPackageGeometry(blob)
+    if envelope is not None or empty:
+        return envelope
+
+    geometry_type, parts, offset = ReadWKB(wkb)
+    xs = [x for part in parts for x, y in part]
+    ys = [y for part in parts for x, y in part]
+    if not xs:
+        return None
+    return min(xs), max(xs), min(ys), max(ys)
+
+# ---------------------------------------------------------------------------
+# Returns the representative point of a geometry blob as (x, y).  Points use
+# their first vertex, other geometries the centre of their envelope
+# ---------------------------------------------------------------------------
+def GeometryPoint(blob):
+    if blob is None:
+        return None
+
+    empty, envelope, wkb = ReadGeoPackageGeometry(blob)
+    if empty:
+        return None
+
+    geometry_type, parts, offset = ReadWKB(wkb)
+    if geometry_type in (1, 4) and parts:
+        return parts[0][0]
+
+    if envelope is None:
+        envelope = GeometryEnvelope(blob)
+    if envelope is None:
+        return None
+    return (envelope[0] + envelope[1]) / 2.0, (envelope[2] + envelope[3]) / 2.0
+
+# ------------------------------------------------------------------------------
+# Field names, types and keys of a table in a SQLite hosted workspace, with
+# the same attributes as the TableSchema of a geodatabase table
+# ------------------------------------------------------------------------------
+class SqliteSchema(object):
+
+    def __init__(self, connection, table):
+        self.path = table
+        self.fields = []
+        self.types = {}
+        self.lengths = {}
+        self.oid_field = None
+        self.shape_field = None
+        self.can_version = False
+        self.is_versioned = False
+        self.spatial_reference = None
+
+        # The geometry column of a GeoPackage feature table
+        try:
+            row = connection.execute("SELECT column_name, srs_id FROM gpkg_geometry_columns "
+                                     "WHERE lower(table_name) = lower(?)", (table,)).fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        if row is not None:
+            self.shape_field, self.spatial_reference = row
+
+        for cid, name, declared, notnull, default, pk in connection.execute('PRAGMA table_info("{}")'.format(table)):
+            self.fields.append(name)
+            declared = (declared or '').upper()
+            match = re.search(r'\((\d+)\)', declared)
+            self.lengths[name] = int(match.group(1)) if match else None
+
+            if pk:
+                field_type = 'OID'
+                self.oid_field = name
+            elif self.shape_field is not None and name.upper() == self.shape_field.upper():
+                field_type = 'Geometry'
+            else:
+                field_type = 'String'
+                for prefix, value in SQLITE_FIELD_TYPES:
+                    if prefix in declared:
+                        field_type = value
+                        break
+                if field_type == 'String' and name.upper() in GUID_FIELDS:
+                    field_type = 'Guid'
+            self.types[name] = field_type
+
+        self.names = dict((name.upper(), name) for name in self.fields)
+
+        # REVTABLEMAIN record id, ID at 10.6 and RECORDID before
+        self.id_field = 'ID' if self.has('ID') else 'RECORDID'
+        # run table GUID, GLOBALID before 10.6 and ID at 10.6
+        self.guid_field = 'GLOBALID' if self.has('GLOBALID') else 'ID'
+        # geometry table link to REVTABLEMAIN
+        self.link_field = 'LINKID' if self.has('LINKID') else 'LINKGUID'
+
+    def has(self, name):
+        return name.upper() in self.names
+
+    def field_type(self, name):
+        return self.types.get(self.names.get(name.upper()))
+
+    def versioned(self):
+        return False
+
+# ---------------------------------------------------------------------------
+# Reviewer workspaces hosted in a GeoPackage or SQLite database.  Geometries
+# are GeoPackage geometry blobs and are read and written as they are stored.
+# The ST_ functions used by the GeoPackage spatial index triggers are
+# registered on the connection, so the index is kept up to date.  Tables are
+# passed as the path returned by fullPath, and fields may use the OID@ and
+# SHAPE@ tokens of arcpy cursors
+# ---------------------------------------------------------------------------
+class SqliteBackend(object):
+
+    def __init__(self, workspace):
+        self.workspace = workspace
+        self.connection = sqlite3.connect(workspace, isolation_level=None)
+        self.schemas = {}
+        self.tables = dict((row[0].upper(), row[0]) for row in self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"))
+
+        self.connection.create_function("ST_IsEmpty", 1, lambda blob: ReadGeoPackageGeometry(blob)[0] if blob else 1)
+        for name, index in (("ST_MinX", 0), ("ST_MaxX", 1), ("ST_MinY", 2), ("ST_MaxY", 3)):
+            self.connection.create_function(name, 1, self.envelopeFunction(index))
+
+    @staticmethod
+    def envelopeFunction(index):
+        def function(blob):
+            envelope = GeometryEnvelope(blob) if blob else None
+            return envelope[index] if envelope else None
+        return function
+
+    def fullPath(self, table_name):
+        return self.tables.get(table_name.upper(), '')
+
+    def schema(self, table):
+        if table not in self.schemas:
+            self.schemas[table] = SqliteSchema(self.connection, table)
+        return self.schemas[table]
+
+    # Quotes a field name, replacing the arcpy cursor tokens
+    def column(self, table, field):
+        schema = self.schema(table)
+        if field == "OID@":
+            return '"{}"'.format(schema.oid_field)
+        if field.startswith("SHAPE@"):
+            return '"{}"'.format(schema.shape_field)
+        return '"{}"'.format(field)
+
+    def search(self, table, fields, whereClause='', parameters=()):
+        sql = 'SELECT {} FROM "{}"'.format(", ".join(self.column(table, field) for field in fields), table)
+        if whereClause:
+            sql += " WHERE " + whereClause
+
+        cursor = self.connection.execute(sql, parameters)
+        while True:
+            rows = cursor.fetchmany(SQLITE_BATCH_ROWS)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+
+    def insert(self, table, fields, rows):
+        sql = 'INSERT INTO "{}" ({}) VALUES ({})'.format(
+            table, ", ".join(self.column(table, field) for field in fields), ", ".join("?" * len(fields)))
+
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(tuple(row))
+            if len(batch) >= SQLITE_BATCH_ROWS:
+                self.connection.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.connection.executemany(sql, batch)
+            count += len(batch)
+        return count
+
+    def delete(self, table, field, values):
+        sql = 'DELETE FROM "{}" WHERE {} = ?'.format(table, self.column(table, field))
+        before = self.connection.total_changes
+        self.connection.executemany(sql, [(value,) for value in values])
+        return self.connection.total_changes - before
+
+    def count(self, table, whereClause='', parameters=()):
+        sql = 'SELECT COUNT(*) FROM "{}"'.format(table)
+        if whereClause:
+            sql += " WHERE " + whereClause
+        return self.connection.execute(sql, parameters).fetchone()[0]
+
+    # Runs a statement and returns the number of rows it changed
+    def execute(self, sql, parameters=()):
+        return self.connection.execute(sql, parameters).rowcount
+
+    @contextlib.contextmanager
+    def transaction(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def close(self):
+        self.connection.close()
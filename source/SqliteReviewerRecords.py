@@ -0,0 +1,297 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Copies, moves and exports reviewer records in Reviewer workspaces hosted in
+# a GeoPackage or SQLite database, without arcpy.  A copy runs as set-based
+# INSERT ... SELECT statements in one transaction.  The input database is
+# attached to the output database, new GUIDs are made for the records, check
+# runs and batch runs in temporary mapping tables, and the rows are copied
+# through those tables without being read into Python.  Moving records, copy
+# logs and verification need arcpy and are done by CopyRecords.  Only 10.6
+# and later Reviewer schemas, with GUID record ids, are supported.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import csv
+import os
+import sys
+import uuid
+
+from ReviewerStorage import SqliteBackend, GeometryPoint, AddMessage, AddError, AddWarning
+
+# Reviewer geometry and location tables, copied by their link to REVTABLEMAIN
+LINKED_TABLES = ("REVTABLEPOINT", "REVTABLELINE", "REVTABLEPOLY", "REVTABLELOCATION")
+
+# Temporary tables mapping the input ids to the new output ids
+MAPPING_TABLES = ("copy_records", "copy_checkruns", "copy_batchruns")
+
+# ------------------------------------------------------------
+# Returns a new GUID in the Reviewer format
+# ------------------------------------------------------------
+def NewGUID():
+    return '{' + str(uuid.uuid4()).upper() + '}'
+
+# ------------------------------------------------------------------------------
+# Makes the INSERT ... SELECT statement copying the rows of a table.  Each
+# output field, other than the objectid, is selected from the field of the
+# same name unless it is in expressions, a dictionary of output field: SQL
+# expression.  src is the name of the attached input database and the input
+# rows are aliased as src_row
+# ------------------------------------------------------------------------------
+def InsertSelect(src, inSchema, inTable, outSchema, outTable, expressions, fromClause):
+    fields = []
+    values = []
+    for name in outSchema.fields:
+        if outSchema.types[name] == 'OID':
+            continue
+        if name.upper() in expressions:
+            fields.append(name)
+            values.append(expressions[name.upper()])
+        elif inSchema.has(name):
+            fields.append(name)
+            values.append('src_row."{}"'.format(inSchema.names[name.upper()]))
+
+    return 'INSERT INTO main."{}" ({}) SELECT {} FROM {}."{}" AS src_row {}'.format(
+        outTable, ", ".join('"{}"'.format(name) for name in fields), ", ".join(values),
+        src, inTable, fromClause)
+
+# ------------------------------------------------------------------------------
+# Copies the records from the selected sessions into a session of the output
+# workspace, both hosted in GeoPackage or SQLite databases.  Takes the
+# arguments of CopyRecords used by a copy and returns a dictionary of table name: number of
+# records copied, or None if the copy failed.  RecordClause is SQLite SQL on
+# the REVTABLEMAIN fields.
+# ------------------------------------------------------------------------------
+def CopyRecordsSql(Reviewer_Workspace, SessionsList, Out_Reviewer_Workspace, Out_Exist_Session, RecordClause='',
+                   SkipAttachments=False):
+
+    backend = SqliteBackend(Out_Reviewer_Workspace)
+    inBackend = backend
+    try:
+        # The input tables are read through the output connection.  The same
+        # database is used directly
+        if os.path.abspath(Reviewer_Workspace) == os.path.abspath(Out_Reviewer_Workspace):
+            src = "main"
+        else:
+            src = "src"
+            backend.execute("ATTACH DATABASE ? AS src", (Reviewer_Workspace,))
+            inBackend = SqliteBackend(Reviewer_Workspace)
+
+        backend.connection.create_function("NEWGUID", 0, NewGUID)
+
+        REVTABLEMAIN = inBackend.fullPath("REVTABLEMAIN")
+        Out_REVTABLEMAIN = backend.fullPath("REVTABLEMAIN")
+        if REVTABLEMAIN == '' or Out_REVTABLEMAIN == '':
+            AddError("{} and {} must both be Reviewer workspaces.".format(Reviewer_Workspace, Out_Reviewer_Workspace))
+            return None
+
+        in_schema = inBackend.schema(REVTABLEMAIN)
+        out_schema = backend.schema(Out_REVTABLEMAIN)
+        if not in_schema.has('ID') or not out_schema.has('ID'):
+            AddError("Only 10.6 and later Reviewer workspaces can be copied without arcpy.")
+            return None
+
+        # --- Sessions ---
+        SessionsTable = inBackend.fullPath("REVSESSIONTABLE")
+        sessionIDs = [row[0] for row in inBackend.search(SessionsTable, ["SESSIONID", "SESSIONNAME"])
+                      if row[1] in SessionsList]
+        if not sessionIDs:
+            AddError("None of the sessions {} are in {}".format(", ".join(SessionsList), Reviewer_Workspace))
+            return None
+
+        outSessions = [row[0] for row in backend.search(backend.fullPath("REVSESSIONTABLE"),
+                                                        ["SESSIONID", "SESSIONNAME"])
+                       if row[1] == Out_Exist_Session]
+        if not outSessions:
+            AddError("Session {} is not in {}".format(Out_Exist_Session, Out_Reviewer_Workspace))
+            return None
+        OutSessionID = outSessions[0]
+        AddMessage("Output Reviewer Session id is {0}".format(OutSessionID))
+
+        SessionClause = '"SESSIONID" IN ({})'.format(", ".join(str(int(value)) for value in sessionIDs))
+        WhereClause = SessionClause
+        if RecordClause:
+            WhereClause = "{} AND ({})".format(SessionClause, RecordClause)
+
+        summarydict = {}
+        with backend.transaction():
+            for name in MAPPING_TABLES:
+                backend.execute('DROP TABLE IF EXISTS temp."{}"'.format(name))
+                backend.execute('CREATE TEMP TABLE "{}" (old PRIMARY KEY, new)'.format(name))
+
+            # --- New ids of the records, check runs and batch runs ---
+            backend.execute('INSERT INTO temp.copy_records SELECT "ID", NEWGUID() FROM {}."{}" WHERE {}'.format(
+                src, REVTABLEMAIN, WhereClause))
+
+            REVCHECKRUN = inBackend.fullPath("REVCHECKRUNTABLE")
+            REVBATCHRUN = inBackend.fullPath("REVBATCHRUNTABLE")
+            Out_REVCHECKRUN = backend.fullPath("REVCHECKRUNTABLE")
+            Out_REVBATCHRUN = backend.fullPath("REVBATCHRUNTABLE")
+            runTables = '' not in (REVCHECKRUN, REVBATCHRUN, Out_REVCHECKRUN, Out_REVBATCHRUN)
+
+            # The check runs of the copied records and the check runs of the
+            # sessions that did not return errors
+            checkRuns = 'SELECT "CHECKRUNID" FROM {}."{}" WHERE {} AND "CHECKRUNID" IS NOT NULL'.format(
+                src, REVTABLEMAIN, WhereClause)
+            if runTables:
+                checkRuns += ' UNION SELECT "CHECKRUNID" FROM {}."{}" WHERE {}'.format(src, REVCHECKRUN, SessionClause)
+            backend.execute('INSERT INTO temp.copy_checkruns SELECT "CHECKRUNID", NEWGUID() FROM ({})'.format(checkRuns))
+
+            # --- REVTABLEMAIN ---
+            AddMessage("Copying RevTableMain Records")
+            summarydict["REVTABLEMAIN"] = backend.execute(InsertSelect(
+                src, in_schema, REVTABLEMAIN, out_schema, Out_REVTABLEMAIN,
+                {"ID": "map.new", "SESSIONID": str(int(OutSessionID)),
+                 "CHECKRUNID": 'checkrun.new'},
+                'JOIN temp.copy_records AS map ON src_row."ID" = map.old '
+                'LEFT JOIN temp.copy_checkruns AS checkrun ON src_row."CHECKRUNID" = checkrun.old'))
+
+            # --- Geometry and location tables ---
+            for table_name in LINKED_TABLES:
+                if table_name == "REVTABLELOCATION" and SkipAttachments:
+                    AddMessage("Skipping Location Records")
+                    continue
+
+                inTable = inBackend.fullPath(table_name)
+                outTable = backend.fullPath(table_name)
+                if inTable == '' or outTable == '':
+                    continue
+
+                AddMessage("Copying {} Records".format(table_name))
+                table_in_schema = inBackend.schema(inTable)
+                table_out_schema = backend.schema(outTable)
+                summarydict[table_name] = backend.execute(InsertSelect(
+                    src, table_in_schema, inTable, table_out_schema, outTable,
+                    {table_out_schema.link_field: "map.new", "SESSIONID": str(int(OutSessionID))},
+                    'JOIN temp.copy_records AS map ON src_row."{}" = map.old'.format(table_in_schema.link_field)))
+
+            # --- Batch runs of the copied check runs, then the check runs ---
+            if runTables:
+                batch_in_schema = inBackend.schema(REVBATCHRUN)
+                batch_out_schema = backend.schema(Out_REVBATCHRUN)
+                check_in_schema = inBackend.schema(REVCHECKRUN)
+                check_out_schema = backend.schema(Out_REVCHECKRUN)
+
+                backend.execute('INSERT INTO temp.copy_batchruns SELECT "BATCHRUNID", NEWGUID() FROM '
+                                '(SELECT DISTINCT "BATCHRUNID" FROM {}."{}" WHERE "CHECKRUNID" IN '
+                                '(SELECT old FROM temp.copy_checkruns) AND "BATCHRUNID" IS NOT NULL)'.format(
+                                    src, REVCHECKRUN))
+
+                AddMessage("Copying Batch Job Records")
+                summarydict["REVBATCHRUNTABLE"] = backend.execute(InsertSelect(
+                    src, batch_in_schema, REVBATCHRUN, batch_out_schema, Out_REVBATCHRUN,
+                    {batch_out_schema.guid_field: "map.new"},
+                    'JOIN temp.copy_batchruns AS map ON src_row."{}" = map.old'.format(batch_in_schema.guid_field)))
+
+                expressions = {"CHECKRUNID": "map.new", "SESSIONID": str(int(OutSessionID)),
+                               "BATCHRUNID": 'COALESCE(batchrun.new, src_row."BATCHRUNID")'}
+                if SkipAttachments:
+                    expressions["CHECKRUNPROPERTIES"] = "X''"
+                summarydict["REVCHECKRUNTABLE"] = backend.execute(InsertSelect(
+                    src, check_in_schema, REVCHECKRUN, check_out_schema, Out_REVCHECKRUN, expressions,
+                    'JOIN temp.copy_checkruns AS map ON src_row."CHECKRUNID" = map.old '
+                    'LEFT JOIN temp.copy_batchruns AS batchrun ON src_row."BATCHRUNID" = batchrun.old '
+                    'WHERE src_row.{}'.format(SessionClause)))
+            else:
+                AddWarning("Unable to identify REVCHECKRUNTABLE or REVBATCHRUNTABLE in Reviewer Workspace "
+                           " No records from these tables will be copied.")
+
+        for table_name, count in sorted(summarydict.items()):
+            AddMessage("Total Records from {}: {}".format(table_name, count))
+
+        return summarydict
+
+    finally:
+        if inBackend is not backend:
+            inBackend.close()
+        backend.close()
+
+# ------------------------------------------------------------------------------
+# Exports the records of the selected sessions to a CSV file with the X and Y
+# of the representative point of each geometry.  Points use their first
+# vertex and lines and polygons the centre of their envelope.  Records with
+# more than one geometry are written once per geometry and records without
+# geometry have no X and Y.  Returns a dictionary with the number of records
+# written, or None if the export failed
+# ------------------------------------------------------------------------------
+def ExportRecordsSql(ReviewerWorkspace, SessionsList, FieldsList, OutCsv):
+    if os.path.exists(OutCsv):
+        AddError("Output {} already exists.".format(OutCsv))
+        return None
+
+    backend = SqliteBackend(ReviewerWorkspace)
+    try:
+        REVTABLEMAIN = backend.fullPath("REVTABLEMAIN")
+        schema = backend.schema(REVTABLEMAIN)
+        fields = [schema.names[name.upper()] for name in FieldsList
+                  if schema.has(name) and schema.field_type(name) not in ('Blob', 'Geometry')]
+
+        sessionIDs = [row[0] for row in backend.search(backend.fullPath("REVSESSIONTABLE"),
+                                                       ["SESSIONID", "SESSIONNAME"])
+                      if row[1] in SessionsList]
+        SessionClause = 'm."SESSIONID" IN ({})'.format(", ".join(str(int(value)) for value in sessionIDs) or "NULL")
+
+        # Each record joined to each of its geometries, in one statement
+        geometries = []
+        for table_name in ("REVTABLEPOINT", "REVTABLELINE", "REVTABLEPOLY"):
+            table = backend.fullPath(table_name)
+            if table != '':
+                table_schema = backend.schema(table)
+                geometries.append('SELECT "{}" AS link, "{}" AS shape FROM "{}"'.format(
+                    table_schema.link_field, table_schema.shape_field, table))
+        if not geometries:
+            geometries.append("SELECT NULL AS link, NULL AS shape")
+
+        sql = ('SELECT {}, g.shape FROM "{}" AS m LEFT JOIN ({}) AS g ON g.link = m."{}" WHERE {}'.format(
+            ", ".join('m."{}"'.format(name) for name in fields), REVTABLEMAIN, " UNION ALL ".join(geometries),
+            schema.id_field, SessionClause))
+
+        folder = os.path.dirname(OutCsv)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        if sys.version_info[0] < 3:
+            f = open(OutCsv, "wb")
+        else:
+            f = open(OutCsv, "w", newline='', encoding="utf-8")
+
+        count = 0
+        with f:
+            writer = csv.writer(f)
+            writer.writerow(fields + ["POINT_X", "POINT_Y"])
+
+            cursor = backend.connection.execute(sql)
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    point = GeometryPoint(row[-1])
+                    writer.writerow(list(row[:-1]) + (list(point) if point else ['', '']))
+                    count += 1
+
+        AddMessage("\nTotal Errors Exported: {}".format(count))
+        return {"total": count, "outputs": {OutCsv: count}}
+
+    finally:
+        backend.close()
@@ -0,0 +1,201 @@
+# ---------------------------------------------------------------------------
+# Created By: The ArcGIS Data Reviewer Team
+
+# Copyright 2020 Esri
+
+# Licensed under the Apache License, Version 2.0 (the "License"); You
+# may not use this file except in compliance with the License. You may
+# obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+# A copy of the license is available in the repository's
+# LICENSE file.
+
+# Description:
+# Summarizes the reviewer errors in the selected Reviewer workspace sessions
+# instead of exporting each of them.  The number of records is counted for
+# each combination of session, origin table, origin check, severity,
+# lifecycle status and reviewer, together with the earliest and latest
+# review, correction and verification dates.  REVTABLEMAIN is read once,
+# without geometries, and only the totals of each group are kept.  The
+# summary is written to a geodatabase table, a .dbf table or a .csv file.
+
+# Minimum ArcGIS Version: 10.6
+# Last Modified: 11/27/2019
+# ---------------------------------------------------------------------------
+
+# Import necessary modules
+import arcpy
+import csv
+import os
+import sys
+
+from CopyDataReviewerRecords import getFullPath, GetSchema, RunTool
+from ReviewerRecordStream import GetSessionIDs, MakeSessionClause
+from ReviewerRecordSinks import ADD_FIELD_TYPES, GUID_LENGTH, RENAME_FIELDS, NEW_NAMES, CsvValue
+
+# REVTABLEMAIN fields the records are grouped by
+SUMMARY_FIELDS = ("SESSIONID", "ORIGINTABLE", "ORIGINCHECK", "SEVERITY", "LIFECYCLESTATUS", "REVIEWTECHNICIAN")
+
+# Date fields summarized and the names of their earliest and latest columns
+SUMMARY_DATE_FIELDS = (("REVIEWDATE", "MINREVDATE", "MAXREVDATE"),
+                       ("CORRECTIONDATE", "MINCORDATE", "MAXCORDATE"),
+                       ("VERIFICATIONDATE", "MINVERDATE", "MAXVERDATE"))
+
+# -------------------------------------------------------------------
+# Reads REVTABLEMAIN once and returns a dictionary of group values:
+# [record count, earliest date, latest date, ...] for each group
+# -------------------------------------------------------------------
+def SummarizeTable(REVTABLEMAIN, groupFields, dateFields, whereClause):
+    groups = {}
+    size = len(groupFields)
+
+    with arcpy.da.SearchCursor(REVTABLEMAIN, list(groupFields) + list(dateFields), whereClause) as cursor:
+        for row in cursor:
+            key = row[:size]
+            totals = groups.get(key)
+            if totals is None:
+                totals = [0] + [None] * (2 * len(dateFields))
+                groups[key] = totals
+
+            totals[0] += 1
+            for i, value in enumerate(row[size:]):
+                if value is None:
+                    continue
+                if totals[2 * i + 1] is None or value < totals[2 * i + 1]:
+                    totals[2 * i + 1] = value
+                if totals[2 * i + 2] is None or value > totals[2 * i + 2]:
+                    totals[2 * i + 2] = value
+
+    return groups
+
+# ---------------------------------------------------------------
+# Writes the summary rows to a .csv file
+# ---------------------------------------------------------------
+def WriteCsv(OutTable, names, rows):
+    if sys.version_info[0] < 3:
+        f = open(OutTable, "wb")
+    else:
+        f = open(OutTable, "w", newline='', encoding="utf-8")
+
+    with f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        for row in rows:
+            writer.writerow([CsvValue(value) for value in row])
+
+# ---------------------------------------------------------------
+# Writes the summary rows to a geodatabase or .dbf table
+# ---------------------------------------------------------------
+def WriteTable(OutTable, names, types, lengths, rows):
+    folder, name = os.path.split(OutTable)
+    arcpy.CreateTable_management(folder, name)
+
+    for field_name, field_type, length in zip(names, types, lengths):
+        if field_type == 'TEXT':
+            arcpy.AddField_management(OutTable, field_name, field_type, field_length=length)
+        else:
+            arcpy.AddField_management(OutTable, field_name, field_type)
+
+    with arcpy.da.InsertCursor(OutTable, names) as cursor:
+        for row in rows:
+            cursor.insertRow(row)
+
+# ------------------------------------------------------------------------------
+# Summarizes the records of the selected sessions into a table.  Can be called
+# from other scripts without the toolbox.
+#   ReviewerWorkspace (str): path to the Reviewer workspace
+#   SessionsList (list of str): names of the sessions to summarize
+#   OutTable (str): output geodatabase table, .dbf or .csv file
+#   GroupFields (list of str): REVTABLEMAIN fields to group the records by
+# Returns a dictionary with the number of records and groups, or None if the
+# summary failed
+# ------------------------------------------------------------------------------
+def SummarizeRecords(ReviewerWorkspace, SessionsList, OutTable, GroupFields=SUMMARY_FIELDS):
+
+    if arcpy.Exists(OutTable) or os.path.exists(OutTable):
+        arcpy.AddError("Output {} already exists.".format(OutTable))
+        return None
+
+    REVTABLEMAIN = getFullPath(ReviewerWorkspace, "REVTABLEMAIN", True)
+    SessionsTable = getFullPath(ReviewerWorkspace, "REVSESSIONTABLE", True)
+    schema = GetSchema(REVTABLEMAIN)
+
+    sessions, rowcount = GetSessionIDs(SessionsTable, [value.strip("'") for value in SessionsList])
+    SessionClause = MakeSessionClause(SessionsTable, sessions.keys(), rowcount)
+
+    # Fields missing from older Reviewer workspaces are left out
+    groupFields = []
+    for name in GroupFields:
+        if schema.field_type(name) in ADD_FIELD_TYPES:
+            groupFields.append(schema.names[name.upper()])
+        else:
+            arcpy.AddWarning("{} is not a field of {}.  Records will not be grouped by it.".format(name, REVTABLEMAIN))
+    dateFields = [entry for entry in SUMMARY_DATE_FIELDS if schema.has(entry[0])]
+
+    groups = SummarizeTable(REVTABLEMAIN, groupFields, [entry[0] for entry in dateFields], SessionClause)
+
+    # A session name column follows the session id
+    sessionIndex = groupFields.index("SESSIONID") + 1 if "SESSIONID" in groupFields else None
+
+    dbf = OutTable.lower().endswith(".dbf")
+    names = []
+    types = []
+    lengths = []
+    for name in groupFields:
+        names.append(NEW_NAMES[RENAME_FIELDS.index(name)] if dbf and name in RENAME_FIELDS else name)
+        types.append(ADD_FIELD_TYPES[schema.types[name]])
+        lengths.append(GUID_LENGTH if schema.types[name] in ('Guid', 'GlobalID') else schema.lengths[name])
+    if sessionIndex is not None:
+        names.insert(sessionIndex, "SESSNAME" if dbf else "SESSIONNAME")
+        types.insert(sessionIndex, 'TEXT')
+        lengths.insert(sessionIndex, 255)
+    names.append("RECORDS")
+    types.append('LONG')
+    lengths.append(None)
+    for field, minName, maxName in dateFields:
+        names += [minName, maxName]
+        types += ['DATE', 'DATE']
+        lengths += [None, None]
+
+    rows = []
+    for key in sorted(groups, key=lambda k: tuple((value is None, value) for value in k)):
+        row = list(key)
+        if sessionIndex is not None:
+            row.insert(sessionIndex, sessions.get(key[sessionIndex - 1]))
+        rows.append(row + groups[key])
+
+    if OutTable.lower().endswith(".csv"):
+        WriteCsv(OutTable, names, rows)
+    else:
+        WriteTable(OutTable, names, types, lengths, rows)
+
+    TotalErrors = sum(totals[0] for totals in groups.values())
+    arcpy.AddMessage("Summarized {} records into {} groups in {}".format(TotalErrors, len(groups), OutTable))
+
+    return {"records": TotalErrors, "groups": len(groups), "table": OutTable}
+
+def main():
+
+    # Script arguments
+    ReviewerWorkspace = arcpy.GetParameterAsText(0)
+    Sessions = arcpy.GetParameterAsText(1)
+    OutTable = arcpy.GetParameterAsText(2)
+    Fields = arcpy.GetParameterAsText(3)
+
+    SessionsList = Sessions.split(";")
+
+    GroupFields = SUMMARY_FIELDS
+    if Fields:
+        GroupFields = Fields.split(";")
+
+    SummarizeRecords(ReviewerWorkspace, SessionsList, OutTable, GroupFields)
+
+if __name__ == '__main__':
+    RunTool(main)
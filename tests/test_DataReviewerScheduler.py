@@ -0,0 +1,138 @@
+# ---------------------------------------------------------------------------
+# Tests of the workspace locks and worker processes of the scheduler.  Does
+# not need arcpy.  The worker tests replace RunJob before the worker
+# processes are forked, so they only run where processes are forked
+# ---------------------------------------------------------------------------
+import multiprocessing
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+import DataReviewerScheduler
+
+FORK = "fork" in multiprocessing.get_all_start_methods()
+
+
+def CopyJob(job_id, in_workspace, out_workspace, **options):
+    job = {"id": job_id, "command": "copy", "in_workspace": in_workspace, "out_workspace": out_workspace,
+           "out_session": "Session 1", "sessions": "Session 1"}
+    job.update(options)
+    return job
+
+
+def Entry(job):
+    writes, connections = DataReviewerScheduler.JobResources(job)
+    return {"job": job, "writes": writes, "connections": connections}
+
+
+def SleepingJob(argv):
+    time.sleep(60)
+
+
+def DyingJob(argv):
+    os._exit(3)
+
+
+def RecordingJob(argv):
+    return {"status": "ok", "result": argv[-1], "error": None, "finished": time.time()}
+
+
+class ResourceLocksTest(unittest.TestCase):
+
+    def test_jobs_writing_one_workspace_wait(self):
+        locks = DataReviewerScheduler.ResourceLocks(per_connection=5)
+        first = Entry(CopyJob("1", "in1.gdb", "out.gdb"))
+        second = Entry(CopyJob("2", "in2.gdb", "out.gdb"))
+        other = Entry(CopyJob("3", "in3.gdb", "other.gdb"))
+
+        locks.acquire(first)
+        self.assertFalse(locks.free(second))
+        self.assertTrue(locks.free(other))
+
+        locks.release(first)
+        self.assertTrue(locks.free(second))
+
+    def test_delete_locks_the_input_workspace(self):
+        locks = DataReviewerScheduler.ResourceLocks(per_connection=5)
+        locks.acquire(Entry(CopyJob("1", "in.gdb", "out1.gdb", delete=True)))
+
+        self.assertFalse(locks.free(Entry(CopyJob("2", "other.gdb", "in.gdb"))))
+
+    def test_connections_are_limited(self):
+        locks = DataReviewerScheduler.ResourceLocks(per_connection=2)
+        locks.acquire(Entry(CopyJob("1", "in.sde", "out1.gdb")))
+        locks.acquire(Entry(CopyJob("2", "in.sde", "out2.gdb")))
+
+        self.assertFalse(locks.free(Entry(CopyJob("3", "in.sde", "out3.gdb"))))
+
+        locks.release(Entry(CopyJob("1", "in.sde", "out1.gdb")))
+        self.assertTrue(locks.free(Entry(CopyJob("3", "in.sde", "out3.gdb"))))
+
+    def test_plan_jobs_do_not_lock(self):
+        locks = DataReviewerScheduler.ResourceLocks()
+        locks.acquire(Entry(CopyJob("1", "in.gdb", "out.gdb", plan=True)))
+
+        self.assertEqual(locks.locked, set())
+
+
+@unittest.skipUnless(FORK, "worker processes are not forked")
+class RunJobsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.runJob = DataReviewerScheduler.RunJob
+        self.start = multiprocessing.get_start_method(allow_none=True)
+        multiprocessing.set_start_method("fork", force=True)
+
+    def tearDown(self):
+        DataReviewerScheduler.RunJob = self.runJob
+        multiprocessing.set_start_method(self.start, force=True)
+
+    def test_timed_out_job_keeps_its_lock_until_stopped(self):
+        DataReviewerScheduler.RunJob = SleepingJob
+        start = time.time()
+
+        results = DataReviewerScheduler.RunJobs([CopyJob("1", "in.gdb", "out.gdb")], workers=2, retry_delay=0,
+                                                job_timeout=1)
+
+        self.assertTrue(results["1"]["timeout"])
+        self.assertEqual(results["1"]["attempts"], 1)
+        self.assertLess(time.time() - start, 30)
+
+    def test_job_waits_for_the_timed_out_worker(self):
+        DataReviewerScheduler.RunJob = SleepingJob
+        jobs = [CopyJob("1", "in.gdb", "out.gdb"), CopyJob("2", "in2.gdb", "out.gdb", retries=0)]
+        start = time.time()
+
+        results = DataReviewerScheduler.RunJobs(jobs, workers=2, retry_delay=0, job_timeout=1)
+
+        # the second job only started once the first worker was stopped
+        self.assertTrue(results["2"]["timeout"])
+        self.assertGreaterEqual(time.time() - start, 2)
+
+    def test_dead_worker_fails_its_job_at_once(self):
+        DataReviewerScheduler.RunJob = DyingJob
+        start = time.time()
+
+        results = DataReviewerScheduler.RunJobs([CopyJob("1", "in.gdb", "out.gdb", retries=1)], workers=1,
+                                                retry_delay=0, job_timeout=600)
+
+        self.assertEqual(results["1"]["status"], "error")
+        self.assertIn("exited with code 3", results["1"]["error"])
+        self.assertEqual(results["1"]["attempts"], 2)
+        self.assertLess(time.time() - start, 30)
+
+    def test_jobs_finish(self):
+        DataReviewerScheduler.RunJob = RecordingJob
+        jobs = [CopyJob(str(i), "in.gdb", "out{}.gdb".format(i)) for i in range(4)]
+
+        results = DataReviewerScheduler.RunJobs(jobs, workers=2, per_connection=1, retry_delay=0)
+
+        self.assertEqual(sorted(results), ["0", "1", "2", "3"])
+        self.assertTrue(all(result["status"] == "ok" for result in results.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
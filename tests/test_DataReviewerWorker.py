@@ -0,0 +1,93 @@
+# ---------------------------------------------------------------------------
+# Tests of the replies of the worker to jobs that fail.  Does not need arcpy
+# ---------------------------------------------------------------------------
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+import DataReviewerWorker
+
+
+# Stands in for the metadata cache of CopyDataReviewerRecords
+class MetadataCache(object):
+    METADATA_CACHE = {}
+
+    def __init__(self):
+        self.refreshed = []
+
+    def RefreshMetadataCache(self, *workspaces):
+        self.refreshed.append(workspaces)
+
+    def ClearMetadataCache(self):
+        self.METADATA_CACHE.clear()
+
+
+def FailingTool(**kwargs):
+    raise ValueError("Reviewer workspace {} is not valid".format(kwargs["Reviewer_Workspace"]))
+
+
+def ExitingTool(**kwargs):
+    sys.exit(1)
+
+
+class RunJobTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = MetadataCache()
+        self.stats = {"jobs": 0, "failedJobs": 0, "jobSeconds": 0.0}
+        self.tools = {"copy": FailingTool, "export": ExitingTool, "summary": lambda **kwargs: None}
+
+    def run_job(self, job):
+        return DataReviewerWorker.RunJob(job, self.tools, self.stats, self.cache)
+
+    def test_invalid_argv_is_an_error_reply(self):
+        reply = self.run_job({"id": 1, "argv": ["export"]})
+
+        self.assertEqual(reply["id"], 1)
+        self.assertEqual(reply["status"], "error")
+        self.assertIn("the following arguments are required", reply["error"])
+        self.assertIn("messages", reply)
+
+    def test_unknown_argv_command_is_an_error_reply(self):
+        reply = self.run_job({"argv": ["nothing"]})
+
+        self.assertEqual(reply["status"], "error")
+        self.assertIn("invalid choice", reply["error"])
+
+    def test_tool_errors_are_counted(self):
+        reply = self.run_job({"command": "copy", "args": {"Reviewer_Workspace": "missing.gdb"}})
+
+        self.assertEqual(reply["status"], "error")
+        self.assertIn("missing.gdb", reply["error"])
+        self.assertEqual(self.cache.refreshed, [("missing.gdb",)])
+        self.assertEqual(self.stats["failedJobs"], 1)
+
+    def test_tool_exit_does_not_stop_the_worker(self):
+        reply = self.run_job({"command": "export", "args": {}})
+
+        self.assertEqual(reply["status"], "error")
+        self.assertEqual(self.stats["jobs"], 1)
+
+    def test_failed_tool_is_a_failed_reply(self):
+        reply = self.run_job({"command": "summary", "args": {}})
+
+        self.assertEqual(reply["status"], "failed")
+        self.assertIn("messages", reply)
+
+    def test_unknown_command(self):
+        reply = self.run_job({"command": "nothing"})
+
+        self.assertEqual(reply["status"], "error")
+        self.assertEqual(self.stats["jobs"], 0)
+
+    def test_ping(self):
+        reply = self.run_job({"command": "ping"})
+
+        self.assertEqual((reply["status"], reply["result"]), ("ok", "pong"))
+        self.assertNotIn("messages", reply)
+
+
+if __name__ == "__main__":
+    unittest.main()
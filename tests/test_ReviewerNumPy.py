@@ -0,0 +1,59 @@
+# ---------------------------------------------------------------------------
+# Tests of the NULL values restored after reading REVTABLEMAIN into a numpy
+# array.  Needs numpy, not arcpy
+# ---------------------------------------------------------------------------
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+from ReviewerNumPy import numpy, NUMPY_NULL_VALUES, NumPyColumnToList, MapCheckRuns
+
+
+# Builds a structured array the way TableToNumPyArray does, with the NULL
+# values replaced by the NUMPY_NULL_VALUES placeholders
+def ReadArray(fields, rows):
+    records = [tuple(NUMPY_NULL_VALUES[fieldType] if value is None else value
+                     for (name, fieldType, dtype), value in zip(fields, row)) for row in rows]
+    return numpy.array(records, dtype=[(name, dtype) for name, fieldType, dtype in fields])
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class NumPyNullTest(unittest.TestCase):
+
+    FIELDS = [("CHECKRUNID", "Guid", "<U38"),
+              ("NOTES", "String", "<U50"),
+              ("SEVERITY", "SmallInteger", "<i2"),
+              ("REVIEWDATE", "Date", "<M8[us]")]
+
+    RUN = u"{9E6F0A41-0F3A-4C1D-A8B4-0D5D3A6C1E11}"
+
+    def test_empty_text_is_not_null(self):
+        records = ReadArray(self.FIELDS, [(self.RUN, u"", 1, None), (None, None, None, None)])
+
+        self.assertEqual(NumPyColumnToList(records["NOTES"], "String"), [u"", None])
+        self.assertEqual(NumPyColumnToList(records["SEVERITY"], "SmallInteger"), [1, None])
+        self.assertEqual(NumPyColumnToList(records["REVIEWDATE"], "Date")[1], None)
+
+    def test_null_check_run_stays_null(self):
+        records = ReadArray(self.FIELDS, [(None, u"", 1, None), (self.RUN, u"a", 2, None), (None, u"b", 3, None)])
+        checkRunMap = {}
+        newIDs = lambda count: [u"{{NEW-{}}}".format(i) for i in range(count)]
+
+        mapped = MapCheckRuns(records["CHECKRUNID"], checkRunMap, newIDs)
+
+        self.assertEqual(mapped, [None, u"{NEW-0}", None])
+        self.assertEqual(checkRunMap, {self.RUN: u"{NEW-0}"})
+
+    def test_mapped_check_runs_are_reused(self):
+        records = ReadArray(self.FIELDS, [(self.RUN, u"", 1, None)])
+        checkRunMap = {self.RUN: u"{OLD}"}
+
+        mapped = MapCheckRuns(records["CHECKRUNID"], checkRunMap, lambda count: [None] * count)
+
+        self.assertEqual(mapped, [u"{OLD}"])
+
+
+if __name__ == "__main__":
+    unittest.main()
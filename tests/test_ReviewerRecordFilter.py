@@ -0,0 +1,76 @@
+# ---------------------------------------------------------------------------
+# Tests of the filter expressions over REVTABLEMAIN fields.  Does not need
+# arcpy
+# ---------------------------------------------------------------------------
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+from ReviewerRecordFilter import CompileRecordFilter
+
+FIELDS = ["OBJECTID", "ORIGINTABLE", "SEVERITY", "NOTES", "CHECKRUNID"]
+
+FIELD_TYPES = {"OBJECTID": "OID", "ORIGINTABLE": "String", "SEVERITY": "SmallInteger", "NOTES": "String",
+               "CHECKRUNID": "Guid"}
+
+
+def Delimit(name):
+    return '"{}"'.format(name)
+
+
+class CompileTest(unittest.TestCase):
+
+    def test_rows_are_tested(self):
+        matches = CompileRecordFilter("ORIGINTABLE in ('Roads', 'Rivers') and (SEVERITY <= 2 or "
+                                      "'gap' in NOTES.lower())", FIELDS).predicate(FIELDS)
+
+        self.assertTrue(matches((1, "Roads", 1, None, None)))
+        self.assertTrue(matches((2, "Rivers", 5, "Small GAP", None)))
+        self.assertFalse(matches((3, "Rivers", 5, "overlap", None)))
+        self.assertFalse(matches((4, "Parcels", 1, "gap", None)))
+
+    def test_failing_rows_are_not_selected(self):
+        matches = CompileRecordFilter("NOTES.startswith('a')", FIELDS).predicate(["NOTES", "SEVERITY"])
+
+        self.assertTrue(matches(("abc", 1)))
+        self.assertFalse(matches((None, 1)))
+
+    def test_other_fields_are_rejected(self):
+        with self.assertRaises(ValueError):
+            CompileRecordFilter("SHAPE_LENGTH > 10", FIELDS)
+
+    def test_calls_are_whitelisted(self):
+        for expression in ("__import__('os').remove('x')", "open('x')", "NOTES.__class__",
+                           "NOTES.format(SEVERITY)", "[x for x in NOTES]", "lambda: 1", "SEVERITY >"):
+            with self.assertRaises(ValueError, msg=expression):
+                CompileRecordFilter(expression, FIELDS)
+
+    def test_builtins_are_not_available(self):
+        self.assertEqual(CompileRecordFilter("len(NOTES) > 2", FIELDS).predicate(["NOTES"])(("abc",)), True)
+        self.assertFalse(CompileRecordFilter("SEVERITY > 1", FIELDS).function.__globals__["__builtins__"])
+
+
+class SqlClauseTest(unittest.TestCase):
+
+    def sql(self, expression, maxLength=1000):
+        return CompileRecordFilter(expression, FIELDS).sqlClause(FIELD_TYPES, Delimit, maxLength)
+
+    def test_equality_and_in_comparisons(self):
+        self.assertEqual(self.sql("ORIGINTABLE in ('Roads', \"O'Hare\") and SEVERITY == 2 and NOTES != 'x'"),
+                         '"ORIGINTABLE" IN (\'Roads\',\'O\'\'Hare\') AND "SEVERITY" = 2')
+        self.assertEqual(self.sql("1 == SEVERITY"), '"SEVERITY" = 1')
+
+    def test_comparisons_that_cannot_be_sql(self):
+        self.assertEqual(self.sql("SEVERITY == 1 or NOTES == 'x'"), '')
+        self.assertEqual(self.sql("SEVERITY == '1'"), '')
+        self.assertEqual(self.sql("NOTES == None"), '')
+        self.assertEqual(self.sql("SEVERITY < 3"), '')
+
+    def test_clause_length_is_limited(self):
+        self.assertEqual(self.sql("SEVERITY == 2 and ORIGINTABLE == 'Roads'", maxLength=20), '"SEVERITY" = 2')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+# ---------------------------------------------------------------------------
+# Tests of the shapefile field names written by the export outputs.  Needs
+# arcpy, which ReviewerRecordSinks imports
+# ---------------------------------------------------------------------------
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+try:
+    import ReviewerRecordSinks
+except ImportError:
+    ReviewerRecordSinks = None
+
+
+@unittest.skipIf(ReviewerRecordSinks is None, "arcpy is not installed")
+class ShapefileFieldNamesTest(unittest.TestCase):
+
+    def test_short_names_are_kept(self):
+        self.assertEqual(ReviewerRecordSinks.ShapefileFieldNames(["SESSIONID", "NOTES", "ORIGINTABLE"]),
+                         ["SESSIONID", "NOTES", "ORIG_TABLE"])
+
+    def test_truncated_names_are_numbered(self):
+        names = ReviewerRecordSinks.ShapefileFieldNames(["CORRECTIONNOTES", "CORRECTIONTYPE", "CORRECTIONUSER"])
+        self.assertEqual(names, ["CORRECTION", "CORRECTI_1", "CORRECTI_2"])
+
+    def test_names_differ_without_case(self):
+        names = ReviewerRecordSinks.ShapefileFieldNames(["CORRECTI_1", "CORRECTIONNOTES", "correctionType"])
+        self.assertEqual(len(set(name.upper() for name in names)), 3)
+        self.assertTrue(all(len(name) <= 10 for name in names))
+
+    def test_dbf_columns_are_unique(self):
+        class Schema(object):
+            types = {"CORRECTIONNOTES": "String", "CORRECTIONTYPE": "Integer"}
+            lengths = {"CORRECTIONNOTES": 50, "CORRECTIONTYPE": None}
+
+        columns = ReviewerRecordSinks.DbfColumns(["CORRECTIONNOTES", "CORRECTIONTYPE"], Schema())
+        self.assertEqual([column[0] for column in columns], ["CORRECTION", "CORRECTI_1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
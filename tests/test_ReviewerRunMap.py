@@ -0,0 +1,54 @@
+# ---------------------------------------------------------------------------
+# Tests of the run map kept next to an output workspace.  Does not need arcpy
+# ---------------------------------------------------------------------------
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+from ReviewerRunMap import RunMap, RunMapPath, CHECK_RUNS, BATCH_RUNS
+
+
+class RunMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.out_workspace = os.path.join(self.folder, "Out.gdb")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def open_map(self, in_workspace="In.gdb"):
+        runMap = RunMap(os.path.join(self.folder, in_workspace), self.out_workspace)
+        self.addCleanup(runMap.close)
+        return runMap
+
+    def test_runs_are_kept_between_copies(self):
+        self.open_map().save(CHECK_RUNS, {"{A}": "{X}", "{B}": "{Y}"}, session=2)
+
+        runMap = self.open_map()
+        self.assertEqual(runMap.load(CHECK_RUNS, 2), {"{A}": "{X}", "{B}": "{Y}"})
+        self.assertTrue(os.path.exists(RunMapPath(self.out_workspace)))
+
+    def test_runs_are_kept_by_session_kind_and_input(self):
+        runMap = self.open_map()
+        runMap.save(CHECK_RUNS, {"{A}": "{X}"}, session=1)
+        runMap.save(BATCH_RUNS, {"{A}": "{Z}"})
+
+        self.assertEqual(runMap.load(CHECK_RUNS, 2), {})
+        self.assertEqual(runMap.load(BATCH_RUNS), {"{A}": "{Z}"})
+        self.assertEqual(self.open_map("Other.gdb").load(CHECK_RUNS, 1), {})
+
+    def test_remove(self):
+        runMap = self.open_map()
+        runMap.save(CHECK_RUNS, {"{A}": "{X}", "{B}": "{Y}"}, session=1)
+        runMap.remove(CHECK_RUNS, ["{A}"], session=1)
+
+        self.assertEqual(runMap.load(CHECK_RUNS, 1), {"{B}": "{Y}"})
+
+
+if __name__ == "__main__":
+    unittest.main()
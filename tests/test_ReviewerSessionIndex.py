@@ -0,0 +1,90 @@
+# ---------------------------------------------------------------------------
+# Tests of the session index.  Does not need arcpy, the Reviewer tables are
+# lists of (SESSIONID, objectid, record id) rows
+# ---------------------------------------------------------------------------
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+import ReviewerSessionIndex
+
+
+# Reads the rows of the lists in tables instead of the Reviewer workspace
+class ListSessionIndex(ReviewerSessionIndex.SessionIndex):
+
+    def __init__(self, in_workspace, tables):
+        ReviewerSessionIndex.SessionIndex.__init__(self, in_workspace)
+        self.tables = tables
+        self.reads = []
+
+    def tablePath(self, table_name):
+        return table_name if table_name in self.tables else ''
+
+    def tableState(self, table):
+        rows = self.tables[table]
+        return len(rows), max(oid for session, oid, id in rows) if rows else None
+
+    def readRows(self, table_name, table, after_oid):
+        self.reads.append((table_name, after_oid))
+        return [row for row in self.tables[table] if after_oid is None or row[1] > after_oid]
+
+
+class SessionIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.workspace = os.path.join(self.folder, "Reviewer.gdb")
+        self.tables = {"REVTABLEMAIN": [(1, 1, "{A}"), (1, 2, "{B}"), (2, 3, "{C}")],
+                       "REVTABLEPOINT": [(1, 1, "{A}"), (2, 2, "{C}")]}
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def open_index(self):
+        index = ListSessionIndex(self.workspace, self.tables)
+        self.addCleanup(index.close)
+        return index
+
+    def test_no_index(self):
+        self.assertIsNone(ReviewerSessionIndex.OpenSessionIndex(self.workspace))
+        self.assertEqual(ReviewerSessionIndex.SessionIndexPath(self.workspace), self.workspace + ".sessions.sqlite")
+
+    def test_session_rows(self):
+        index = self.open_index()
+
+        self.assertEqual(index.records([1]), {1: "{A}", 2: "{B}"})
+        self.assertEqual(index.geometryOIDs("REVTABLEPOINT", [2]), [2])
+        self.assertEqual(index.geometryOIDs("REVTABLELINE", [1, 2]), [])
+        self.assertEqual(index.records([]), {})
+
+    def test_unchanged_tables_are_not_read(self):
+        self.open_index().refresh()
+
+        index = self.open_index()
+        self.assertEqual(index.records([2]), {3: "{C}"})
+        self.assertEqual(index.reads, [])
+
+    def test_added_rows_are_indexed(self):
+        self.open_index().refresh()
+        self.tables["REVTABLEMAIN"].append((2, 4, "{D}"))
+
+        index = self.open_index()
+        self.assertEqual(index.records([2]), {3: "{C}", 4: "{D}"})
+        self.assertEqual(index.reads, [("REVTABLEMAIN", 3)])
+
+    def test_deleted_rows_rebuild_the_table(self):
+        self.open_index().refresh()
+        del self.tables["REVTABLEMAIN"][0]
+        self.tables["REVTABLEMAIN"].append((1, 4, "{D}"))
+
+        index = self.open_index()
+        self.assertEqual(index.records([1]), {2: "{B}", 4: "{D}"})
+        self.assertEqual(index.reads, [("REVTABLEMAIN", 3), ("REVTABLEMAIN", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+# ---------------------------------------------------------------------------
+# Tests of the copy and export of reviewer records in SQLite hosted Reviewer
+# workspaces.  Does not need arcpy
+# ---------------------------------------------------------------------------
+import csv
+import os
+import shutil
+import sqlite3
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+from SqliteReviewerRecords import CopyRecordsSql, ExportRecordsSql
+
+# The Reviewer tables used by the copy, with the 10.6 GUID record ids
+SCHEMA = '''
+    CREATE TABLE gpkg_geometry_columns (table_name TEXT, column_name TEXT, srs_id INTEGER);
+    INSERT INTO gpkg_geometry_columns VALUES ('REVTABLEPOINT', 'SHAPE', 4326);
+    CREATE TABLE REVSESSIONTABLE (OBJECTID INTEGER PRIMARY KEY, SESSIONID INTEGER, SESSIONNAME TEXT(255));
+    CREATE TABLE REVTABLEMAIN (OBJECTID INTEGER PRIMARY KEY, ID TEXT(38), SESSIONID INTEGER,
+                               CHECKRUNID TEXT(38), ORIGINTABLE TEXT(255), SEVERITY SMALLINT);
+    CREATE TABLE REVTABLEPOINT (OBJECTID INTEGER PRIMARY KEY, LINKID TEXT(38), SESSIONID INTEGER, SHAPE BLOB);
+    CREATE TABLE REVCHECKRUNTABLE (OBJECTID INTEGER PRIMARY KEY, CHECKRUNID TEXT(38), SESSIONID INTEGER,
+                                   BATCHRUNID TEXT(38), CHECKRUNPROPERTIES BLOB);
+    CREATE TABLE REVBATCHRUNTABLE (OBJECTID INTEGER PRIMARY KEY, ID TEXT(38), NAME TEXT(255));'''
+
+
+# A GeoPackage point geometry without an envelope
+def GeoPackagePoint(x, y):
+    return b'GP\x00\x01' + struct.pack('<i', 4326) + struct.pack('<BIdd', 1, 1, x, y)
+
+
+def MakeWorkspace(path, sessions):
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executescript(SCHEMA)
+        connection.executemany("INSERT INTO REVSESSIONTABLE (SESSIONID, SESSIONNAME) VALUES (?, ?)", sessions)
+    return connection
+
+
+class SqliteWorkspaceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.in_workspace = os.path.join(self.folder, "In.gpkg")
+        self.out_workspace = os.path.join(self.folder, "Out.gpkg")
+
+        connection = MakeWorkspace(self.in_workspace, [(1, "Session 1"), (2, "Session 2")])
+        with connection:
+            connection.executemany("INSERT INTO REVTABLEMAIN (ID, SESSIONID, CHECKRUNID, ORIGINTABLE, SEVERITY) "
+                                   "VALUES (?, ?, ?, ?, ?)",
+                                   [("{R1}", 1, "{C1}", "Roads", 1), ("{R2}", 1, None, "Rivers", 3),
+                                    ("{R3}", 2, "{C1}", "Roads", 2)])
+            connection.executemany("INSERT INTO REVTABLEPOINT (LINKID, SESSIONID, SHAPE) VALUES (?, ?, ?)",
+                                   [("{R1}", 1, GeoPackagePoint(1.5, 2.5)), ("{R3}", 2, GeoPackagePoint(3, 4))])
+            connection.execute("INSERT INTO REVCHECKRUNTABLE (CHECKRUNID, SESSIONID, BATCHRUNID, CHECKRUNPROPERTIES) "
+                               "VALUES ('{C1}', 1, '{B1}', X'0102')")
+            connection.execute("INSERT INTO REVBATCHRUNTABLE (ID, NAME) VALUES ('{B1}', 'Roads batch')")
+        connection.close()
+
+        MakeWorkspace(self.out_workspace, [(7, "Copies")]).close()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def query(self, sql, workspace=None):
+        connection = sqlite3.connect(workspace or self.out_workspace)
+        try:
+            return connection.execute(sql).fetchall()
+        finally:
+            connection.close()
+
+    def test_copy_gives_the_records_new_ids(self):
+        summary = CopyRecordsSql(self.in_workspace, ["Session 1"], self.out_workspace, "Copies")
+
+        self.assertEqual(summary, {"REVTABLEMAIN": 2, "REVTABLEPOINT": 1, "REVBATCHRUNTABLE": 1,
+                                   "REVCHECKRUNTABLE": 1})
+        records = self.query("SELECT ID, SESSIONID, CHECKRUNID, ORIGINTABLE FROM REVTABLEMAIN ORDER BY SEVERITY")
+        self.assertEqual([row[1:] for row in records][1], (7, None, "Rivers"))
+        self.assertNotIn(records[0][0], ("{R1}", "{R2}"))
+
+        # The geometry, check run and batch run follow the new ids
+        self.assertEqual(self.query("SELECT LINKID, SESSIONID FROM REVTABLEPOINT"), [(records[0][0], 7)])
+        checkRuns = self.query("SELECT CHECKRUNID, SESSIONID, BATCHRUNID FROM REVCHECKRUNTABLE")
+        self.assertEqual(checkRuns[0][:2], (records[0][2], 7))
+        self.assertEqual(self.query("SELECT ID, NAME FROM REVBATCHRUNTABLE"), [(checkRuns[0][2], "Roads batch")])
+        self.assertNotEqual(checkRuns[0][2], "{B1}")
+
+    def test_record_clause(self):
+        summary = CopyRecordsSql(self.in_workspace, ["Session 1", "Session 2"], self.out_workspace, "Copies",
+                                 "\"ORIGINTABLE\" = 'Roads'", SkipAttachments=True)
+
+        self.assertEqual(summary["REVTABLEMAIN"], 2)
+        self.assertEqual(summary["REVTABLEPOINT"], 2)
+        self.assertEqual(self.query("SELECT CHECKRUNPROPERTIES FROM REVCHECKRUNTABLE"), [(b'',)])
+
+    def test_copy_into_the_same_workspace(self):
+        CopyRecordsSql(self.in_workspace, ["Session 1"], self.in_workspace, "Session 2")
+
+        self.assertEqual(self.query("SELECT COUNT(*) FROM REVTABLEMAIN WHERE SESSIONID = 2", self.in_workspace),
+                         [(3,)])
+
+    def test_missing_sessions(self):
+        self.assertIsNone(CopyRecordsSql(self.in_workspace, ["Session 9"], self.out_workspace, "Copies"))
+        self.assertIsNone(CopyRecordsSql(self.in_workspace, ["Session 1"], self.out_workspace, "Session 9"))
+        self.assertEqual(self.query("SELECT COUNT(*) FROM REVTABLEMAIN"), [(0,)])
+
+    def test_export_writes_the_point_of_each_geometry(self):
+        out_csv = os.path.join(self.folder, "export", "records.csv")
+
+        result = ExportRecordsSql(self.in_workspace, ["Session 1"], ["ORIGINTABLE", "SEVERITY", "MISSING"], out_csv)
+
+        self.assertEqual(result, {"total": 2, "outputs": {out_csv: 2}})
+        with open(out_csv) as f:
+            rows = sorted(csv.reader(f))
+        self.assertEqual(rows, [["ORIGINTABLE", "SEVERITY", "POINT_X", "POINT_Y"],
+                                ["Rivers", "3", "", ""], ["Roads", "1", "1.5", "2.5"]])
+        self.assertIsNone(ExportRecordsSql(self.in_workspace, ["Session 1"], ["ORIGINTABLE"], out_csv))
+
+
+if __name__ == "__main__":
+    unittest.main()